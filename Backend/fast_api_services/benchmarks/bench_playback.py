@@ -0,0 +1,330 @@
+"""
+Нагрузочный тест отдачи записей через /api/get-recording.
+
+Генерирует синтетические MP4, прописывает их в recording_locations локального mongod,
+поднимает заглушку сервиса сжатия на :8005 и сервер main:app, после чего N клиентов
+читают записи последовательными диапазонами с периодическими перемотками.
+Выводит пропускную способность, p50/p99 времени до первого байта и загрузку CPU сервера.
+
+Запросы идут с cookie access_token, выпущенной create_access_token из main.py; для уже
+запущенного сервера (--url) SECRET_KEY в окружении должен совпадать с его ключом.
+В статистику попадают только ответы 206, остальные считаются ошибками.
+
+Запуск из каталога fast_api_services (нужны ffmpeg и mongod на localhost):
+    python -m benchmarks.bench_playback --clients 50 --seconds 30
+    python -m benchmarks.bench_playback --compressor link   # отдача из кэша сжатых копий
+    python -m benchmarks.bench_playback --url http://127.0.0.1:8000 --server-pid 1234
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from pymongo import MongoClient
+
+from config import mongodb_adress
+
+FAST_API_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BACKEND_DIRECTORY = os.path.abspath(os.path.join(FAST_API_DIRECTORY, ".."))
+COMPRESSED_DIRECTORY = os.path.join(FAST_API_DIRECTORY, "downloads", "compressed")
+COMPRESSOR_PORT = 8005
+RECORDING_PREFIX = "bench_playback_"
+READ_SIZE = 1024 * 1024
+
+
+def generate_source(path, duration):
+    """Синтетическая «лекция» с moov в начале: 1280x720, 25 fps, движущаяся картинка и тон."""
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "250", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest", "-movflags", "+faststart",
+        path,
+    ], check=True)
+
+
+def seed_locations(recordings):
+    """Прописывает записи в recording_locations; проверка faststart отмечена выполненной."""
+    client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
+    collection = client["zoom_files"]["recording_locations"]
+    for recording_id, file_path in recordings.items():
+        collection.update_one({"recording_id": recording_id}, {"$set": {
+            "recording_id": recording_id,
+            "file_path": file_path,
+            "meeting_uuid": "bench_playback",
+            "recording_type": "shared_screen_with_speaker_view",
+            "faststart": {"status": "faststart", "checked_at": time.time()},
+        }}, upsert=True)
+    client.close()
+
+
+def cleanup_locations():
+    client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
+    client["zoom_files"]["recording_locations"].delete_many({"recording_id": {"$regex": f"^{RECORDING_PREFIX}"}})
+    client.close()
+    if os.path.isdir(COMPRESSED_DIRECTORY):
+        for name in os.listdir(COMPRESSED_DIRECTORY):
+            if name.startswith(f"compressed_{RECORDING_PREFIX}"):
+                os.remove(os.path.join(COMPRESSED_DIRECTORY, name))
+
+
+def start_compressor_stub(mode):
+    """
+    Заглушка сервиса сжатия: fail - отвечает 503 (сервер отдаёт оригиналы),
+    link - мгновенно «сжимает» жёсткой ссылкой (сервер отдаёт копии из кэша).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if mode == "link" and self.path.startswith("/compress-video-job/"):
+                os.link(body["input_path"], body["output_path"])
+                status, payload = 200, {"status": "done", "action": "skip"}
+            else:
+                status, payload = 503, {"detail": "Compressor stub"}
+            encoded = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", COMPRESSOR_PORT), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_server(port):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIRECTORY, env.get("PYTHONPATH")]))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=FAST_API_DIRECTORY, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not start in time")
+
+
+def mint_access_token(lifetime_seconds):
+    """JWT для cookie access_token тем же кодом и ключом, что у сервера (middleware check_authentication)."""
+    # main импортируется только здесь: модулю нужен весь набор зависимостей сервиса
+    from main import create_access_token
+    return create_access_token({"sub": "bench_playback"}, expires_delta=timedelta(seconds=lifetime_seconds))
+
+
+def cpu_seconds(pid):
+    """Процессорное время процесса (user + system) по /proc."""
+    with open(f"/proc/{pid}/stat") as stat_file:
+        fields = stat_file.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def fetch_range(reader, writer, host, path, start, end, access_token):
+    """Один запрос диапазона по keep-alive соединению: (статус, байт, время до первого байта, общее время)."""
+    started = time.perf_counter()
+    writer.write((f"GET {path} HTTP/1.1\r\nHost: {host}\r\nRange: bytes={start}-{end}\r\n"
+                  f"Cookie: access_token={access_token}\r\n"
+                  f"Connection: keep-alive\r\n\r\n").encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    ttfb = time.perf_counter() - started
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    remaining = int(headers.get("content-length", 0))
+    received = 0
+    while remaining:
+        chunk = await reader.read(min(remaining, READ_SIZE))
+        if not chunk:
+            raise ConnectionError("Connection closed mid-body")
+        received += len(chunk)
+        remaining -= len(chunk)
+    return int(status_line.split()[1]), received, ttfb, time.perf_counter() - started
+
+
+async def run_client(base_url, recordings, deadline, chunk_size, seek_ratio, access_token, results):
+    """Зритель: читает запись подряд кусками chunk_size, иногда перематывает в случайное место."""
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    reader, writer = await asyncio.open_connection(host, port)
+    recording_id, file_size = random.choice(list(recordings.items()))
+    path = f"/api/get-recording?recording_id={recording_id}&conference_uuid=bench_playback"
+    offset = 0
+    kind = "seek"
+    try:
+        while time.perf_counter() < deadline:
+            end = min(offset + chunk_size, file_size) - 1
+            try:
+                status, received, ttfb, total = await fetch_range(reader, writer, host, path, offset, end,
+                                                                  access_token)
+            except (ConnectionError, OSError):
+                results["errors"] += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            if status != 206:
+                # Отказ (например, 401) или ответ целиком - не то, что измеряем; в выборку не попадает
+                results["errors"] += 1
+                results["statuses"][status] += 1
+                if time.perf_counter() < deadline:
+                    await asyncio.sleep(0.1)
+                continue
+            results["bytes"] += received
+            results[kind].append(ttfb)
+
+            offset = end + 1
+            if offset >= file_size or random.random() < seek_ratio:
+                offset = random.randrange(0, file_size)
+                kind = "seek"
+            else:
+                kind = "sequential"
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+async def run_benchmark(base_url, recordings, clients, seconds, chunk_size, seek_ratio, server_pid, access_token):
+    results = {"bytes": 0, "errors": 0, "statuses": Counter(), "sequential": [], "seek": []}
+    cpu_before = cpu_seconds(server_pid) if server_pid else None
+    started = time.perf_counter()
+    deadline = started + seconds
+    await asyncio.gather(*[
+        run_client(base_url, recordings, deadline, chunk_size, seek_ratio, access_token, results)
+        for _ in range(clients)
+    ])
+    elapsed = time.perf_counter() - started
+
+    all_ttfb = results["sequential"] + results["seek"]
+    report = {
+        "clients": clients,
+        "seconds": round(elapsed, 2),
+        "requests": len(all_ttfb),
+        "errors": results["errors"],
+        "unexpected_statuses": {str(status): count for status, count in results["statuses"].items()},
+        "requests_per_second": round(len(all_ttfb) / elapsed, 1),
+        "throughput_mib_per_second": round(results["bytes"] / elapsed / 1024 ** 2, 1),
+        "ttfb_p50_ms": round(percentile(all_ttfb, 0.5) * 1000, 2),
+        "ttfb_p99_ms": round(percentile(all_ttfb, 0.99) * 1000, 2),
+        "seek_ttfb_p50_ms": round(percentile(results["seek"], 0.5) * 1000, 2),
+        "seek_ttfb_p99_ms": round(percentile(results["seek"], 0.99) * 1000, 2),
+        "server_cpu_cores": None,
+    }
+    if server_pid:
+        report["server_cpu_cores"] = round((cpu_seconds(server_pid) - cpu_before) / elapsed, 2)
+    return report
+
+
+def print_report(report):
+    print(f"Клиентов:                 {report['clients']}")
+    print(f"Длительность:             {report['seconds']} с")
+    print(f"Запросов:                 {report['requests']} ({report['requests_per_second']}/с), "
+          f"ошибок: {report['errors']}")
+    if report["unexpected_statuses"]:
+        print(f"Ответы не 206:            {report['unexpected_statuses']}")
+    print(f"Пропускная способность:   {report['throughput_mib_per_second']} МиБ/с")
+    print(f"TTFB p50 / p99:           {report['ttfb_p50_ms']} / {report['ttfb_p99_ms']} мс")
+    print(f"TTFB перемотки p50 / p99: {report['seek_ttfb_p50_ms']} / {report['seek_ttfb_p99_ms']} мс")
+    if report["server_cpu_cores"] is not None:
+        print(f"CPU сервера:              {report['server_cpu_cores']} ядра")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20, help="число одновременных зрителей")
+    parser.add_argument("--seconds", type=int, default=30, help="длительность нагрузки, с")
+    parser.add_argument("--files", type=int, default=4, help="число синтетических записей")
+    parser.add_argument("--duration", type=int, default=300, help="длительность синтетической записи, с")
+    parser.add_argument("--source", help="готовый файл вместо синтетических (используется для всех записей)")
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024, help="размер запрашиваемого диапазона, байт")
+    parser.add_argument("--seek-ratio", type=float, default=0.1, help="доля запросов с перемоткой")
+    parser.add_argument("--compressor", choices=["fail", "link"], default="fail",
+                        help="поведение заглушки сервиса сжатия")
+    parser.add_argument("--port", type=int, default=8100, help="порт запускаемого сервера")
+    parser.add_argument("--url", help="уже запущенный сервер вместо запуска main:app")
+    parser.add_argument("--server-pid", type=int, help="PID уже запущенного сервера для замера CPU")
+    parser.add_argument("--json", help="сохранить результат в файл")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_playback_")
+    compressor = None
+    server = None
+    try:
+        recordings = {}
+        for index in range(args.files):
+            file_path = args.source and os.path.abspath(args.source)
+            if not file_path:
+                file_path = os.path.join(work_dir, f"source_{index}.mp4")
+                print(f"Генерация синтетической записи {index + 1}/{args.files} на {args.duration} с...")
+                generate_source(file_path, args.duration)
+            recordings[f"{RECORDING_PREFIX}{index}"] = file_path
+        seed_locations(recordings)
+        file_sizes = {recording_id: os.path.getsize(path) for recording_id, path in recordings.items()}
+
+        compressor = start_compressor_stub(args.compressor)
+        base_url = args.url
+        server_pid = args.server_pid
+        if not base_url:
+            server = start_server(args.port)
+            base_url = f"http://127.0.0.1:{args.port}"
+            server_pid = server.pid
+
+        access_token = mint_access_token(args.seconds + 300)
+        report = asyncio.run(run_benchmark(base_url, file_sizes, args.clients, args.seconds,
+                                           args.chunk_size, args.seek_ratio, server_pid, access_token))
+        report["compressor"] = args.compressor
+        print_report(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as json_file:
+                json.dump(report, json_file, indent=2)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if compressor is not None:
+            compressor.shutdown()
+        cleanup_locations()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
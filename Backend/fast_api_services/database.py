@@ -1,14 +1,67 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event, Column, Integer, String, Float
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+# База лежит рядом с модулем: сервис и скрипт скачивания открывают один файл независимо от текущей директории
+BASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DATABASE_URL = os.getenv("USERS_DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIRECTORY, 'users.db')}")
+# Лог каждого SQL-запроса - только для отладки
+SQL_ECHO = os.getenv("SQL_ECHO", "0") == "1"
+# Соединений в пуле процесса; столько же потоков выполняют запросы к базе
+USERS_DB_POOL_SIZE = int(os.getenv("USERS_DB_POOL_SIZE", 5))
+# Сколько секунд запрос ждёт снятия блокировки записи другим процессом, прежде чем упасть
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 15))
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=SQL_ECHO,
+    # Соединения переходят между потоками пула; сессия при этом используется одним потоком
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+    # Явно: в старых версиях SQLAlchemy для файла SQLite по умолчанию NullPool (соединение на каждый запрос)
+    poolclass=QueuePool,
+    pool_size=USERS_DB_POOL_SIZE,
+    max_overflow=0,
+)
+
 
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL: чтения не ждут запись прогресса скачивания, запись не ждёт чтений."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+    cursor.close()
 
-DATABASE_URL = ("sqlite:///./users.db")
 
-engine = create_engine(DATABASE_URL, echo=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Запросы к базе выполняются в своём пуле потоков размером с пул соединений
+_db_executor = ThreadPoolExecutor(max_workers=USERS_DB_POOL_SIZE, thread_name_prefix="users-db")
+
+
+def _call_in_session(function, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return function(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+async def run_db(function, *args, **kwargs):
+    """Выполняет function(db, ...) с отдельной сессией вне event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(_call_in_session, function, *args, **kwargs))
+
+
 class User(Base):
     __tablename__ = 'auth_users'
 
@@ -31,5 +84,61 @@ class VideoDownload(Base):
     file_type = Column(String)
     download_status = Column(Float)
 
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "file_id": self.file_id,
+            "file_name": self.file_name,
+            "file_type": self.file_type,
+            "download_status": self.download_status,
+        }
+
+
+# Функции для run_db: первым аргументом получают сессию
+
+def get_user_by_email(db, email):
+    return db.query(User).filter(User.email == email).first()
+
+
+def add_user(db, user):
+    """Сохраняет пользователя; False - email уже занят."""
+    db.add(user)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+
+def add_download(db, video_download):
+    db.add(video_download)
+    db.commit()
+    db.refresh(video_download)
+    return video_download.to_dict()
+
+
+def get_download(db, file_id):
+    video_download = db.query(VideoDownload).filter_by(file_id=file_id).first()
+    return video_download.to_dict() if video_download else None
+
+
+def list_downloads(db):
+    return [video_download.to_dict() for video_download in db.query(VideoDownload).all()]
+
+
+def delete_download_record(db, file_id):
+    """False - записи о загрузке нет."""
+    deleted = db.query(VideoDownload).filter_by(file_id=file_id).delete()
+    db.commit()
+    return deleted > 0
+
+
+def set_download_status(db, file_id, download_status):
+    """Один UPDATE без предварительного чтения строки."""
+    db.query(VideoDownload).filter_by(file_id=file_id).update({"download_status": download_status})
+    db.commit()
+
+
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -0,0 +1,114 @@
+"""
+Однократный перенос JSON-файлов настроек в коллекции MongoDB (mds_workspace).
+Запуск из директории fast_api_services:
+
+    python import_json_stores.py            # перенести все файлы
+    python import_json_stores.py --dry-run  # только показать, что будет перенесено
+
+Повторный запуск безопасен: документы перезаписываются по _id, файлы не удаляются.
+"""
+import argparse
+import json
+import os
+
+from pymongo import ReplaceOne
+
+from mongo_repositories import (
+    zoom_meetings_repository, platform_lectures_repository, telegram_channels_repository, lms_streams_repository,
+    kinescope_folders_repository, schedule_settings_repository
+)
+
+ZOOM_MEETINGS_FILE = 'services/zoom_service/meet_create/zoom_meetings.json'
+LECTURE_ON_PLATFORM_FILE = 'services/schedule_service/lecture_on_platform.json'
+EXCLUDE_SETTINGS_FILE = 'services/schedule_service/exclude_settings.json'
+# Файлы вида {"global_exclude": [...], "users_include": {...}, "couples": {id: {...}}}
+LINKED_ITEMS_FILES = [
+    ('services/telegram_services/linking_channels.json', telegram_channels_repository),
+    ('services/lms_services/lms_courses.json', lms_streams_repository),
+    ('services/kinescope_services/kinescope_folders.json', kinescope_folders_repository),
+]
+
+
+def load_json_file(file_path):
+    """Содержимое файла или None, если файла нет или он пустой."""
+    if not os.path.exists(file_path):
+        print(f"{file_path}: файл не найден, пропускаем.")
+        return None
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read().strip()
+    if not content:
+        print(f"{file_path}: файл пустой, пропускаем.")
+        return None
+    return json.loads(content)
+
+
+def replace_documents(repository, documents, dry_run):
+    if documents and not dry_run:
+        repository.collection.bulk_write(
+            [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents])
+        repository.touch_sync()
+    return len(documents)
+
+
+def save_settings(settings_repository, fields, dry_run):
+    if not dry_run:
+        settings_repository.collection.update_one({"_id": settings_repository.name}, {"$set": fields}, upsert=True)
+        settings_repository.touch_sync()
+
+
+def import_zoom_meetings(dry_run):
+    data = load_json_file(ZOOM_MEETINGS_FILE)
+    if data is None:
+        return
+    documents = [{"_id": str(conference_id), **conference} for conference_id, conference in data.items()]
+    count = replace_documents(zoom_meetings_repository, documents, dry_run)
+    print(f"{ZOOM_MEETINGS_FILE}: конференций {count}.")
+
+
+def import_platform_lectures(dry_run):
+    data = load_json_file(LECTURE_ON_PLATFORM_FILE)
+    if data is None:
+        return
+    documents = [
+        {"_id": item['id'], "google_sheets": item['google_sheets'], "platform_lecture": item['platform_lecture']}
+        for item in data
+    ]
+    count = replace_documents(platform_lectures_repository, documents, dry_run)
+    print(f"{LECTURE_ON_PLATFORM_FILE}: лекций {count}.")
+
+
+def import_linked_items(file_path, repository, dry_run):
+    data = load_json_file(file_path)
+    if data is None:
+        return
+    documents = [{"_id": item_id, **item} for item_id, item in data.get("couples", {}).items()]
+    count = replace_documents(repository, documents, dry_run)
+    save_settings(repository.settings, {
+        "global_exclude": data.get("global_exclude", []),
+        "users_include": data.get("users_include", {}),
+    }, dry_run)
+    print(f"{file_path}: элементов {count}, пользователей {len(data.get('users_include', {}))}.")
+
+
+def import_exclude_settings(dry_run):
+    data = load_json_file(EXCLUDE_SETTINGS_FILE)
+    if data is None:
+        return
+    save_settings(schedule_settings_repository, data, dry_run)
+    print(f"{EXCLUDE_SETTINGS_FILE}: пользователей {len(data.get('users_exclude', {}))}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос JSON-файлов настроек в MongoDB")
+    parser.add_argument("--dry-run", action="store_true", help="ничего не записывать, только посчитать")
+    args = parser.parse_args()
+
+    import_zoom_meetings(args.dry_run)
+    import_platform_lectures(args.dry_run)
+    for file_path, repository in LINKED_ITEMS_FILES:
+        import_linked_items(file_path, repository, args.dry_run)
+    import_exclude_settings(args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import asyncio
+import atexit
+import contextlib
+import copy
+import fcntl
+import json
+import os
+import tempfile
+import threading
+
+# Корневая директория fast_api_services: пути файлов считаются от неё, а не от текущей директории
+BASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Изменения, пришедшие в течение этого окна, пишутся на диск одной записью
+JSON_STORE_FLUSH_DELAY = float(os.getenv("JSON_STORE_FLUSH_DELAY", 0.5))
+
+_stores = []
+
+
+class JsonStore:
+    """
+    JSON-файл с разобранным содержимым в памяти.
+    Файл перечитывается, только если изменились его mtime или размер (например, его переписал другой процесс).
+    Изменения сразу видны в памяти, а на диск пишутся через flush_delay секунд одной атомарной записью
+    (временный файл + rename), поэтому серия изменений подряд даёт одну запись.
+    read() возвращает общий для всех объект: менять данные можно только через update().
+
+    shared=True - файл пишут несколько процессов: update() под межпроцессной блокировкой (flock)
+    перечитывает файл, применяет изменение и сразу записывает его, без отложенной записи.
+    Иначе процессы затирали бы изменения друг друга устаревшей копией из памяти.
+    """
+
+    def __init__(self, path, default=None, indent=4, flush_delay=JSON_STORE_FLUSH_DELAY, shared=False):
+        self.path = path if os.path.isabs(path) else os.path.join(BASE_DIRECTORY, path)
+        self.default = {} if default is None else default
+        self.indent = indent
+        self.flush_delay = flush_delay
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._data = None
+        self._signature = None
+        self._dirty = False
+        self._version = 0
+        self._timer = None
+        _stores.append(self)
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        """Перечитывает файл, если он изменился на диске; несохранённые изменения важнее файла."""
+        signature = self._file_signature()
+        if self._data is not None and (self._dirty or signature == self._signature):
+            return
+        data = None
+        if signature is not None:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                try:
+                    data = json.load(file)
+                except json.JSONDecodeError:
+                    print(f"Файл {self.path} пустой или повреждён, используются данные по умолчанию.")
+        self._data = copy.deepcopy(self.default) if data is None else data
+        self._signature = signature
+
+    def read(self):
+        with self._lock:
+            self._load()
+            return self._data
+
+    def revision(self):
+        """Меняется при каждом update() и при изменении файла на диске; файл при этом не читается."""
+        with self._lock:
+            signature = self._file_signature()
+            if signature is None:
+                return f"0-{self._version}"
+            return f"{signature[0]:x}-{signature[1]:x}-{self._version}"
+
+    def update(self, mutator):
+        """
+        mutator(data) меняет копию данных на месте или возвращает новые данные.
+        Уже выданные read() объекты не меняются. Возвращает новые данные.
+        """
+        if self.shared:
+            return self._update_shared(mutator)
+        with self._lock:
+            self._load()
+            data = copy.deepcopy(self._data)
+            result = mutator(data)
+            self._data = data if result is None else result
+            self._dirty = True
+            self._version += 1
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return self._data
+
+    def write(self, data):
+        return self.update(lambda _: data)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Эксклюзивная блокировка между процессами; файл блокировки отдельный, т.к. сам файл заменяется rename-ом."""
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update_shared(self, mutator):
+        with self._lock, self._file_lock():
+            # Копия в памяти могла устареть: файл мог переписать другой процесс
+            self._data = None
+            self._load()
+            data = copy.deepcopy(self._data)
+            result = mutator(data)
+            data = data if result is None else result
+            self._write_file(data)
+            self._data = data
+            self._signature = self._file_signature()
+            self._version += 1
+            return self._data
+
+    def _write_file(self, data):
+        """Атомарная запись: временный файл в той же директории + os.replace."""
+        temp_path = None
+        try:
+            file_descriptor, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.path), prefix=f".{os.path.basename(self.path)}.", suffix=".tmp"
+            )
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False, indent=self.indent)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def flush(self):
+        """Пишет несохранённые изменения на диск."""
+        with self._flush_lock:
+            with self._lock:
+                self._timer = None
+                if not self._dirty:
+                    return
+                data = self._data
+                self._dirty = False
+
+            try:
+                self._write_file(data)
+            except BaseException:
+                with self._lock:
+                    self._dirty = True
+                raise
+
+            with self._lock:
+                self._signature = self._file_signature()
+
+    async def read_async(self):
+        return await asyncio.to_thread(self.read)
+
+    async def update_async(self, mutator):
+        return await asyncio.to_thread(self.update, mutator)
+
+    async def revision_async(self):
+        return await asyncio.to_thread(self.revision)
+
+
+def flush_all():
+    for store in list(_stores):
+        store.flush()
+
+
+# Отложенные записи не теряются при остановке процесса
+atexit.register(flush_all)
+
+sheets_data_store = JsonStore("services/schedule_service/sheets_data.json")
+# Токены Zoom обновляют и основной сервис, и service_main (скачивание записей): запись сквозная под flock
+zoom_accounts_store = JsonStore("services/zoom_service/meet_create/accounts.json", flush_delay=0, shared=True)
@@ -1,13 +1,13 @@
 # Стандартные библиотеки Python
 import asyncio
 import os
+import shutil
 import sys
 import json
 import logging
 import subprocess
 import time
 from datetime import datetime, timedelta
-from sqlite3 import IntegrityError
 from typing import Optional, List
 
 # Сторонние библиотеки
@@ -22,17 +22,36 @@ from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from pymongo import MongoClient
 from gridfs import GridFS
-import ffmpeg
 
 # Локальные модули
-from database import User, SessionLocal, VideoDownload, init_db
-from config import mongodb_adress
-from services.kinescope_services.get_all_folders import save_structure
+from database import (
+    User, VideoDownload, init_db, run_db, get_user_by_email, add_user, add_download, get_download, list_downloads,
+    delete_download_record
+)
+from mongo_connection import get_client, pool_metrics
+from mongo_repositories import (
+    conference_videos_repository, run_blocking, zoom_meetings_repository, platform_lectures_repository,
+    telegram_channels_repository, lms_streams_repository, kinescope_folders_repository,
+    linking_channels_settings, lms_courses_settings, schedule_settings_repository, store_revisions
+)
+from mongo_indexes import ensure_indexes
+from json_store import sheets_data_store
+from response_cache import response_cache
+from user_cache import CurrentUser, get_current_user, resolve_current_user, user_cache
 from services.schedule_service.get_archive_lectures_for_user import get_archive_lectures_main
-from services.schedule_service.get_today_lectures_for_user import load_json, get_lectures_main
+from services.schedule_service.get_today_lectures_for_user import get_lectures_main
+from services.video_service.compressed_cache import compressed_cache
+from services.video_service.range_streaming import build_range_response
+from services.video_service.recording_locations import (
+    get_recording_location, get_recording_location_async, to_absolute_path, set_trimmed_location, set_virtual_trim, clear_trimmed_location
+)
+from services.video_service.smart_trim import submit_trim_job, get_trim_job, parse_timestamp, TrimError
+from services.video_service.virtual_trim import get_virtual_trim, VirtualTrimError
+from services.video_service.transcode_jobs import (
+    ensure_transcode_job, get_transcode_status, ensure_hls_job, get_hls_status, start_progressive_relay,
+    ensure_thumbnail_job, get_thumbnail_status
+)
 from services.zoom_service.create_task_for_download import cancel_scheduled_task
 from services.zoom_service.meet_create.util import process_conference_data, converted_conference_from_file
 from services.zoom_service.meet_delete.zoom_meeting_delete_api import delete_meeting
@@ -64,7 +83,8 @@ async def check_authentication(request: Request, call_next):
     # Проверяем токен
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        request.state.user = payload.get("sub")  # Сохраняем информацию о пользователе в `request.state`
+        # Сохраняем email пользователя в `request.state`: обработчики получают пользователя через get_current_user
+        request.state.user = payload.get("sub")
     except jwt.ExpiredSignatureError:
         return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Token has expired"})
     except jwt.PyJWTError:
@@ -77,8 +97,7 @@ async def check_authentication(request: Request, call_next):
 
 '''####################################'''
 
-address = f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}"
-client = MongoClient(address)
+client = get_client()
 db = client.mds_workspace
 conference_videos = db.conference_videos
 
@@ -98,14 +117,6 @@ app.add_middleware(
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-lms_courses_file_path = 'services/lms_services/lms_courses.json'
-kinescope_folders_file_path = "services/kinescope_services/kinescope_folders.json"
-zoom_meetings_file_path = 'services/zoom_service/meet_create/zoom_meetings.json'
-linking_channels_file_path = 'services/telegram_services/linking_channels.json'
-sheets_data_file_path = "services/schedule_service/sheets_data.json"
-lecture_on_platform_file_path = "services/schedule_service/lecture_on_platform.json"
-
-
 class UserRegistration(BaseModel):
     firstName: str
     lastName: str
@@ -118,13 +129,6 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -139,18 +143,19 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
 @app.post("/api/register/", response_model=Token)
-async def register(user: UserRegistration, db: Session = Depends(get_db)):
+async def register(user: UserRegistration):
     if user.password != user.confirmPassword:
         raise HTTPException(status_code=400, detail="Passwords do not match")
 
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = await run_db(get_user_by_email, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     if user.inviteCode and not validate_invite_code(user.inviteCode):
         raise HTTPException(status_code=400, detail="Invalid invite code")
 
-    hashed_password = bcrypt.hashpw(user.password.encode(), bcrypt.gensalt()).decode('utf-8')
+    # bcrypt намеренно медленный - хэшируем вне event loop
+    hashed_password = (await asyncio.to_thread(bcrypt.hashpw, user.password.encode(), bcrypt.gensalt())).decode('utf-8')
 
     new_user = User(
         first_name=user.firstName,
@@ -159,23 +164,20 @@ async def register(user: UserRegistration, db: Session = Depends(get_db)):
         password=hashed_password
     )
 
-    db.add(new_user)
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
+    if not await run_db(add_user, new_user):
         raise HTTPException(status_code=400, detail="Failed to register user")
+    user_cache.invalidate(user.email)
 
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": new_user.email}, expires_delta=access_token_expires
+        data={"sub": user.email}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/token", response_model=Token)
-async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await run_db(get_user_by_email, form_data.username)
+    if not user or not await asyncio.to_thread(verify_password, form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -190,103 +192,36 @@ async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depen
     return response
 
 @app.get("/api/protected-route")
-async def protected_route(request: Request, db: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
-    if not token:
+async def protected_route(request: Request):
+    # Токен уже проверен в check_authentication
+    user = await resolve_current_user(request)
+    if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
-        user = db.query(User).filter(User.email == email).first()
-        if user is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-
-        return {"email": user.email, "first_name": user.first_name, "last_name": user.last_name}
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return {"email": user.email, "first_name": user.first_name, "last_name": user.last_name}
 
 def validate_invite_code(code: str) -> bool:
     return code == invite_code
 
 @app.get("/api/schedule_service/today_lectures")
-async def get_today_lectures(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        # Декодируем токен
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    # Получаем пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def get_today_lectures(user: CurrentUser = Depends(get_current_user)):
     user_id = user.id
 
     # Получаем сегодняшние лекции
-    filtered_data = get_lectures_main(user_id)
+    filtered_data = await run_blocking(get_lectures_main, user_id)
 
     # Формируем результат из данных о лекциях
-    result = []
-    existing_data = load_json(lecture_on_platform_file_path)
-    for item in existing_data:
-        if item['id'] in [data['id'] for data in filtered_data]:
-            result.append({
-                "id": item['id'],
-                **item['platform_lecture']
-            })
-
-    return result
+    return await platform_lectures_repository.find_platform_lectures(data['id'] for data in filtered_data)
 
 @app.get("/api/schedule_service/archive_lectures")
-async def get_archive_lectures(request: Request, db: Session = Depends(get_db)):
-    # Извлечение токена из cookies
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        # Декодирование токена
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token is invalid")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    # Поиск пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def get_archive_lectures(user: CurrentUser = Depends(get_current_user)):
     user_id = user.id
 
     # Получение архива лекций
-    filtered_data = get_archive_lectures_main(user_id)
+    filtered_data = await run_blocking(get_archive_lectures_main, user_id)
 
     # Формирование результата из platform_lecture
-    result = []
-    existing_data = load_json(lecture_on_platform_file_path)
-    for item in existing_data:
-        if item['id'] in [data['id'] for data in filtered_data]:
-            result.append({
-                "id": item['id'],
-                **item['platform_lecture']
-            })
-
-    return result
+    return await platform_lectures_repository.find_platform_lectures(data['id'] for data in filtered_data)
 
 @app.put("/api/schedule_service/update_lecture")
 async def update_lecture(request: Request):
@@ -296,21 +231,9 @@ async def update_lecture(request: Request):
     if not lecture_id:
         raise HTTPException(status_code=400, detail="Lecture ID is required")
 
-    existing_data = load_json(lecture_on_platform_file_path)
-
-    found = False
-    for item in existing_data:
-        if item['id'] == lecture_id:
-            item['platform_lecture'].update(update_data)
-            found = True
-            break
-
-    if not found:
+    if not await platform_lectures_repository.update_platform_lecture(lecture_id, update_data):
         raise HTTPException(status_code=404, detail="Lecture ID not found")
 
-    with open(lecture_on_platform_file_path, 'w', encoding='utf-8') as file:
-        json.dump(existing_data, file, ensure_ascii=False, indent=4)
-
     return {"detail": "Lecture updated successfully"}
 
 @app.post("/api/schedule_service/reset_lecture")
@@ -322,39 +245,15 @@ async def reset_lecture(request: Request):
     if not lecture_id:
         raise HTTPException(status_code=400, detail="Lecture ID is required")
 
-    existing_data = load_json(lecture_on_platform_file_path)
-
-    found = False
-    for item in existing_data:
-        if item['id'] == lecture_id:
-            item['platform_lecture'] = item['google_sheets']
-            found = True
-            break
-
-    if not found:
+    if not await platform_lectures_repository.reset_platform_lecture(lecture_id):
         raise HTTPException(status_code=404, detail="Lecture ID not found")
 
-    with open(lecture_on_platform_file_path, 'w', encoding='utf-8') as file:
-        json.dump(existing_data, file, ensure_ascii=False, indent=4)
-
     return {"detail": "Lecture reset successfully"}
 
 from fastapi import Header, Cookie
 
 @app.post("/api/zoom_service/create_meet")
-async def create_meet(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
+async def create_meet(request: Request, user: CurrentUser = Depends(get_current_user)):
     data = await request.json()
     conference_id = data.get('conference_id')
     force_recreate = data.get('force_recreate', False)
@@ -363,142 +262,81 @@ async def create_meet(request: Request, db: Session = Depends(get_db)):
     if not conference_id:
         raise HTTPException(status_code=400, detail="Conference ID is required")
 
-    # Получение пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     # Получение данных о лекции
-    lecture_data = get_lecture_data(conference_id)
+    lecture_data = await platform_lectures_repository.get_platform_lecture(conference_id)
     if not lecture_data:
         raise HTTPException(status_code=404, detail="Lecture not found")
 
     # Проверка наличия конференции
-    if not force_recreate and check_conference_exists(conference_id):
+    if not force_recreate and await check_conference_exists(conference_id):
         return {'status': 'conference_already_exists'}
 
-    # Чтение существующих данных из файла
-    try:
-        with open(zoom_meetings_file_path, 'r', encoding='utf-8') as file:
-            existing_data = json.load(file)
-    except FileNotFoundError:
-        existing_data = {}
-    except json.JSONDecodeError:
-        existing_data = {}
-
     # Извлечение и очистка stream
     stream = lecture_data.get('stream', '').strip().replace('\n', ' ')
 
-    # Создание JSON-документа для Zoom конференции
-    zoom_meeting_data = {
-        str(conference_id): {
-            "user_id": user.id,
-            "tags": [stream],  # Добавляем очищенный stream в массив tags
-            "meeting_info": lecture_data
-        }
-    }
-
-    # Обновление данных или добавление новой записи
-    existing_data.update(zoom_meeting_data)
-
-    # Сохранение данных в файл
-    with open(zoom_meetings_file_path, 'w', encoding='utf-8') as file:
-        json.dump(existing_data, file, ensure_ascii=False, indent=4)
+    # Документ Zoom конференции (заменяет прежний целиком)
+    await zoom_meetings_repository.save_conference(conference_id, {
+        "user_id": user.id,
+        "tags": [stream],  # Добавляем очищенный stream в массив tags
+        "meeting_info": lecture_data
+    })
 
-    response = converted_conference_from_file(conference_id)
+    response = await run_blocking(converted_conference_from_file, conference_id)
 
     return response
 
-def get_lecture_data(conference_id):
-    existing_data = load_json(lecture_on_platform_file_path)
-
-    for item in existing_data:
-        if item['id'] == conference_id:
-            return item['platform_lecture']
-    return None
-
 
 
 @app.get("/api/zoom_service/get_conference_data")
-async def get_conference_data(conference_id: int, request: Request, db: Session = Depends(get_db)):
-    # Извлечение токена из cookies
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        # Декодирование токена
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token is invalid")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    # Поиск пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Продолжение оригинальной логики
-    with open(zoom_meetings_file_path, 'r', encoding='utf-8') as file:
-        zoom_meetings = json.load(file)
-
+async def get_conference_data(conference_id: int, user: CurrentUser = Depends(get_current_user)):
     conference_id_str = str(conference_id)  # Преобразование conference_id в строку
 
-    # Убедимся, что структура данных представляет собой словарь
-    if isinstance(zoom_meetings, dict):
-        # Первоначальная проверка на наличие conference_id
-        if conference_id_str in zoom_meetings:
-            formed_conference = zoom_meetings[conference_id_str].get("formed_conference", {})
-            if formed_conference:
-                children_lecture_ids = formed_conference.get("children_lecture_id", [])
-                meeting_details = formed_conference.get("meeting_details", [{}])[0]
-                response_data = {
-                    "children_lecture_ids": children_lecture_ids,
-                    "speaker": meeting_details.get("speaker"),
-                    "theme": meeting_details.get("theme"),
-                    "topic": meeting_details.get("topic"),
-                    "email": meeting_details.get("email"),
-                    "date": meeting_details.get("date"),
-                    "link": meeting_details.get("link"),
-                    "time_meeting": meeting_details.get("time_meeting"),
-                    "id": meeting_details.get("id"),
-                    "code": meeting_details.get("code"),
-                    "inherited": False,
-                    "conference_key": conference_id_str,  # Добавляем ключ конференции
-                    "tags": zoom_meetings[conference_id_str].get("tags", [])
-                }
-                return {"meeting_details": [response_data]}
-
-        # Проверка всех записей на наличие совпадения по children_lecture_id
-        for key, value in zoom_meetings.items():
-            children_lecture_ids = value.get("formed_conference", {}).get("children_lecture_id", [])
-            if isinstance(children_lecture_ids, list) and conference_id_str in children_lecture_ids:
-                formed_conference = value.get("formed_conference", {})
-                if formed_conference:
-                    meeting_details = formed_conference.get("meeting_details", [{}])[0]
-                    response_data = {
-                        "speaker": meeting_details.get("speaker"),
-                        "theme": meeting_details.get("theme"),
-                        "topic": meeting_details.get("topic"),
-                        "email": meeting_details.get("email"),
-                        "date": meeting_details.get("date"),
-                        "link": meeting_details.get("link"),
-                        "time_meeting": meeting_details.get("time_meeting"),
-                        "id": meeting_details.get("id"),
-                        "code": meeting_details.get("code"),
-                        "inherited": True,
-                        "conference_key": key,  # Добавляем ключ главной конференции
-                        "tags": zoom_meetings[key].get("tags", [])
-                    }
-                    return {"meeting_details": [response_data]}
-
-        return {"message": "Данные для конференции не найдены"}
-    else:
-        raise HTTPException(status_code=404, detail="Conference ID not found")
+    conference = await zoom_meetings_repository.find_conference(conference_id_str)
+    # Первоначальная проверка на наличие conference_id
+    if conference:
+        formed_conference = conference.get("formed_conference", {})
+        if formed_conference:
+            children_lecture_ids = formed_conference.get("children_lecture_id", [])
+            meeting_details = formed_conference.get("meeting_details", [{}])[0]
+            response_data = {
+                "children_lecture_ids": children_lecture_ids,
+                "speaker": meeting_details.get("speaker"),
+                "theme": meeting_details.get("theme"),
+                "topic": meeting_details.get("topic"),
+                "email": meeting_details.get("email"),
+                "date": meeting_details.get("date"),
+                "link": meeting_details.get("link"),
+                "time_meeting": meeting_details.get("time_meeting"),
+                "id": meeting_details.get("id"),
+                "code": meeting_details.get("code"),
+                "inherited": False,
+                "conference_key": conference_id_str,  # Добавляем ключ конференции
+                "tags": conference.get("tags", [])
+            }
+            return {"meeting_details": [response_data]}
+
+    # Поиск родительской конференции, к которой привязана лекция
+    parent = await zoom_meetings_repository.find_parent(conference_id_str)
+    if parent:
+        formed_conference = parent["formed_conference"]
+        meeting_details = formed_conference.get("meeting_details", [{}])[0]
+        response_data = {
+            "speaker": meeting_details.get("speaker"),
+            "theme": meeting_details.get("theme"),
+            "topic": meeting_details.get("topic"),
+            "email": meeting_details.get("email"),
+            "date": meeting_details.get("date"),
+            "link": meeting_details.get("link"),
+            "time_meeting": meeting_details.get("time_meeting"),
+            "id": meeting_details.get("id"),
+            "code": meeting_details.get("code"),
+            "inherited": True,
+            "conference_key": parent["_id"],  # Добавляем ключ главной конференции
+            "tags": parent.get("tags", [])
+        }
+        return {"meeting_details": [response_data]}
+
+    return {"message": "Данные для конференции не найдены"}
 
 
 from fastapi import Request
@@ -511,30 +349,21 @@ class ConferenceDataRequest(BaseModel):
 
 
 @app.post("/api/zoom_service/get_all_conference_data")
-async def get_all_conference_data(request: Request, data: ConferenceDataRequest, db: Session = Depends(get_db)):
+async def get_all_conference_data(request: Request, data: ConferenceDataRequest, user: CurrentUser = Depends(get_current_user)):
     conference_ids = data.conference_ids
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token is invalid")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
+    revision = await store_revisions.get_revision([zoom_meetings_repository.revision_name])
+    return await response_cache.respond(
+        request, ("get_all_conference_data", tuple(conference_ids)), revision,
+        lambda: build_all_conference_data(conference_ids)
+    )
 
-    # Поиск пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
 
-    # Чтение данных конференций из файла
-    with open(zoom_meetings_file_path, 'r', encoding='utf-8') as file:
-        zoom_meetings = json.load(file)
+async def build_all_conference_data(conference_ids):
+    # Конференции, запрошенные напрямую, и родители остальных лекций - по одному запросу на всех
+    conferences = await zoom_meetings_repository.find_conferences(conference_ids)
+    parents = await zoom_meetings_repository.find_parents(
+        conference_id for conference_id in conference_ids if str(conference_id) not in conferences
+    )
 
     conference_data = {}
 
@@ -542,70 +371,56 @@ async def get_all_conference_data(request: Request, data: ConferenceDataRequest,
     for conference_id in conference_ids:
         conference_id_str = str(conference_id)
 
-        if isinstance(zoom_meetings, dict):
-            # Если ID найден напрямую
-            if conference_id_str in zoom_meetings:
-                formed_conference = zoom_meetings[conference_id_str].get("formed_conference", {})
-                if formed_conference:
-                    children_lecture_ids = formed_conference.get("children_lecture_id", [])
-                    meeting_details = formed_conference.get("meeting_details", [{}])[0]
-                    response_data = {
-                        "children_lecture_ids": children_lecture_ids,
-                        "speaker": meeting_details.get("speaker"),
-                        "theme": meeting_details.get("theme"),
-                        "topic": meeting_details.get("topic"),
-                        "email": meeting_details.get("email"),
-                        "date": meeting_details.get("date"),
-                        "link": meeting_details.get("link"),
-                        "time_meeting": meeting_details.get("time_meeting"),
-                        "id": meeting_details.get("id"),
-                        "code": meeting_details.get("code"),
-                        "inherited": False,
-                        "conference_key": conference_id_str,
-                        "tags": zoom_meetings[conference_id_str].get("tags", [])
-                    }
-                    conference_data[conference_id_str] = {"meeting_details": [response_data]}
-            else:
-                for key, value in zoom_meetings.items():
-                    children_lecture_ids = value.get("formed_conference", {}).get("children_lecture_id", [])
-                    if isinstance(children_lecture_ids, list) and conference_id_str in children_lecture_ids:
-                        formed_conference = value.get("formed_conference", {})
-                        if formed_conference:
-                            meeting_details = formed_conference.get("meeting_details", [{}])[0]
-                            response_data = {
-                                "speaker": meeting_details.get("speaker"),
-                                "theme": meeting_details.get("theme"),
-                                "topic": meeting_details.get("topic"),
-                                "email": meeting_details.get("email"),
-                                "date": meeting_details.get("date"),
-                                "link": meeting_details.get("link"),
-                                "time_meeting": meeting_details.get("time_meeting"),
-                                "id": meeting_details.get("id"),
-                                "code": meeting_details.get("code"),
-                                "inherited": True,
-                                "conference_key": key,
-                                "tags": zoom_meetings[key].get("tags", [])
-                            }
-                            conference_data[conference_id_str] = {"meeting_details": [response_data]}
+        # Если ID найден напрямую
+        if conference_id_str in conferences:
+            conference = conferences[conference_id_str]
+            formed_conference = conference.get("formed_conference", {})
+            if formed_conference:
+                children_lecture_ids = formed_conference.get("children_lecture_id", [])
+                meeting_details = formed_conference.get("meeting_details", [{}])[0]
+                response_data = {
+                    "children_lecture_ids": children_lecture_ids,
+                    "speaker": meeting_details.get("speaker"),
+                    "theme": meeting_details.get("theme"),
+                    "topic": meeting_details.get("topic"),
+                    "email": meeting_details.get("email"),
+                    "date": meeting_details.get("date"),
+                    "link": meeting_details.get("link"),
+                    "time_meeting": meeting_details.get("time_meeting"),
+                    "id": meeting_details.get("id"),
+                    "code": meeting_details.get("code"),
+                    "inherited": False,
+                    "conference_key": conference_id_str,
+                    "tags": conference.get("tags", [])
+                }
+                conference_data[conference_id_str] = {"meeting_details": [response_data]}
+        elif conference_id_str in parents:
+            parent = parents[conference_id_str]
+            meeting_details = parent["formed_conference"].get("meeting_details", [{}])[0]
+            response_data = {
+                "speaker": meeting_details.get("speaker"),
+                "theme": meeting_details.get("theme"),
+                "topic": meeting_details.get("topic"),
+                "email": meeting_details.get("email"),
+                "date": meeting_details.get("date"),
+                "link": meeting_details.get("link"),
+                "time_meeting": meeting_details.get("time_meeting"),
+                "id": meeting_details.get("id"),
+                "code": meeting_details.get("code"),
+                "inherited": True,
+                "conference_key": parent["_id"],
+                "tags": parent.get("tags", [])
+            }
+            conference_data[conference_id_str] = {"meeting_details": [response_data]}
 
     return conference_data
 
 class ConferenceIdsRequest(BaseModel):
     conference_ids: List[int]
 
-def check_conference_exists(conference_id):
-    try:
-        with open(zoom_meetings_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        print("File not found.")
-        return False
-    except json.JSONDecodeError:
-        print("Error decoding JSON or file is empty.")
-        return False
-
-    conference_id_str = str(conference_id)
-    if conference_id_str in data and 'formed_conference' in data[conference_id_str]:
+async def check_conference_exists(conference_id):
+    conference = await zoom_meetings_repository.find_conference(conference_id)
+    if conference and 'formed_conference' in conference:
         print(f"Conference {conference_id} exists with formed conference data.")
         return True
     else:
@@ -614,17 +429,13 @@ def check_conference_exists(conference_id):
 
 
 @app.get("/api/telegram_service/get_channels")
-async def get_channels():
-    try:
-        with open(linking_channels_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        channels = data.get("couples", {})
-        global_exclude = data.get("global_exclude", [])
-        return {"channels": channels, "global_exclude": global_exclude}
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="linking_channels.json file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON linking_channels.json")
+async def get_channels(request: Request):
+    async def build():
+        data = await telegram_channels_repository.get_structure()
+        return {"channels": data["couples"], "global_exclude": data["global_exclude"]}
+
+    revision = await store_revisions.get_revision(telegram_channels_repository.revision_names)
+    return await response_cache.respond(request, "get_channels", revision, build)
 
 @app.post("/api/telegram_service/update_channel_exclude")
 async def update_channel_exclude(request: Request):
@@ -635,89 +446,34 @@ async def update_channel_exclude(request: Request):
     if not channel_id or action not in ["add", "remove"]:
         raise HTTPException(status_code=400, detail="Invalid data")
 
-
-    try:
-        with open(linking_channels_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Channels file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON")
-
-    if action == "add" and channel_id not in data["global_exclude"]:
-        data["global_exclude"].append(channel_id)
-    elif action == "remove" and channel_id in data["global_exclude"]:
-        data["global_exclude"].remove(channel_id)
-
-    with open(linking_channels_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
-
-    return {"global_exclude": data["global_exclude"]}
+    global_exclude = await linking_channels_settings.set_global_exclude(channel_id, action == "add")
+    return {"global_exclude": global_exclude}
 
 @app.get("/api/get_unique_tags")
-async def get_unique_tags(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        # Декодирование токена
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token is invalid")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    # Поиск пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_unique_tags(request: Request, user: CurrentUser = Depends(get_current_user)):
+    async def build():
+        # Загрузка уникальных тегов
+        data = await sheets_data_store.read_async()
 
-    # Загрузка уникальных тегов
-    with open(sheets_data_file_path, "r", encoding="utf-8") as file:
-        data = json.load(file)
+        unique_tags = set()
+        for key in data:
+            for item in data[key]:
+                tag = item['data'][0].replace('\n', ' ').strip()
+                unique_tags.add(tag)
 
-    unique_tags = set()
-    for key in data:
-        for item in data[key]:
-            tag = item['data'][0].replace('\n', ' ').strip()
-            unique_tags.add(tag)
+        return {"tags": list(unique_tags)}
 
-    return {"tags": list(unique_tags)}
+    revision = await sheets_data_store.revision_async()
+    return await response_cache.respond(request, "get_unique_tags", revision, build)
 
 @app.post("/api/telegram_service/update_channel_tags")
 async def update_channel_tags(channel_id: str = Body(...), tags: list = Body(...)):
-    try:
-        with open(linking_channels_file_path, "r+", encoding="utf-8") as file:
-            data = json.load(file)
-            if channel_id in data["couples"]:
-                data["couples"][channel_id]["tags"] = tags
-                file.seek(0)
-                json.dump(data, file, ensure_ascii=False, indent=4)
-                file.truncate()
-                return {"channel_id": channel_id, "tags": tags}
-            else:
-                raise HTTPException(status_code=404, detail="Channel not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if await telegram_channels_repository.set_tags(channel_id, tags) is None:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    return {"channel_id": channel_id, "tags": tags}
 
 @app.post("/api/telegram_service/update_user_channel")
-async def update_user_channel(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
+async def update_user_channel(request: Request, user: CurrentUser = Depends(get_current_user)):
     data = await request.json()
     channel_id = data.get('channel_id')
     action = data.get('action')
@@ -725,70 +481,21 @@ async def update_user_channel(request: Request, db: Session = Depends(get_db)):
     if not channel_id or not action:
         raise HTTPException(status_code=400, detail="Channel ID and action are required")
 
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     user_id = str(user.id)
-    print(f"Channel ID: {channel_id}, Email: {email}, Action: {action}")
-
-    try:
-        with open(linking_channels_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-
-        if action == 'add':
-            if user_id in data["users_include"]:
-                if channel_id not in data["users_include"][user_id]:
-                    data["users_include"][user_id].append(channel_id)
-            else:
-                data["users_include"][user_id] = [channel_id]
-        elif action == 'remove':
-            if user_id in data["users_include"]:
-                if channel_id in data["users_include"][user_id]:
-                    data["users_include"][user_id].remove(channel_id)
+    print(f"Channel ID: {channel_id}, Email: {user.email}, Action: {action}")
 
-        with open(linking_channels_file_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
+    if action in ('add', 'remove'):
+        await linking_channels_settings.set_user_item(user_id, channel_id, action == 'add')
 
-        return {"message": "Status updated successfully"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"message": "Status updated successfully"}
 
 @app.post("/api/telegram_service/log_user_email")
-async def log_user_email(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    # Находим пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        print(f"User with Email: {email} not found")
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def log_user_email(user: CurrentUser = Depends(get_current_user)):
     user_id = user.id
-    print(f"User ID: {user_id}, Email: {email}")
-
-    # Читаем данные из файла linking_channels.json
-    try:
-        with open(linking_channels_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Linking channels file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON")
+    print(f"User ID: {user_id}, Email: {user.email}")
 
     # Получаем массив с ID каналов для данного пользователя
-    user_channels = data.get('users_include', {}).get(str(user_id), [])
+    user_channels = await linking_channels_settings.get_user_list(user_id)
     print(f"Channels for User ID {user_id}: {user_channels}")
 
     return {"user_channels": user_channels}
@@ -797,34 +504,11 @@ async def log_user_email(request: Request, db: Session = Depends(get_db)):
 from fastapi import Header, Cookie
 
 @app.post("/api/user_channels")
-async def get_user_channels(access_token: str = Cookie(None), db: Session = Depends(get_db)):
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def get_user_channels(user: CurrentUser = Depends(get_current_user)):
     user_id = user.id
 
-    try:
-        with open(linking_channels_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Linking channels file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON")
-
-    user_channels = data.get('users_include', {}).get(str(user_id), [])
-    channel_info = {channel_id: data["couples"].get(channel_id) for channel_id in user_channels}
+    user_channels = await linking_channels_settings.get_user_list(user_id)
+    channel_info = await telegram_channels_repository.get_items_by_ids(user_channels)
 
     return {"user_channels": channel_info}
 
@@ -837,39 +521,17 @@ async def remove_tags(request: Request):
     if not conference_id or not tags:
         raise HTTPException(status_code=400, detail="Conference ID and tags are required")
 
-    try:
-        with open(zoom_meetings_file_path, 'r+', encoding='utf-8') as file:
-            data = json.load(file)
-            if conference_id in data:
-                existing_tags = data[conference_id].get("tags", [])
-                updated_tags = [tag for tag in existing_tags if tag not in tags]
-                data[conference_id]["tags"] = updated_tags
-                file.seek(0)
-                json.dump(data, file, ensure_ascii=False, indent=4)
-                file.truncate()
-                return {"conference_id": conference_id, "tags": updated_tags}
-            else:
-                raise HTTPException(status_code=404, detail="Conference not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    conference = await zoom_meetings_repository.remove_tags(conference_id, tags)
+    if conference is None:
+        raise HTTPException(status_code=404, detail="Conference not found")
+    return {"conference_id": conference_id, "tags": conference.get("tags", [])}
 
 @app.post("/api/zoom_service/add_tags")
 async def add_tags(conference_id: str = Body(...), tags: list = Body(...)):
-    try:
-        with open(zoom_meetings_file_path, 'r+', encoding='utf-8') as file:
-            data = json.load(file)
-            if conference_id in data:
-                existing_tags = data[conference_id].get("tags", [])
-                updated_tags = list(set(existing_tags + tags))
-                data[conference_id]["tags"] = updated_tags
-                file.seek(0)
-                json.dump(data, file, ensure_ascii=False, indent=4)
-                file.truncate()
-                return {"conference_id": conference_id, "tags": updated_tags}
-            else:
-                raise HTTPException(status_code=404, detail="Conference not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    conference = await zoom_meetings_repository.add_tags(conference_id, tags)
+    if conference is None:
+        raise HTTPException(status_code=404, detail="Conference not found")
+    return {"conference_id": conference_id, "tags": conference.get("tags", [])}
 
 @app.post("/api/zoom_service/update_children_lectures")
 async def update_children_lectures(request: Request):
@@ -881,49 +543,20 @@ async def update_children_lectures(request: Request):
     if not parent_id or not children_ids:
         raise HTTPException(status_code=400, detail="Parent ID and Children IDs are required")
 
-    try:
-        with open(zoom_meetings_file_path, 'r+', encoding='utf-8') as file:
-            zoom_meetings = json.load(file)
-
-            if parent_id in zoom_meetings:
-                zoom_meetings[parent_id]['formed_conference']['children_lecture_id'] = children_ids
-
-                # Сохраняем обновленные данные обратно в файл
-                file.seek(0)
-                json.dump(zoom_meetings, file, ensure_ascii=False, indent=4)
-                file.truncate()
-
-                # Возвращаем обновленные данные конференции
-                response_data = zoom_meetings[parent_id]['formed_conference']
-                return response_data
-            else:
-                raise HTTPException(status_code=404, detail="Parent Conference not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Возвращаем обновленные данные конференции
+    formed_conference = await zoom_meetings_repository.set_children(parent_id, children_ids)
+    if formed_conference is None:
+        raise HTTPException(status_code=404, detail="Parent Conference not found")
+    return formed_conference
 
 @app.post("/api/zoom_service/remove_child_lecture")
 async def remove_child_lecture(parent_id: int = Body(...), child_id: int = Body(...)):
-    with open(zoom_meetings_file_path, 'r+', encoding='utf-8') as file:
-        zoom_meetings = json.load(file)
+    print(parent_id, child_id)
 
-        parent_id_str = str(parent_id)
-        child_id_str = str(child_id)
-        print(parent_id_str, child_id_str)
+    if await zoom_meetings_repository.remove_child(parent_id, child_id):
+        return {"status": "success", "message": "Child lecture removed successfully"}
 
-        if parent_id_str in zoom_meetings:
-            children_lecture_ids = zoom_meetings[parent_id_str].get('formed_conference', {}).get('children_lecture_id',
-                                                                                                 [])
-            if child_id_str in children_lecture_ids:
-                children_lecture_ids.remove(child_id_str)
-                zoom_meetings[parent_id_str]['formed_conference']['children_lecture_id'] = children_lecture_ids
-
-                file.seek(0)
-                json.dump(zoom_meetings, file, ensure_ascii=False, indent=4)
-                file.truncate()
-
-                return {"status": "success", "message": "Child lecture removed successfully"}
-
-        raise HTTPException(status_code=404, detail="Parent or child lecture not found")
+    raise HTTPException(status_code=404, detail="Parent or child lecture not found")
 class DeleteConferenceRequest(BaseModel):
     conference_id: str
     email: str
@@ -937,25 +570,18 @@ async def delete_conference(request: DeleteConferenceRequest):
     email = request.email
     meeting_id = request.meeting_id
     try:
-        with open(zoom_meetings_file_path, 'r+', encoding='utf-8') as file:
-            zoom_meetings = json.load(file)
-
-            if conference_id in zoom_meetings:
-                del zoom_meetings[conference_id]
-
-                file.seek(0)
-                json.dump(zoom_meetings, file, ensure_ascii=False, indent=4)
-                file.truncate()
+        if not await zoom_meetings_repository.delete_conference(conference_id):
+            raise HTTPException(status_code=404, detail="Conference not found")
 
-                zoom_delete_result = delete_meeting(email, meeting_id)
-                cancel_scheduled_task(meeting_id)
+        zoom_delete_result = delete_meeting(email, meeting_id)
+        cancel_scheduled_task(meeting_id)
 
-                if zoom_delete_result:
-                    return {"status": "success", "message": "Конференция успешна удалена в Zoom"}
-                else:
-                    return {"status": "partial_success", "message": "Ошибка при удалении конференции в Zoom. \n Пожалуйста, зайди в Zoom и удали вручную"}
-            else:
-                raise HTTPException(status_code=404, detail="Conference not found")
+        if zoom_delete_result:
+            return {"status": "success", "message": "Конференция успешна удалена в Zoom"}
+        else:
+            return {"status": "partial_success", "message": "Ошибка при удалении конференции в Zoom. \n Пожалуйста, зайди в Zoom и удали вручную"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -963,16 +589,10 @@ async def delete_conference(request: DeleteConferenceRequest):
 class DownloadRequest(BaseModel):
     file_id: str
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @app.on_event("startup")
 def on_startup():
     init_db()
+    ensure_indexes()
 def get_file_title(file_url):
     try:
         response = requests.get(file_url)
@@ -992,7 +612,7 @@ def get_file_title(file_url):
         return f"Error: {e}"
 
 @app.post("/api/download/")
-async def start_download(request: DownloadRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def start_download(request: DownloadRequest, background_tasks: BackgroundTasks):
     print(f"Received download request for file_id: {request.file_id}")
 
     file_url = f'https://drive.google.com/file/d/{request.file_id}/view'
@@ -1002,10 +622,10 @@ async def start_download(request: DownloadRequest, background_tasks: BackgroundT
 
     file_type = "mp4"
 
-    video_download = VideoDownload(file_id=request.file_id, file_name=file_title, file_type=file_type, download_status=0)
-    db.add(video_download)
-    db.commit()
-    db.refresh(video_download)
+    video_download = await run_db(
+        add_download,
+        VideoDownload(file_id=request.file_id, file_name=file_title, file_type=file_type, download_status=0)
+    )
 
     def run_download_script(file_id):
         script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'services/google_services/download_video_service/download_script.py')
@@ -1017,17 +637,15 @@ async def start_download(request: DownloadRequest, background_tasks: BackgroundT
             print(f"Script output: {result.stdout}")
 
     background_tasks.add_task(run_download_script, request.file_id)
-    return {"message": "Download started", "id": video_download.id, "file_name": video_download.file_name, "file_type": video_download.file_type}
+    return {"message": "Download started", "id": video_download["id"], "file_name": video_download["file_name"], "file_type": video_download["file_type"]}
 
 @app.get("/api/downloads/")
-async def get_downloads(db: Session = Depends(get_db)):
-    downloads = db.query(VideoDownload).all()
-    return downloads
+async def get_downloads():
+    return await run_db(list_downloads)
 
 @app.delete("/api/download/{file_id}")
-async def delete_download(file_id: str, db: Session = Depends(get_db)):
-    video_download = db.query(VideoDownload).filter_by(file_id=file_id).first()
-    if not video_download:
+async def delete_download(file_id: str):
+    if not await run_db(get_download, file_id):
         raise HTTPException(status_code=404, detail="Download not found")
 
     # Удаление файла с диска
@@ -1044,45 +662,21 @@ async def delete_download(file_id: str, db: Session = Depends(get_db)):
         print(f"File {downloads_folder_path} not found on disk.")
 
     # Удаление записи о загрузке из базы данных
-    db.delete(video_download)
-    db.commit()
+    await run_db(delete_download_record, file_id)
     return {"message": "Download deleted"}
 
-def load_existing_structure(file_path):
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    else:
-        return None
-
 @app.get("/api/kinescope-folders")
-async def get_kinescope_folders(request: Request, db: Session = Depends(get_db)):
-
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        # Декодирование токена
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token is invalid")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
+async def get_kinescope_folders(request: Request, user: CurrentUser = Depends(get_current_user)):
 
-    # Поиск пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    async def build():
+        data = await kinescope_folders_repository.get_structure()
+        if data["couples"]:
+            return data
+        else:
+            return {"message": "Data not found"}
 
-    data = load_existing_structure(kinescope_folders_file_path)
-    if data:
-        return data
-    else:
-        return {"message": "Data not found"}
+    revision = await store_revisions.get_revision(kinescope_folders_repository.revision_names)
+    return await response_cache.respond(request, "get_kinescope_folders", revision, build)
 
 class UpdateTagsRequest(BaseModel):
     folder_id: str
@@ -1090,47 +684,22 @@ class UpdateTagsRequest(BaseModel):
 
 @app.post("/api/update_tags")
 async def update_tags(request: UpdateTagsRequest):
-    data = load_existing_structure(kinescope_folders_file_path)
-    if not data or request.folder_id not in data["couples"]:
+    folder = await kinescope_folders_repository.set_tags(request.folder_id, request.tags)
+    if folder is None:
         raise HTTPException(status_code=404, detail="Folder not found")
 
-    data["couples"][request.folder_id]["tags"] = request.tags
-    save_structure(kinescope_folders_file_path, data)
-
-    return data["couples"][request.folder_id]
+    return folder
 
 
 '''ПОТОКИ СТАРОЙ LMS'''
 @app.get("/api/lk_service/get_streams")
-async def get_streams(request: Request, db: Session = Depends(get_db)):
-    # Извлечение токена из cookies
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
+async def get_streams(request: Request, user: CurrentUser = Depends(get_current_user)):
+    async def build():
+        data = await lms_streams_repository.get_structure()
+        return {"streams": data["couples"], "global_exclude": data["global_exclude"]}
 
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token is invalid")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    try:
-        with open(lms_courses_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        streams = data.get("couples", {})
-        global_exclude = data.get("global_exclude", [])
-        return {"streams": streams, "global_exclude": global_exclude}
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="old_lms_courses.json file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON old_lms_courses.json")
+    revision = await store_revisions.get_revision(lms_streams_repository.revision_names)
+    return await response_cache.respond(request, "get_streams", revision, build)
 
 @app.post("/api/lk_service/update_stream_exclude")
 async def update_stream_exclude(request: Request):
@@ -1141,92 +710,29 @@ async def update_stream_exclude(request: Request):
     if not stream_id or action not in ["add", "remove"]:
         raise HTTPException(status_code=400, detail="Invalid data")
 
-    try:
-        with open(lms_courses_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Streams file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON")
-
-    if action == "add" and stream_id not in data["global_exclude"]:
-        data["global_exclude"].append(stream_id)
-    elif action == "remove" and stream_id in data["global_exclude"]:
-        data["global_exclude"].remove(stream_id)
-
-    with open(lms_courses_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
-
-    return {"global_exclude": data["global_exclude"]}
+    global_exclude = await lms_courses_settings.set_global_exclude(stream_id, action == "add")
+    return {"global_exclude": global_exclude}
 
 @app.post("/api/lk_service/update_stream_tags")
 async def update_stream_tags(stream_id: str = Body(...), tags: list = Body(...)):
-    try:
-        with open(lms_courses_file_path, "r+", encoding="utf-8") as file:
-            data = json.load(file)
-            if stream_id in data["couples"]:
-                data["couples"][stream_id]["tags"] = tags
-                file.seek(0)
-                json.dump(data, file, ensure_ascii=False, indent=4)
-                file.truncate()
-                return {"stream_id": stream_id, "tags": tags}
-            else:
-                raise HTTPException(status_code=404, detail="Stream not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if await lms_streams_repository.set_tags(stream_id, tags) is None:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return {"stream_id": stream_id, "tags": tags}
 
 
 @app.post("/api/lk_service/log_user_email")
-async def lk_log_user_email(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    # Находим пользователя по email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        print(f"User with Email: {email} not found")
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def lk_log_user_email(user: CurrentUser = Depends(get_current_user)):
     user_id = user.id
-    print(f"User ID: {user_id}, Email: {email}")
-
-    try:
-        with open(lms_courses_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Linking streams file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON")
+    print(f"User ID: {user_id}, Email: {user.email}")
 
     # Получаем массив с ID каналов для данного пользователя
-    user_streams = data.get('users_include', {}).get(str(user_id), [])
+    user_streams = await lms_courses_settings.get_user_list(user_id)
     print(f"Streams for User ID {user_id}: {user_streams}")
 
     return {"user_streams": user_streams}
 
 @app.post("/api/lk_service/update_user_stream")
-async def update_user_stream(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
+async def update_user_stream(request: Request, user: CurrentUser = Depends(get_current_user)):
     data = await request.json()
     stream_id = data.get('stream_id')
     action = data.get('action')
@@ -1234,35 +740,13 @@ async def update_user_stream(request: Request, db: Session = Depends(get_db)):
     if not stream_id or not action:
         raise HTTPException(status_code=400, detail="Stream ID and action are required")
 
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     user_id = str(user.id)
-    print(f"Stream ID: {stream_id}, Email: {email}, Action: {action}")
-
-    try:
-        with open(lms_courses_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+    print(f"Stream ID: {stream_id}, Email: {user.email}, Action: {action}")
 
-        if action == 'add':
-            if user_id in data["users_include"]:
-                if stream_id not in data["users_include"][user_id]:
-                    data["users_include"][user_id].append(stream_id)
-            else:
-                data["users_include"][user_id] = [stream_id]
-        elif action == 'remove':
-            if user_id in data["users_include"]:
-                if stream_id in data["users_include"][user_id]:
-                    data["users_include"][user_id].remove(stream_id)
+    if action in ('add', 'remove'):
+        await lms_courses_settings.set_user_item(user_id, stream_id, action == 'add')
 
-        with open(lms_courses_file_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
-
-        return {"message": "Status updated successfully"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"message": "Status updated successfully"}
 
 
 '''РАБОТА С ЗАПИСЯМИ КОНФЕРЕНЦИЙ В ZOOM'''
@@ -1282,18 +766,10 @@ async def get_conference_video_list(request: Request):
     lecture_id = str(data.get('lectureId'))
     print(f"Received lecture ID: {lecture_id}")
 
-    # Загрузка данных из zoom_meetings.json
-    try:
-        with open(zoom_meetings_file_path, 'r', encoding='utf-8') as file:
-            zoom_meetings = json.load(file)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="zoom_meetings.json file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON")
-
     # Поиск структуры по lecture_id
-    if lecture_id in zoom_meetings:
-        meeting_details = zoom_meetings[lecture_id].get("formed_conference", {}).get("meeting_details", [])
+    conference = await zoom_meetings_repository.find_conference(lecture_id)
+    if conference:
+        meeting_details = conference.get("formed_conference", {}).get("meeting_details", [])
         if meeting_details:
             meeting_id = meeting_details[0].get("id", "")
             email = meeting_details[0].get("email", "")
@@ -1323,7 +799,7 @@ async def get_conference_video_list(request: Request):
             print(f"Start Time UTC: {start_time_utc}, End Time UTC: {end_time_utc}")
 
             # Получение данных из базы данных
-            meeting_data_from_db = conference_videos.find_one({"meeting_id": meeting_id_cleaned})
+            meeting_data_from_db = await conference_videos_repository.find_by_meeting_id(meeting_id_cleaned)
 
             if not meeting_data_from_db:
                 return {"status_code": 204, "message": "No data found for this meeting ID in the database."}
@@ -1363,13 +839,10 @@ async def get_conference_video_list(request: Request):
         else:
             return {"status_code": 204, "message": "Meeting details not found."}
     else:
-        return {"status_code": 404, "message": "Lecture ID not found in zoom_meetings.json."}
+        return {"status_code": 404, "message": "Lecture ID not found in zoom_meetings."}
 
 
 
-schedule_file_path = "services/schedule_service/exclude_settings.json"
-
-
 class UpdateExcludeRequest(BaseModel):
     schedule_id: str
     action: str
@@ -1383,26 +856,9 @@ class EmailRequest(BaseModel):
     email: str
 
 @app.get("/api/schedule/get_schedules")
-async def get_schedules(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token is invalid")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    try:
-        with open(schedule_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+async def get_schedules(request: Request, user: CurrentUser = Depends(get_current_user)):
+    async def build():
+        data = await schedule_settings_repository.get_settings()
         for schedule in data.get("schedules", []):
             if 'name' not in schedule:
                 schedule['name'] = "Unnamed"
@@ -1412,123 +868,46 @@ async def get_schedules(request: Request, db: Session = Depends(get_db)):
             "users_exclude": data.get("users_exclude", {}),
             "all_lists": data.get("all_lists", [])
         }
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Schedule file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON")
+
+    revision = await store_revisions.get_revision([schedule_settings_repository.revision_name])
+    return await response_cache.respond(request, "get_schedules", revision, build)
 
 @app.post("/api/schedule/log_user_email")
-async def log_user_email(request: Request, db: Session = Depends(get_db)):
+async def log_user_email(user: CurrentUser = Depends(get_current_user)):
     """
     Получить расписания, которые добавил пользователь.
     """
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    user_id = str(user.id)
-    try:
-        with open(schedule_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-
-        user_schedules = data.get('users_exclude', {}).get(user_id, [])
-        return {"user_schedules": user_schedules}
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Schedule file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding JSON")
+    user_schedules = await schedule_settings_repository.get_user_list(user.id)
+    return {"user_schedules": user_schedules}
 
 @app.post("/api/schedule_service/update_schedule_exclude")
 async def update_schedule_exclude(request: UpdateExcludeRequest):
     """
     Обновление статуса включения или исключения расписания.
     """
-    try:
-        with open(schedule_file_path, 'r+', encoding='utf-8') as file:
-            data = json.load(file)
-            schedule_id = request.schedule_id
-            action = request.action
-
-            if action == "add":
-                if schedule_id not in data["global_exclude"]:
-                    data["global_exclude"].append(schedule_id)
-            elif action == "remove":
-                if schedule_id in data["global_exclude"]:
-                    data["global_exclude"].remove(schedule_id)
-            else:
-                raise HTTPException(status_code=400, detail="Invalid action")
-
-            file.seek(0)
-            json.dump(data, file, ensure_ascii=False, indent=4)
-            file.truncate()
+    if request.action not in ("add", "remove"):
+        raise HTTPException(status_code=400, detail="Invalid action")
 
-            return {"global_exclude": data["global_exclude"]}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    global_exclude = await schedule_settings_repository.set_global_exclude(request.schedule_id, request.action == "add")
+    return {"global_exclude": global_exclude}
 
 
 @app.post("/api/schedule_service/update_user_schedule")
 async def update_user_schedule(
-    request: Request,
     update_request: UpdateUserScheduleRequest,
-    db: Session = Depends(get_db)
+    user: CurrentUser = Depends(get_current_user)
 ):
     """
     Обновление расписаний пользователя.
     """
-    # Получаем токен из запроса
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Token missing")
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Token is invalid")
-
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     user_id = str(user.id)
     schedule_id = update_request.schedule_id
     action = update_request.action
 
-    try:
-        with open(schedule_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-
-        if action == 'add':
-            if user_id in data["users_exclude"]:
-                if schedule_id not in data["users_exclude"][user_id]:
-                    data["users_exclude"][user_id].append(schedule_id)
-            else:
-                data["users_exclude"][user_id] = [schedule_id]
-        elif action == 'remove':
-            if user_id in data["users_exclude"]:
-                if schedule_id in data["users_exclude"][user_id]:
-                    data["users_exclude"][user_id].remove(schedule_id)
-
-        with open(schedule_file_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
+    if action in ('add', 'remove'):
+        await schedule_settings_repository.set_user_item(user_id, schedule_id, action == 'add')
 
-        return {"message": "Status updated successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"message": "Status updated successfully"}
 
 
 #####################################
@@ -1537,7 +916,7 @@ async def update_user_schedule(
 
 def get_mongo_collections():
     """Инициализация подключения к MongoDB и GridFS коллекциям."""
-    client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
+    client = get_client()
     db = client['zoom_files']
     screen_fs = GridFS(db, collection='shared_screen_with_speaker_view')
     audio_fs = GridFS(db, collection='audio_only')
@@ -1545,104 +924,186 @@ def get_mongo_collections():
     return screen_fs, audio_fs, chat_fs
 
 
-@app.get("/api/get-recording")
-async def get_recording(recording_id: str, conference_uuid: str, range: str = None):
-    # Подключение к базе данных
-    client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
-    db = client['mds_workspace']
-    conference_videos = db.conference_videos
-
-    # Поиск документа и проверка на trim
-    document = conference_videos.find_one({f"meetings.{conference_uuid}": {"$exists": True}})
-    if document:
-        uuid_content = document["meetings"].get(conference_uuid, {})
-        recordings = uuid_content.get("recordings", [])
-        for recording in recordings:
-            if recording.get("recording_id") == recording_id and recording.get("trim", False):
-                recording_id = f"{recording_id}_trimmed"
-                break
-
-    # Ищем файл записи в MongoDB (zoom_files) и получаем путь к файлу
-    client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
-    zoom_files_db = client['zoom_files']
-    file_record = zoom_files_db['shared_screen_with_speaker_view.files'].find_one({"recording_id": recording_id})
-
-    if not file_record:
-        file_record = zoom_files_db['audio_only.files'].find_one({"recording_id": recording_id})
-
-    if not file_record:
-        file_record = zoom_files_db['chat_file.files'].find_one({"recording_id": recording_id})
-
-    if not file_record:
+async def resolve_playback_source(recording_id):
+    """
+    Возвращает идентификатор воспроизводимой версии (с учётом обрезки), абсолютный путь к файлу
+    и границы виртуальной обрезки ({"start", "end"} в секундах или None).
+    """
+    # Расположение файлов записи (оригинал и, если есть, обрезанная версия)
+    location = await get_recording_location_async(recording_id)
+    if not location:
         raise HTTPException(status_code=404, detail="Recording not found")
 
-    relative_file_path = file_record.get("file_path")
+    virtual_trim = location.get("virtual_trim")
+    if virtual_trim:
+        # Виртуальная обрезка отдаётся из оригинала
+        relative_file_path = location.get("file_path")
+        recording_id = f"{recording_id}_trimmed"
+    elif location.get("trimmed_file_path"):
+        relative_file_path = location["trimmed_file_path"]
+        recording_id = f"{recording_id}_trimmed"
+    else:
+        relative_file_path = location.get("file_path")
     if not relative_file_path:
         raise HTTPException(status_code=404, detail="File path not found in the record")
 
-    base_directory = os.path.abspath(os.path.dirname(__file__))
-    absolute_file_path = os.path.join(base_directory, relative_file_path)
+    absolute_file_path = to_absolute_path(relative_file_path)
 
     # Проверка существования файла по абсолютному пути
     if not os.path.exists(absolute_file_path):
         raise HTTPException(status_code=404, detail="File not found on server")
+    return recording_id, absolute_file_path, virtual_trim
 
-    # Путь для сжатого видео
-    compressed_file_path = os.path.join(base_directory, "downloads", "compressed", f"compressed_{recording_id}.mp4")
 
-    # Если сжатое видео отсутствует, делаем запрос на сервер сжатия
-    if not os.path.exists(compressed_file_path):
-        try:
-            with open(absolute_file_path, "rb") as video_file:
-                response = requests.post("http://localhost:8005/compress-video/", files={"file": video_file})
-
-            if response.status_code == 200:
-                # Сохраняем сжатое видео
-                os.makedirs(os.path.dirname(compressed_file_path), exist_ok=True)
-                with open(compressed_file_path, "wb") as f:
-                    f.write(response.content)
-            else:
-                print("Сервис сжатия вернул ошибку, отправляем оригинальное видео.")
-        except requests.exceptions.RequestException:
-            print("Сервис сжатия недоступен, отправляем оригинальное видео.")
-
-    # Выбираем файл для отправки: сжатое или оригинальное
-    file_path_to_serve = compressed_file_path if os.path.exists(compressed_file_path) else absolute_file_path
-    file_size = os.path.getsize(file_path_to_serve)
-    start, end = 0, file_size - 1
-
-    if range:
-        range_str = range.replace("bytes=", "")
-        range_parts = range_str.split("-")
-        if range_parts[0]:
-            start = int(range_parts[0])
-        if range_parts[1]:
-            end = int(range_parts[1])
-
-    chunk_size = end - start + 1
-
-    # Функция для создания итератора файла
-    def file_iterator(file_path, start, chunk_size):
-        with open(file_path, 'rb') as file:
-            file.seek(start)
-            while chunk_size > 0:
-                chunk = file.read(min(8192, chunk_size))
-                if not chunk:
-                    break
-                yield chunk
-                chunk_size -= len(chunk)
-
-    headers = {
-        "Content-Range": f"bytes {start}-{end}/{file_size}",
-        "Accept-Ranges": "bytes",
-        "Content-Length": str(chunk_size),
-        "Content-Type": "video/mp4",
-    }
-    return StreamingResponse(file_iterator(file_path_to_serve, start, chunk_size), headers=headers, status_code=206)
+@app.get("/api/get-recording")
+async def get_recording(request: Request, recording_id: str, conference_uuid: str, range: str = None,
+                        progressive: bool = False):
+    recording_id, absolute_file_path, virtual_trim = await resolve_playback_source(recording_id)
+    # Тип записи Zoom определяет профиль сжатия (запись уже в кэше индекса расположений)
+    recording_type = (await get_recording_location_async(recording_id.removesuffix("_trimmed"))).get("recording_type")
+
+    # Сжатая копия из кэша; если её ещё нет, запускаем фоновое сжатие и пока отдаём оригинал
+    compressed_file_path = compressed_cache.lookup(recording_id)
+    if compressed_file_path is None:
+        if progressive:
+            # Отдаём фрагменты сжатого видео по мере кодирования (без поддержки перемотки)
+            relay = start_progressive_relay(recording_id, absolute_file_path, recording_type, virtual_trim)
+            if relay is not None:
+                return StreamingResponse(relay, media_type="video/mp4", headers={"Cache-Control": "no-store"})
+        ensure_transcode_job(recording_id, absolute_file_path, recording_type, virtual_trim)
+        return await build_source_response(request, absolute_file_path, virtual_trim, range)
+
+    try:
+        return build_range_response(request, compressed_file_path, media_type="video/mp4", range_header=range)
+    except FileNotFoundError:
+        # Копию вытеснили из кэша между поиском и отдачей - отдаём оригинал
+        return await build_source_response(request, absolute_file_path, virtual_trim, range)
+
+
+async def build_source_response(request, absolute_file_path, virtual_trim, range_header):
+    """Ответ с оригиналом записи; при виртуальной обрезке - с её срезом, собранным на лету."""
+    if not virtual_trim:
+        return build_range_response(request, absolute_file_path, media_type="video/mp4", range_header=range_header)
+    try:
+        view = await asyncio.to_thread(get_virtual_trim, absolute_file_path, virtual_trim["start"], virtual_trim["end"])
+    except VirtualTrimError as e:
+        raise HTTPException(status_code=500, detail=f"Cannot serve trimmed recording: {e}")
+    return build_range_response(request, absolute_file_path, media_type="video/mp4", range_header=range_header,
+                                virtual_view=view)
+
+
+@app.get("/api/get-recording-transcode-status")
+async def get_recording_transcode_status(recording_id: str):
+    return get_transcode_status(recording_id)
+
+
+@app.get("/api/compressed-cache-stats")
+async def get_compressed_cache_stats():
+    """Заполненность каталога сжатых копий и счётчики попаданий, промахов и вытеснений этого воркера."""
+    return compressed_cache.stats()
+
+
+@app.get("/api/mongo-pool-stats")
+async def get_mongo_pool_stats():
+    """Настройки и загрузка пула соединений MongoDB этого процесса."""
+    return pool_metrics()
+
+
+@app.get("/api/response-cache-stats")
+async def get_response_cache_stats():
+    """Закэшированные JSON-ответы с ETag: объём и счётчики попаданий, промахов и ответов 304."""
+    return response_cache.stats()
+
+
+@app.get("/api/user-cache-stats")
+async def get_user_cache_stats():
+    """Пользователи в кэше авторизации и счётчики попаданий и промахов."""
+    return user_cache.stats()
+
+
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+def get_hls_directory(recording_id):
+    base_directory = os.path.abspath(os.path.dirname(__file__))
+    return os.path.join(base_directory, "downloads", "hls", recording_id)
+
+
+@app.get("/api/get-recording-hls/{recording_id}/{asset_path:path}")
+async def get_recording_hls(request: Request, recording_id: str, asset_path: str):
+    """
+    Отдаёт master.m3u8, плейлисты вариантов и сегменты HLS-лесенки записи.
+    Если лесенка ещё не готова, запускает её нарезку и отвечает 202.
+    """
+    recording_id, absolute_file_path, virtual_trim = await resolve_playback_source(recording_id)
+    hls_directory = get_hls_directory(recording_id)
+
+    if not os.path.exists(os.path.join(hls_directory, "master.m3u8")):
+        job = ensure_hls_job(recording_id, absolute_file_path, hls_directory, virtual_trim)
+        return JSONResponse(status_code=202, content=get_hls_status(job["recording_id"]))
+
+    # Не даём выйти за пределы каталога записи
+    asset_file_path = os.path.normpath(os.path.join(hls_directory, asset_path))
+    if not asset_file_path.startswith(hls_directory + os.sep):
+        raise HTTPException(status_code=404, detail="HLS asset not found")
+
+    media_type = HLS_MEDIA_TYPES.get(os.path.splitext(asset_file_path)[1])
+    if media_type is None or not os.path.isfile(asset_file_path):
+        raise HTTPException(status_code=404, detail="HLS asset not found")
+
+    response = build_range_response(request, asset_file_path, media_type=media_type)
+    # Нарезка VOD неизменна, пока запись не обрезали заново
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response
+
+
+THUMBNAIL_MEDIA_TYPES = {
+    ".vtt": "text/vtt",
+    ".jpg": "image/jpeg",
+}
+
+
+def get_thumbnails_directory(recording_id):
+    base_directory = os.path.abspath(os.path.dirname(__file__))
+    return os.path.join(base_directory, "downloads", "thumbnails", recording_id)
+
+
+@app.get("/api/get-recording-thumbnails/{recording_id}/{asset_path:path}")
+async def get_recording_thumbnails(request: Request, recording_id: str, asset_path: str):
+    """
+    Отдаёт thumbnails.vtt и листы превью для перемотки.
+    Если превью ещё не готовы, запускает их сборку и отвечает 202.
+    """
+    recording_id, absolute_file_path, virtual_trim = await resolve_playback_source(recording_id)
+    location = await get_recording_location_async(recording_id.removesuffix("_trimmed"))
+    if location.get("recording_type") == "audio_only":
+        raise HTTPException(status_code=404, detail="Recording has no video")
+    thumbnails_directory = get_thumbnails_directory(recording_id)
+
+    if not os.path.exists(os.path.join(thumbnails_directory, "thumbnails.vtt")):
+        job = ensure_thumbnail_job(recording_id, absolute_file_path, thumbnails_directory, virtual_trim)
+        return JSONResponse(status_code=202, content=get_thumbnail_status(job["recording_id"]))
+
+    # Не даём выйти за пределы каталога записи
+    asset_file_path = os.path.normpath(os.path.join(thumbnails_directory, asset_path))
+    if not asset_file_path.startswith(thumbnails_directory + os.sep):
+        raise HTTPException(status_code=404, detail="Thumbnail asset not found")
+
+    media_type = THUMBNAIL_MEDIA_TYPES.get(os.path.splitext(asset_file_path)[1])
+    if media_type is None or not os.path.isfile(asset_file_path):
+        raise HTTPException(status_code=404, detail="Thumbnail asset not found")
+
+    response = build_range_response(request, asset_file_path, media_type=media_type)
+    # Превью неизменны, пока запись не обрезали заново
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response
 
 
 def get_mongo_collections():
-    client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
+    client = get_client()
     db = client['zoom_files']
     screen_fs = GridFS(db, collection='shared_screen_with_speaker_view')
     audio_fs = GridFS(db, collection='audio_only')
@@ -1658,7 +1119,7 @@ def get_file_chunk(file_collection, file_id, start: int = 0, end: int = None):
     return chunk, end
 
 def get_mongo_collections():
-    client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
+    client = get_client()
     db = client['zoom_files']
     screen_fs = GridFS(db, collection='shared_screen_with_speaker_view')
     audio_fs = GridFS(db, collection='audio_only')
@@ -1666,99 +1127,77 @@ def get_mongo_collections():
     return screen_fs, audio_fs, chat_fs
 
 
-def trim_video_and_save_info(recording_id, uuid, start_time, end_time, document, client):
-    """Функция для обрезки видео и обновления базы данных."""
-    db = client['mds_workspace']
-    conference_videos = db.conference_videos
-    zoom_files_db = client['zoom_files']
+def reset_trimming_flag(conference_videos, document, uuid, recording_id):
+    conference_videos.update_one(
+        {"_id": document["_id"], f"meetings.{uuid}.recordings.recording_id": recording_id},
+        {"$set": {f"meetings.{uuid}.recordings.$.trimming_in_progress": False}}
+    )
 
-    # Поиск пути к файлу в коллекции MongoDB (zoom_files)
-    file_record = zoom_files_db['shared_screen_with_speaker_view.files'].find_one({"recording_id": recording_id})
-    if not file_record:
-        file_record = zoom_files_db['audio_only.files'].find_one({"recording_id": recording_id})
-    if not file_record:
-        file_record = zoom_files_db['chat_file.files'].find_one({"recording_id": recording_id})
 
+def resolve_trim_source(recording_id, uuid, document, conference_videos):
+    """Абсолютный путь к оригиналу записи для обрезки; при ошибке сбрасывает флаг обрезки."""
+    # Поиск пути к файлу в индексе расположений записей
+    file_record = get_recording_location(recording_id)
     if not file_record:
-        # Сброс флага в случае ошибки
-        conference_videos.update_one(
-            {"_id": document["_id"], f"meetings.{uuid}.recordings.recording_id": recording_id},
-            {"$set": {f"meetings.{uuid}.recordings.$.trimming_in_progress": False}}
-        )
+        reset_trimming_flag(conference_videos, document, uuid, recording_id)
         raise HTTPException(status_code=404, detail="Recording not found in metadata")
 
     # Получаем относительный путь к файлу
     relative_file_path = file_record.get("file_path")
     if not relative_file_path:
-        # Сброс флага в случае ошибки
-        conference_videos.update_one(
-            {"_id": document["_id"], f"meetings.{uuid}.recordings.recording_id": recording_id},
-            {"$set": {f"meetings.{uuid}.recordings.$.trimming_in_progress": False}}
-        )
+        reset_trimming_flag(conference_videos, document, uuid, recording_id)
         raise HTTPException(status_code=404, detail="File path not found in the record")
 
     # Преобразование относительного пути в абсолютный
-    base_directory = os.path.abspath(os.path.dirname(__file__))  # Корневая директория приложения
-    absolute_file_path = os.path.join(base_directory, relative_file_path)
+    absolute_file_path = to_absolute_path(relative_file_path)
 
     # Проверка существования файла по абсолютному пути
     if not os.path.exists(absolute_file_path):
-        # Сброс флага в случае ошибки
-        conference_videos.update_one(
-            {"_id": document["_id"], f"meetings.{uuid}.recordings.recording_id": recording_id},
-            {"$set": {f"meetings.{uuid}.recordings.$.trimming_in_progress": False}}
-        )
+        reset_trimming_flag(conference_videos, document, uuid, recording_id)
         raise HTTPException(status_code=404, detail="File not found on server")
+    return absolute_file_path
 
-    # Проверка существования выходного файла перед обрезкой
-    output_filename = f"{os.path.splitext(absolute_file_path)[0]}_trimmed.mp4"
-    if os.path.exists(output_filename):
-        print(f"Existing trimmed file found, removing: {output_filename}")
-        os.remove(output_filename)
 
-    try:
-        print("Starting video trim with ffmpeg...")
-        (
-            ffmpeg
-            .input(absolute_file_path, ss=start_time, to=end_time)
-            .output(output_filename, codec="copy")
-            .run()
-        )
-        print("Video trimmed successfully.")
-    except ffmpeg.Error as e:
+def save_trim_result(recording_id, uuid, document, conference_videos, trimmed_file_path, succeeded):
+    """Обновляет метаданные после завершения фоновой обрезки."""
+    if not succeeded:
+        reset_trimming_flag(conference_videos, document, uuid, recording_id)
+        return
 
-        conference_videos.update_one(
-            {"_id": document["_id"], f"meetings.{uuid}.recordings.recording_id": recording_id},
-            {"$set": {f"meetings.{uuid}.recordings.$.trimming_in_progress": False}}
-        )
-        raise HTTPException(status_code=500, detail=f"Error trimming video: {str(e)}")
-
-    trimmed_file_path = os.path.abspath(output_filename)
-    zoom_files_db['shared_screen_with_speaker_view.files'].update_one(
-        {"recording_id": recording_id + "_trimmed"},
-        {
-            "$set": {
-                "filename": output_filename,
-                "file_path": trimmed_file_path,
-                "meeting_uuid": uuid,
-                "recording_type": file_record.get("recording_type", "unknown")
-            }
-        },
-        upsert=True
-    )
+    set_trimmed_location(recording_id, trimmed_file_path)
+    mark_recording_trimmed(recording_id, uuid, document, conference_videos)
+
+
+def save_virtual_trim(recording_id, uuid, document, conference_videos, start_seconds, end_seconds):
+    """Сохраняет границы виртуальной обрезки; прежняя физическая копия больше не нужна."""
+    previous_trimmed_path = set_virtual_trim(recording_id, start_seconds, end_seconds)
+    if previous_trimmed_path and os.path.exists(previous_trimmed_path):
+        os.remove(previous_trimmed_path)
+    mark_recording_trimmed(recording_id, uuid, document, conference_videos)
+
+
+def mark_recording_trimmed(recording_id, uuid, document, conference_videos):
+    """Снимает флаг обрезки, помечает запись обрезанной и удаляет производные прежней обрезки."""
+    # Сжатая копия, HLS-нарезка и превью предыдущей обрезки больше не актуальны
+    compressed_cache.remove(f"{recording_id}_trimmed")
+    shutil.rmtree(get_hls_directory(f"{recording_id}_trimmed"), ignore_errors=True)
+    shutil.rmtree(get_thumbnails_directory(f"{recording_id}_trimmed"), ignore_errors=True)
 
     conference_videos.update_one(
         {"_id": document["_id"], f"meetings.{uuid}.recordings.recording_id": recording_id},
         {"$set": {f"meetings.{uuid}.recordings.$.trimming_in_progress": False,
                   f"meetings.{uuid}.recordings.$.trim": True}}
     )
-
     print("Видео успешно обрезано и сохранено, статус обновлен в базе данных.")
-    return {"message": "Видео обрезано и сохранено на сервере", "output_file": output_filename}
 
 
 @app.post("/api/log-trim-info")
 async def trim_and_save_video(request: Request):
+    """
+    Обрезает запись. Виртуальная обрезка (mode=virtual, по умолчанию) только сохраняет границы
+    и завершается сразу. Физическая (mode=physical или если файл нельзя обрезать виртуально)
+    ставится в очередь и возвращает job_id, ход обрезки - в /api/get-trim-status.
+    """
     try:
         data = await request.json()
         recording_id = data.get('recording_id')
@@ -1770,31 +1209,58 @@ async def trim_and_save_video(request: Request):
         if not recording_id or not uuid:
             raise HTTPException(status_code=400, detail="Recording ID and UUID are required")
 
+        try:
+            start_seconds = parse_timestamp(start_time)
+            end_seconds = parse_timestamp(end_time)
+        except TrimError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if end_seconds <= start_seconds:
+            raise HTTPException(status_code=400, detail="End time must be greater than start time")
 
-        client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
-        db = client['mds_workspace']
-        conference_videos = db.conference_videos
-
-        document = conference_videos.find_one_and_update(
-            {f"meetings.{uuid}.recordings.recording_id": recording_id,
-             f"meetings.{uuid}.recordings.trimming_in_progress": {"$ne": True}},
-            {"$set": {f"meetings.{uuid}.recordings.$.trimming_in_progress": True}},
-            return_document=True
-        )
+        document = await conference_videos_repository.start_trimming(uuid, recording_id)
 
         if not document:
             raise HTTPException(status_code=409,
                                 detail="Trimming is already in progress for this recording or recording not found.")
 
-        result = await asyncio.to_thread(trim_video_and_save_info, recording_id, uuid, start_time, end_time, document,
-                                         client)
-        return result
+        absolute_file_path = await run_blocking(resolve_trim_source, recording_id, uuid, document, conference_videos)
+
+        # По умолчанию обрезка виртуальная: сохраняются только границы, видео собирается из оригинала при отдаче
+        if data.get('mode', 'virtual') == 'virtual':
+            try:
+                await asyncio.to_thread(get_virtual_trim, absolute_file_path, start_seconds, end_seconds)
+            except VirtualTrimError as e:
+                print(f"Виртуальная обрезка записи {recording_id} невозможна ({e}), выполняем физическую.")
+            else:
+                await run_blocking(save_virtual_trim, recording_id, uuid, document, conference_videos,
+                                   start_seconds, end_seconds)
+                return {"message": "Видео обрезано", "mode": "virtual", "job_id": None, "status": "done"}
+
+        trimmed_file_path = f"{os.path.splitext(absolute_file_path)[0]}_trimmed.mp4"
 
+        job = submit_trim_job(
+            recording_id, absolute_file_path, trimmed_file_path, start_seconds, end_seconds,
+            lambda succeeded: save_trim_result(recording_id, uuid, document, conference_videos,
+                                               trimmed_file_path, succeeded)
+        )
+        return {"message": "Обрезка видео поставлена в очередь", "mode": "physical",
+                "job_id": job["job_id"], "status": job["status"]}
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@app.get("/api/get-trim-status")
+async def get_trim_status(job_id: str):
+    job = get_trim_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trim job not found")
+    return job
+
+
 @app.post("/api/cancel-trim")
 async def cancel_trim(request: Request):
     try:
@@ -1802,12 +1268,7 @@ async def cancel_trim(request: Request):
         recording_id = data.get('recording_id')
         uuid = data.get('uuid')
 
-        client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
-        db = client['mds_workspace']
-        conference_videos = db.conference_videos
-        zoom_files_db = client['zoom_files']
-
-        document = conference_videos.find_one({f"meetings.{uuid}": {"$exists": True}})
+        document = await conference_videos_repository.find_by_meeting_uuid(uuid)
         if document:
             uuid_content = document["meetings"].get(uuid, {})
             for recording in uuid_content.get("recordings", []):
@@ -1816,25 +1277,16 @@ async def cancel_trim(request: Request):
                         raise HTTPException(status_code=409, detail="Cannot cancel trim while trimming is in progress.")
 
                     recording.pop("trim", None)
-                    conference_videos.update_one(
-                        {"_id": document["_id"]},
-                        {"$set": {f"meetings.{uuid}.recordings": uuid_content["recordings"]}}
-                    )
+                    await conference_videos_repository.set_recordings(document["_id"], uuid, uuid_content["recordings"])
                     print(f"Обрезка отменена для записи с recording_id: {recording_id}.")
-                    trimmed_record = zoom_files_db['shared_screen_with_speaker_view.files'].find_one({"recording_id": recording_id + "_trimmed"})
-                    if not trimmed_record:
-                        trimmed_record = zoom_files_db['audio_only.files'].find_one({"recording_id": recording_id + "_trimmed"})
-                    if not trimmed_record:
-                        trimmed_record = zoom_files_db['chat_file.files'].find_one({"recording_id": recording_id + "_trimmed"})
-
-                    if trimmed_record:
-                        trimmed_file_path = trimmed_record.get("file_path")
-                        if trimmed_file_path and os.path.exists(trimmed_file_path):
-                            os.remove(trimmed_file_path)
-                            print(f"Обрезанное видео с ID {recording_id}_trimmed удалено с сервера.")
-
-                        zoom_files_db['shared_screen_with_speaker_view.files'].delete_one({"_id": trimmed_record["_id"]})
-                        print(f"Запись об обрезанном видео удалена из базы данных.")
+                    trimmed_file_path = await run_blocking(clear_trimmed_location, recording_id)
+                    if trimmed_file_path and os.path.exists(trimmed_file_path):
+                        os.remove(trimmed_file_path)
+                        print(f"Обрезанное видео с ID {recording_id}_trimmed удалено с сервера.")
+
+                    compressed_cache.remove(f"{recording_id}_trimmed")
+                    shutil.rmtree(get_hls_directory(f"{recording_id}_trimmed"), ignore_errors=True)
+                    shutil.rmtree(get_thumbnails_directory(f"{recording_id}_trimmed"), ignore_errors=True)
 
                     return {"message": "Обрезка отменена и обрезанное видео удалено."}
 
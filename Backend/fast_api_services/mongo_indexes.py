@@ -0,0 +1,155 @@
+"""
+Индексы коллекций, которые опрашиваются в циклах воркеров и на горячих запросах API.
+
+Все сервисы работают с одним MongoDB, поэтому индексы объявлены здесь и создаются
+при старте fast_api_services (операция идемпотентна). Диагностика запускается вручную
+из директории fast_api_services:
+
+    python mongo_indexes.py             # создать и проверить индексы
+    python mongo_indexes.py --explain   # explain() горячих запросов, поиск COLLSCAN
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from mongo_connection import get_database
+
+GRIDFS_FILES_COLLECTIONS = ["shared_screen_with_speaker_view.files", "audio_only.files", "chat_file.files"]
+
+# (база, коллекция, ключи индекса, опции create_index)
+INDEXES = [
+    # Воркер скачивания: задачи pending с наступившим execute_time и зависшие in_progress (префикс status)
+    ("queue_workers", "download_tasks", [("status", ASCENDING), ("execute_time", ASCENDING)], {}),
+    ("queue_workers", "download_tasks", [("meeting_id", ASCENDING)], {}),
+    ("queue_workers", "game_notification", [("status", ASCENDING)], {}),
+    ("queue_workers", "game_notification", [("game_id", ASCENDING)], {}),
+    # data - массив строк листа, индекс multikey
+    ("schedule", "sheets_data", [("data.id", ASCENDING)], {}),
+    ("mds_workspace", "conference_videos", [("meeting_id", ASCENDING)], {}),
+    # Обратный индекс дочерняя лекция -> родительская конференция (multikey по массиву)
+    ("mds_workspace", "zoom_meetings", [("formed_conference.children_lecture_id", ASCENDING)], {}),
+    ("zoom_files", "recording_locations", [("recording_id", ASCENDING)], {"unique": True}),
+    *[("zoom_files", name, [("recording_id", ASCENDING)], {}) for name in GRIDFS_FILES_COLLECTIONS],
+]
+
+# (название, база, коллекция, фильтр) - те же условия, что в репозиториях и воркерах
+HOT_QUERIES = [
+    ("download_tasks: задачи к запуску", "queue_workers", "download_tasks",
+     {"status": "pending", "execute_time": {"$lte": datetime.now()}}),
+    ("download_tasks: зависшие задачи", "queue_workers", "download_tasks",
+     {"status": "in_progress", "last_updated": {"$lte": datetime.now()}}),
+    ("download_tasks: задача встречи", "queue_workers", "download_tasks", {"meeting_id": 0}),
+    ("game_notification: к отправке", "queue_workers", "game_notification",
+     {"status": {"$nin": ["in_progress", "error"]}}),
+    ("game_notification: с ошибкой", "queue_workers", "game_notification", {"status": "error"}),
+    ("game_notification: по game_id", "queue_workers", "game_notification", {"game_id": {"$in": [0]}}),
+    ("sheets_data: строка игры", "schedule", "sheets_data", {"data.id": 0}),
+    ("conference_videos: по meeting_id", "mds_workspace", "conference_videos", {"meeting_id": 0}),
+    ("zoom_meetings: родители дочерних лекций", "mds_workspace", "zoom_meetings",
+     {"formed_conference.children_lecture_id": {"$in": [""]}}),
+    ("recording_locations: по recording_id", "zoom_files", "recording_locations", {"recording_id": ""}),
+    *[(f"{name}: по recording_id", "zoom_files", name, {"recording_id": ""}) for name in GRIDFS_FILES_COLLECTIONS],
+]
+
+
+def _index_name(keys):
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def ensure_indexes():
+    """
+    Создаёт недостающие индексы и проверяет, что они есть в коллекциях.
+    Ошибка одного индекса (например, дубликаты под уникальным) не мешает остальным и старту сервиса.
+    """
+    report = []
+    for db_name, collection_name, keys, options in INDEXES:
+        collection = get_database(db_name)[collection_name]
+        entry = {"collection": f"{db_name}.{collection_name}", "index": _index_name(keys)}
+        try:
+            collection.create_index(keys, **options)
+            existing = collection.index_information()
+            entry["ok"] = any(info["key"] == keys for info in existing.values())
+        except PyMongoError as error:
+            entry["ok"] = False
+            entry["error"] = str(error)
+        if not entry["ok"]:
+            print(f"Индекс {entry['index']} в {entry['collection']} не создан: {entry.get('error', 'не найден после создания')}")
+        report.append(entry)
+    return report
+
+
+def _plan_stages(plan):
+    """Все стадии плана: winningPlan вложен через inputStage/inputStages (или queryPlan в SBE)."""
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _plan_stages(item)]
+    return []
+
+
+def explain_hot_queries():
+    """Выполняет explain() горячих запросов и отмечает те, что читают коллекцию целиком (COLLSCAN)."""
+    report = []
+    for title, db_name, collection_name, query_filter in HOT_QUERIES:
+        collection = get_database(db_name)[collection_name]
+        entry = {"query": title, "collection": f"{db_name}.{collection_name}"}
+        try:
+            explanation = collection.find(query_filter).explain()
+        except PyMongoError as error:
+            entry["error"] = str(error)
+            report.append(entry)
+            continue
+        stages = _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+        stats = explanation.get("executionStats", {})
+        entry.update({
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "docs_examined": stats.get("totalDocsExamined"),
+            "keys_examined": stats.get("totalKeysExamined"),
+            "returned": stats.get("nReturned"),
+            "time_ms": stats.get("executionTimeMillis"),
+        })
+        report.append(entry)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Создание индексов MongoDB и проверка планов горячих запросов")
+    parser.add_argument("--explain", action="store_true", help="explain() горячих запросов вместо создания индексов")
+    parser.add_argument("--json", action="store_true", help="вывести отчёт в JSON")
+    args = parser.parse_args()
+
+    if args.explain:
+        report = explain_hot_queries()
+        failed = [entry for entry in report if entry.get("collscan") or entry.get("error")]
+    else:
+        report = ensure_indexes()
+        failed = [entry for entry in report if not entry["ok"]]
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    elif args.explain:
+        for entry in report:
+            if "error" in entry:
+                print(f"ОШИБКА   {entry['query']}: {entry['error']}")
+                continue
+            mark = "COLLSCAN" if entry["collscan"] else "ok"
+            print(f"{mark:<8} {entry['query']}: {' -> '.join(entry['stages'])}, "
+                  f"документов просмотрено {entry['docs_examined']}, ключей {entry['keys_examined']}, "
+                  f"найдено {entry['returned']}, {entry['time_ms']} мс")
+    else:
+        for entry in report:
+            print(f"{'ok' if entry['ok'] else 'НЕТ':<8} {entry['collection']}: {entry['index']}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import ReturnDocument, UpdateOne
+
+from mongo_connection import MONGO_MAX_POOL_SIZE, get_database
+
+# Запросы к MongoDB идут в своём пуле потоков размером с пул соединений драйвера:
+# они не занимают пул потоков по умолчанию и не ждут соединение сверх лимита пула
+_mongo_executor = ThreadPoolExecutor(max_workers=MONGO_MAX_POOL_SIZE, thread_name_prefix="mongo")
+
+
+async def run_blocking(function, *args, **kwargs):
+    """Выполняет синхронный код с запросами к MongoDB вне event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_mongo_executor, functools.partial(function, *args, **kwargs))
+
+
+class AsyncCollection:
+    """
+    Асинхронный доступ к коллекции pymongo через общий пул соединений процесса.
+    Курсор вычитывается целиком в потоке пула, поэтому find возвращает список.
+    Сама коллекция доступна как .collection - для кода, который уже выполняется в отдельном потоке.
+    Не привязан к event loop, поэтому работает и в задачах, запущенных через asyncio.run в потоках.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @property
+    def revision_name(self):
+        """Имя ревизии данных в store_revisions; меняется после каждой записи через touch()."""
+        return self.collection.name
+
+    async def touch(self):
+        await store_revisions.bump(self.revision_name)
+
+    def touch_sync(self):
+        store_revisions.bump_sync(self.revision_name)
+
+    async def find_one(self, *args, **kwargs):
+        return await run_blocking(self.collection.find_one, *args, **kwargs)
+
+    async def find(self, filter=None, projection=None, sort=None, limit=0):
+        def read():
+            cursor = self.collection.find(filter or {}, projection, limit=limit)
+            if sort:
+                cursor = cursor.sort(sort)
+            return list(cursor)
+        return await run_blocking(read)
+
+    async def count_documents(self, filter, **kwargs):
+        return await run_blocking(self.collection.count_documents, filter, **kwargs)
+
+    async def insert_one(self, document, **kwargs):
+        return await run_blocking(self.collection.insert_one, document, **kwargs)
+
+    async def update_one(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.update_one, filter, update, **kwargs)
+
+    async def replace_one(self, filter, replacement, **kwargs):
+        return await run_blocking(self.collection.replace_one, filter, replacement, **kwargs)
+
+    async def update_many(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.update_many, filter, update, **kwargs)
+
+    async def find_one_and_update(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.find_one_and_update, filter, update, **kwargs)
+
+    async def delete_one(self, filter, **kwargs):
+        return await run_blocking(self.collection.delete_one, filter, **kwargs)
+
+    async def delete_many(self, filter, **kwargs):
+        return await run_blocking(self.collection.delete_many, filter, **kwargs)
+
+
+class StoreRevisionsRepository(AsyncCollection):
+    """
+    Счётчики изменений хранилищ: mds_workspace.store_revisions, {_id: имя, revision: число}.
+    Каждая запись в хранилище увеличивает его счётчик - по ним строятся ETag ответов API.
+    """
+
+    async def get_revision(self, names):
+        """Ревизия набора хранилищ одной строкой; одно чтение по _id."""
+        return self._format_revision(names, await self.find({"_id": {"$in": list(names)}}))
+
+    def get_revision_sync(self, names):
+        return self._format_revision(names, self.collection.find({"_id": {"$in": list(names)}}))
+
+    @staticmethod
+    def _format_revision(names, documents):
+        revisions = {document["_id"]: document.get("revision", 0) for document in documents}
+        return ",".join(f"{name}:{revisions.get(name, 0)}" for name in names)
+
+    async def bump(self, *names):
+        await run_blocking(self.bump_sync, *names)
+
+    def bump_sync(self, *names):
+        operations = [UpdateOne({"_id": name}, {"$inc": {"revision": 1}}, upsert=True) for name in names]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+
+class ConferenceVideosRepository(AsyncCollection):
+    """Конференции Zoom с записями: mds_workspace.conference_videos."""
+
+    async def find_by_meeting_id(self, meeting_id):
+        return await self.find_one({"meeting_id": meeting_id})
+
+    async def find_by_meeting_uuid(self, meeting_uuid):
+        return await self.find_one({f"meetings.{meeting_uuid}": {"$exists": True}})
+
+    async def start_trimming(self, meeting_uuid, recording_id):
+        """Атомарно ставит флаг обрезки. None - записи нет или она уже обрезается."""
+        return await self.find_one_and_update(
+            {f"meetings.{meeting_uuid}.recordings.recording_id": recording_id,
+             f"meetings.{meeting_uuid}.recordings.trimming_in_progress": {"$ne": True}},
+            {"$set": {f"meetings.{meeting_uuid}.recordings.$.trimming_in_progress": True}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def set_recordings(self, document_id, meeting_uuid, recordings):
+        return await self.update_one(
+            {"_id": document_id},
+            {"$set": {f"meetings.{meeting_uuid}.recordings": recordings}}
+        )
+
+
+class SettingsRepository(AsyncCollection):
+    """
+    Общие исключения и пользовательские списки: один документ на хранилище в mds_workspace.store_settings.
+    Каждое изменение - отдельный атомарный $addToSet/$pull, без перезаписи остальных полей.
+    """
+
+    def __init__(self, collection, name, users_field):
+        super().__init__(collection)
+        self.name = name
+        self.users_field = users_field
+
+    @property
+    def revision_name(self):
+        return f"{self.collection.name}.{self.name}"
+
+    async def get_settings(self):
+        return await self.find_one({"_id": self.name}, {"_id": 0}) or {}
+
+    async def get_user_list(self, user_id):
+        settings = await self.find_one({"_id": self.name}, {f"{self.users_field}.{user_id}": 1})
+        return (settings or {}).get(self.users_field, {}).get(str(user_id), [])
+
+    async def set_global_exclude(self, item_id, excluded):
+        """Добавляет item_id в global_exclude или убирает из него; возвращает новый список."""
+        operator = "$addToSet" if excluded else "$pull"
+        settings = await self.find_one_and_update(
+            {"_id": self.name}, {operator: {"global_exclude": item_id}},
+            projection={"global_exclude": 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        await self.touch()
+        return settings.get("global_exclude", [])
+
+    async def set_user_item(self, user_id, item_id, included):
+        operator = "$addToSet" if included else "$pull"
+        result = await self.update_one(
+            {"_id": self.name}, {operator: {f"{self.users_field}.{user_id}": item_id}}, upsert=True
+        )
+        await self.touch()
+        return result
+
+
+class LinkedItemsRepository(AsyncCollection):
+    """
+    Каналы, потоки и папки с тегами: элемент - документ с _id = его id.
+    Исключения и подписки пользователей хранятся в store_settings (см. SettingsRepository).
+    """
+
+    def __init__(self, collection, settings):
+        super().__init__(collection)
+        self.settings = settings
+
+    async def get_items(self):
+        return {item.pop("_id"): item for item in await self.find()}
+
+    @property
+    def revision_names(self):
+        """Ревизии, от которых зависит get_structure()."""
+        return [self.revision_name, self.settings.revision_name]
+
+    async def get_structure(self):
+        """Данные в прежнем формате JSON-файла: global_exclude, users_include, couples."""
+        settings, items = await asyncio.gather(self.settings.get_settings(), self.get_items())
+        return {
+            "global_exclude": settings.get("global_exclude", []),
+            "users_include": settings.get("users_include", {}),
+            "couples": items,
+        }
+
+    async def get_items_by_ids(self, item_ids):
+        items = {item.pop("_id"): item for item in await self.find({"_id": {"$in": item_ids}})}
+        return {item_id: items.get(item_id) for item_id in item_ids}
+
+    async def set_tags(self, item_id, tags):
+        """Заменяет теги элемента; None - элемента нет."""
+        item = await self.find_one_and_update(
+            {"_id": item_id}, {"$set": {"tags": tags}}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+        if item is not None:
+            await self.touch()
+        return item
+
+
+class ZoomMeetingsRepository(AsyncCollection):
+    """Конференции, созданные из лекций: mds_workspace.zoom_meetings, _id - id лекции строкой."""
+
+    async def find_conference(self, conference_id):
+        return await self.find_one({"_id": str(conference_id)})
+
+    async def find_conferences(self, conference_ids):
+        conferences = await self.find({"_id": {"$in": [str(conference_id) for conference_id in conference_ids]}})
+        return {conference["_id"]: conference for conference in conferences}
+
+    async def find_parent(self, child_id):
+        """Конференция, к которой привязана дочерняя лекция (по multikey-индексу children_lecture_id)."""
+        return await self.find_one({"formed_conference.children_lecture_id": str(child_id)})
+
+    async def find_parents(self, child_ids):
+        """Родительские конференции для списка дочерних лекций одним запросом: {id дочерней лекции: конференция}."""
+        child_ids = [str(child_id) for child_id in child_ids]
+        if not child_ids:
+            return {}
+        parents = {}
+        requested = set(child_ids)
+        for conference in await self.find({"formed_conference.children_lecture_id": {"$in": child_ids}}):
+            for child_id in conference["formed_conference"]["children_lecture_id"]:
+                if child_id in requested:
+                    parents.setdefault(child_id, conference)
+        return parents
+
+    async def save_conference(self, conference_id, conference):
+        """Записывает конференцию целиком: при пересоздании прежний formed_conference не сохраняется."""
+        result = await self.replace_one({"_id": str(conference_id)}, conference, upsert=True)
+        await self.touch()
+        return result
+
+    async def add_tags(self, conference_id, tags):
+        conference = await self.find_one_and_update(
+            {"_id": str(conference_id)}, {"$addToSet": {"tags": {"$each": tags}}},
+            projection={"tags": 1}, return_document=ReturnDocument.AFTER
+        )
+        await self.touch()
+        return conference
+
+    async def remove_tags(self, conference_id, tags):
+        conference = await self.find_one_and_update(
+            {"_id": str(conference_id)}, {"$pullAll": {"tags": tags}},
+            projection={"tags": 1}, return_document=ReturnDocument.AFTER
+        )
+        await self.touch()
+        return conference
+
+    async def set_children(self, parent_id, children_ids):
+        conference = await self.find_one_and_update(
+            {"_id": str(parent_id)}, {"$set": {"formed_conference.children_lecture_id": children_ids}},
+            projection={"formed_conference": 1}, return_document=ReturnDocument.AFTER
+        )
+        await self.touch()
+        return conference["formed_conference"] if conference else None
+
+    async def remove_child(self, parent_id, child_id):
+        """True, если дочерняя лекция была привязана и удалена."""
+        result = await self.update_one(
+            {"_id": str(parent_id), "formed_conference.children_lecture_id": str(child_id)},
+            {"$pull": {"formed_conference.children_lecture_id": str(child_id)}}
+        )
+        await self.touch()
+        return result.modified_count > 0
+
+    async def delete_conference(self, conference_id):
+        result = await self.delete_one({"_id": str(conference_id)})
+        await self.touch()
+        return result.deleted_count > 0
+
+
+class PlatformLecturesRepository(AsyncCollection):
+    """
+    Лекции расписания: mds_workspace.lecture_on_platform, _id - id строки таблицы.
+    google_sheets - данные из таблицы, platform_lecture - они же с правками на платформе.
+    """
+
+    async def find_platform_lectures(self, lecture_ids):
+        lectures = await self.find({"_id": {"$in": list(lecture_ids)}}, {"platform_lecture": 1})
+        return [{"id": lecture["_id"], **lecture["platform_lecture"]} for lecture in lectures]
+
+    async def get_platform_lecture(self, lecture_id):
+        lecture = await self.find_one({"_id": lecture_id}, {"platform_lecture": 1})
+        return lecture["platform_lecture"] if lecture else None
+
+    async def update_platform_lecture(self, lecture_id, update_data):
+        """Обновляет поля platform_lecture; False - лекции нет."""
+        if not update_data:
+            return await self.count_documents({"_id": lecture_id}, limit=1) > 0
+        result = await self.update_one(
+            {"_id": lecture_id},
+            {"$set": {f"platform_lecture.{key}": value for key, value in update_data.items()}}
+        )
+        return result.matched_count > 0
+
+    async def reset_platform_lecture(self, lecture_id):
+        """Возвращает platform_lecture к данным из таблицы; False - лекции нет."""
+        result = await self.update_one({"_id": lecture_id}, [{"$set": {"platform_lecture": "$google_sheets"}}])
+        return result.matched_count > 0
+
+
+store_revisions = StoreRevisionsRepository(get_database("mds_workspace")["store_revisions"])
+conference_videos_repository = ConferenceVideosRepository(get_database("mds_workspace")["conference_videos"])
+
+store_settings = get_database("mds_workspace")["store_settings"]
+linking_channels_settings = SettingsRepository(store_settings, "linking_channels", "users_include")
+lms_courses_settings = SettingsRepository(store_settings, "lms_courses", "users_include")
+kinescope_folders_settings = SettingsRepository(store_settings, "kinescope_folders", "users_include")
+schedule_settings_repository = SettingsRepository(store_settings, "exclude_settings", "users_exclude")
+
+telegram_channels_repository = LinkedItemsRepository(
+    get_database("mds_workspace")["telegram_channels"], linking_channels_settings)
+lms_streams_repository = LinkedItemsRepository(get_database("mds_workspace")["lms_streams"], lms_courses_settings)
+kinescope_folders_repository = LinkedItemsRepository(
+    get_database("mds_workspace")["kinescope_folders"], kinescope_folders_settings)
+zoom_meetings_repository = ZoomMeetingsRepository(get_database("mds_workspace")["zoom_meetings"])
+platform_lectures_repository = PlatformLecturesRepository(get_database("mds_workspace")["lecture_on_platform"])
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from services.video_service.range_streaming import not_modified
+
+# Сколько сериализованных ответов держать в памяти (ключ - эндпоинт и его параметры)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 256))
+
+
+class ResponseCache:
+    """
+    Готовые JSON-ответы редко меняющихся эндпоинтов, привязанные к ревизии данных.
+    ETag строится из ключа и ревизии, поэтому на If-None-Match с тем же ETag отдаётся 304
+    без чтения самих данных. Сериализованные байты живут в памяти до смены ревизии;
+    при переполнении вытесняется давно не запрошенный ключ.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def make_etag(key, revision):
+        digest = hashlib.sha1(repr((key, revision)).encode("utf-8")).hexdigest()
+        return f'"{digest}"'
+
+    @staticmethod
+    def _headers(etag):
+        # no-cache: браузер хранит ответ, но каждый раз сверяет его ETag с сервером
+        return {"ETag": etag, "Cache-Control": "no-cache"}
+
+    def _get(self, key, revision):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != revision:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key, revision, body):
+        with self._lock:
+            self._entries[key] = (revision, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def respond(self, request, key, revision, build):
+        """
+        key - эндпоинт и параметры запроса, revision - текущая ревизия данных,
+        build - корутина-функция, собирающая данные ответа (вызывается только при промахе).
+        """
+        etag = self.make_etag(key, revision)
+        if not_modified(request.headers, etag, None):
+            self.not_modified += 1
+            return Response(status_code=304, headers=self._headers(etag))
+
+        body = self._get(key, revision)
+        if body is None:
+            self.misses += 1
+            data = await build()
+            body = json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._put(key, revision, body)
+        else:
+            self.hits += 1
+        return Response(content=body, media_type="application/json", headers=self._headers(etag))
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+            size = sum(len(body) for _, body in self._entries.values())
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses,
+                "not_modified": self.not_modified}
+
+
+response_cache = ResponseCache()
@@ -1,15 +1,15 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from pydantic import BaseModel
-from pymongo import MongoClient
+from mongo_connection import get_client, pool_metrics
 
-from config import mongodb_adress
 from services.zoom_service.meet_get_video.zoom_meeting_get_records_list import run_task
 from services.schedule_service.get_google_sheets import process_sheets_data_and_update_mongo
+from services.video_service.precompression import precompression_pipeline
 
 app = FastAPI()
 
 # Подключение к базе данных MongoDB
-mongo_client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
+mongo_client = get_client()
 db = mongo_client.mds_workspace
 scheduled_tasks = db.scheduled_tasks
 
@@ -32,8 +32,20 @@ async def start_download(task_request: TaskRequest, background_tasks: Background
     return {"message": f"Task for meeting {meeting_id} is being processed."}
 
 
+@app.get("/api/zoom_service/precompression_metrics")
+async def get_precompression_metrics():
+    """Очередь предварительного сжатия скачанных записей: длина, выполненные и упавшие задачи."""
+    return precompression_pipeline.metrics()
+
+
+@app.get("/api/zoom_service/mongo_pool_metrics")
+async def get_mongo_pool_metrics():
+    """Настройки и загрузка пула соединений MongoDB процесса сервисов Zoom."""
+    return pool_metrics()
+
+
 # Подключение к базе данных MongoDB
-mongo_client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}")
+mongo_client = get_client()
 db = mongo_client.mds_workspace
 scheduled_tasks = db.scheduled_tasks
 
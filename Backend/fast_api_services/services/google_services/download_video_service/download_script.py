@@ -1,12 +1,11 @@
 import os
 import sys
+import time
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 import io
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-from database import Base, VideoDownload
+from database import SessionLocal, set_download_status
 
 if len(sys.argv) < 2:
     raise ValueError("File ID is required as an argument")
@@ -18,6 +17,10 @@ SERVICE_ACCOUNT_FILE = os.path.join(BASE_DIR, 'credentials.json')
 # ID файла, который вы хотите скачать
 FILE_ID = sys.argv[1]
 
+# Прогресс пишется в базу не чаще раза в столько секунд (и всегда по завершении),
+# чтобы запись не конкурировала с запросами сервиса к той же базе
+PROGRESS_WRITE_INTERVAL = float(os.getenv("DOWNLOAD_PROGRESS_WRITE_INTERVAL", 5))
+
 # Путь, куда будет сохранен скачанный файл
 DESTINATION_FILE_PATH = os.path.join(BASE_DIR, f'downloads/{FILE_ID}.mp4')
 
@@ -34,10 +37,7 @@ credentials = service_account.Credentials.from_service_account_file(
 # Создание службы API
 service = build('drive', 'v3', credentials=credentials)
 
-# Настройка базы данных
-DATABASE_URL = "sqlite:///./users.db"  # Убедитесь, что это правильный путь к вашей базе данных
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+# База та же, что у сервиса (database.py): WAL и ожидание блокировки вместо ошибки "database is locked"
 session = SessionLocal()
 
 # Запрос на получение файла
@@ -48,14 +48,21 @@ fh = io.FileIO(DESTINATION_FILE_PATH, 'wb')
 downloader = MediaIoBaseDownload(fh, request)
 
 done = False
-while not done:
-    status, done = downloader.next_chunk()
-    print(f"Download {int(status.progress() * 100)}%.")
-
-    # Обновление статуса загрузки в базе данных
-    video_download = session.query(VideoDownload).filter_by(file_id=FILE_ID).first()
-    if video_download:
-        video_download.download_status = int(status.progress() * 100)
-        session.commit()
+written_progress = None
+last_write_time = 0
+try:
+    while not done:
+        status, done = downloader.next_chunk()
+        progress = int(status.progress() * 100)
+        print(f"Download {progress}%.")
+
+        # Обновление статуса загрузки в базе данных: только изменившийся прогресс и не чаще интервала
+        if progress != written_progress and (done or time.monotonic() - last_write_time >= PROGRESS_WRITE_INTERVAL):
+            set_download_status(session, FILE_ID, progress)
+            written_progress = progress
+            last_write_time = time.monotonic()
+finally:
+    fh.close()
+    session.close()
 
 print("Download complete!")
@@ -2,10 +2,12 @@ import json
 import requests
 import subprocess
 import sys
+from pymongo import UpdateOne
+
+from mongo_repositories import lms_streams_repository
 
 # Пути к файлам
 auth_json_file = 'lms_auth.json'
-courses_json_file = 'lms_courses.json'
 
 # API URL
 api_url = 'https://api.mosdigitals.ru/-*************'
@@ -15,46 +17,19 @@ def get_token(user_id):
         data = json.load(file)
         return data["users"][str(user_id)]["old_lsm_token"]["token"]
 
-def update_courses_file(course_data):
-    try:
-        with open(courses_json_file, 'r') as file:
-            file_content = file.read().strip()
-            if file_content:
-                existing_data = json.loads(file_content)
-            else:
-                existing_data = None
-    except FileNotFoundError:
-        existing_data = None
-
-    if existing_data is None:
-        existing_data = {
-            "global_exclude": [],
-            "users_include": {
-                "1": [],
-            },
-            "couples": {}
-        }
-
-    for item in course_data:
-        course_id = item["id"]
-        course_name = item["course"]["name"]
-
-        if str(course_id) not in existing_data["couples"]:
-            existing_data["couples"][str(course_id)] = {
-                "name": course_name,
-                "tags": []
-            }
+def update_courses(course_data):
+    """Добавляет новые курсы и удаляет те, которых больше нет в API; теги сохраняются."""
+    streams = lms_streams_repository.collection
+    operations = [
+        UpdateOne({"_id": str(item["id"])}, {"$setOnInsert": {"name": item["course"]["name"], "tags": []}}, upsert=True)
+        for item in course_data
+    ]
+    if operations:
+        streams.bulk_write(operations, ordered=False)
 
     # Удаление курсов, которые больше не существуют в API
-    existing_course_ids = {str(item["id"]) for item in course_data}
-    existing_data["couples"] = {
-        course_id: details for course_id, details in existing_data["couples"].items()
-        if course_id in existing_course_ids
-    }
-
-    # Сохранение обновленного файла
-    with open(courses_json_file, 'w') as file:
-        json.dump(existing_data, file, indent=4, ensure_ascii=False)
+    streams.delete_many({"_id": {"$nin": [str(item["id"]) for item in course_data]}})
+    lms_streams_repository.touch_sync()
 
 def fetch_and_update_courses(retry=False):
     token = get_token(1)
@@ -69,7 +44,7 @@ def fetch_and_update_courses(retry=False):
         data = response.json()
         if data["success"] and data["code"] == 200:
             course_items = data["data"]["items"]
-            update_courses_file(course_items)
+            update_courses(course_items)
         else:
             print("API returned an error:", data["message"])
     elif response.status_code == 401 and not retry:
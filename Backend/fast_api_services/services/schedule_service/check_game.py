@@ -1,9 +1,9 @@
-import pymongo
+from mongo_connection import get_client
 from datetime import datetime, timedelta
 import re
 
 # Подключение к MongoDB
-client = pymongo.MongoClient("mongodb://localhost:27017/")
+client = get_client()
 db = client["schedule"]
 sheets_collection = db["sheets_data"]
 schedule_collection = db["schedule_games"]
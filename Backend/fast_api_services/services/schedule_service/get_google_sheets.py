@@ -1,11 +1,12 @@
 import os
-import json
 import pandas as pd
 import time
 from datetime import datetime
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from pymongo import MongoClient
+from json_store import sheets_data_store
+from mongo_connection import get_client
+from mongo_repositories import schedule_settings_repository
 
 from config import SPREADSHEET_ID
 from services.schedule_service.check_game import process_sheets_data, schedule_notifications, \
@@ -14,7 +15,7 @@ from services.schedule_service.check_game import process_sheets_data, schedule_n
 
 def process_sheets_data_and_update_mongo():
     # Настройки MongoDB
-    mongo_client = MongoClient("mongodb://localhost:27017/")
+    mongo_client = get_client()
     db = mongo_client["schedule"]
     collection_sheets = db["sheets_data"]
 
@@ -25,8 +26,7 @@ def process_sheets_data_and_update_mongo():
     # Настройки и файлы
     current_directory = os.path.dirname(os.path.abspath(__file__))
     SERVICE_ACCOUNT_FILE = os.path.join(current_directory, 'crucial-bloom-430402-b6-8c3a9b17ff2b.json')
-    output_json_file = 'services/schedule_service/sheets_data.json'
-    exclude_settings_file = 'services/schedule_service/exclude_settings.json'
+    output_json_file = sheets_data_store.path
 
     # Аутентификация и создание сервиса для доступа к Google Sheets API
     credentials = service_account.Credentials.from_service_account_file(
@@ -35,9 +35,9 @@ def process_sheets_data_and_update_mongo():
     )
     service = build('sheets', 'v4', credentials=credentials)
 
-    # Загрузка настроек исключений из JSON файла
-    with open(exclude_settings_file, 'r', encoding='utf-8') as file:
-        exclude_settings = json.load(file)
+    # Загрузка настроек исключений
+    settings = schedule_settings_repository.collection
+    exclude_settings = settings.find_one({"_id": schedule_settings_repository.name}) or {}
     global_exclude = exclude_settings.get("global_exclude", [])
 
     # Получение списка всех листов
@@ -50,10 +50,8 @@ def process_sheets_data_and_update_mongo():
     for name in sheet_names:
         print(name)
 
-    exclude_settings['all_lists'] = sheet_names
-
-    with open(exclude_settings_file, 'w', encoding='utf-8') as file:
-        json.dump(exclude_settings, file, ensure_ascii=False, indent=4)
+    settings.update_one({"_id": schedule_settings_repository.name}, {"$set": {"all_lists": sheet_names}}, upsert=True)
+    schedule_settings_repository.touch_sync()
 
     # Обработка каждого листа, который не находится в глобальном исключении
     sheets_data = {}
@@ -111,8 +109,7 @@ def process_sheets_data_and_update_mongo():
 
             time.sleep(0.5)
 
-    with open(output_json_file, 'w', encoding='utf-8') as file:
-        json.dump(sheets_data, file, ensure_ascii=False, indent=4)
+    sheets_data_store.write(sheets_data)
 
     print(f"Данные успешно сохранены в файлы {output_json_file} и записаны в MongoDB.")
     # Обновляем время последнего обновления в базе данных info
@@ -1,29 +1,19 @@
-import json
-import os
 from datetime import datetime
 
-json_file_path = 'services/schedule_service/lecture_on_platform.json'
+from pymongo import UpdateOne
 
-def load_json(file_path):
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as file:
-            try:
-                return json.load(file)
-            except json.JSONDecodeError:
-                return {}
-    return {}
+from json_store import sheets_data_store
+from mongo_repositories import platform_lectures_repository, schedule_settings_repository
 
-def filter_today_data(user_id):
-    exclude_settings_file = 'services/schedule_service/exclude_settings.json'
-    sheets_data_file = 'services/schedule_service/sheets_data.json'
 
+def filter_today_data(user_id):
     # Загрузка настроек исключений
-    exclude_settings = load_json(exclude_settings_file)
+    exclude_settings = schedule_settings_repository.collection.find_one({"_id": schedule_settings_repository.name}) or {}
     global_exclude = exclude_settings.get("global_exclude", [])
     users_exclude = exclude_settings.get("users_exclude", {}).get(str(user_id), [])
 
     # Загрузка данных из основного файла
-    sheets_data = load_json(sheets_data_file)
+    sheets_data = sheets_data_store.read()
 
     filtered_data = []
 
@@ -55,43 +45,34 @@ def filter_today_data(user_id):
 
     return filtered_data
 
-def update_json_file(new_data):
-    if os.path.exists(json_file_path):
-        try:
-            with open(json_file_path, 'r', encoding='utf-8') as file:
-                existing_data = json.load(file)
-        except json.JSONDecodeError:
-            existing_data = []
-    else:
-        existing_data = []
-
-    updated = False
+def update_platform_lectures(new_data):
+    """Добавляет новые лекции и переносит изменения из таблицы в google_sheets и platform_lecture."""
+    lectures = platform_lectures_repository.collection
+    existing_items = {
+        item['_id']: item
+        for item in lectures.find({"_id": {"$in": [item['id'] for item in new_data]}}, {"google_sheets": 1})
+    }
 
+    operations = []
     for new_item in new_data:
         new_id = new_item['id']
-        found = False
-        for existing_item in existing_data:
-            if existing_item['id'] == new_id:
-                found = True
-                differences = {k: new_item[k] for k in new_item if
-                               k != 'id' and new_item[k] != existing_item['google_sheets'].get(k)}
-                if differences:
-                    existing_item['google_sheets'].update(differences)
-                    existing_item['platform_lecture'].update(differences)
-                    updated = True
-                break
-        if not found:
-            new_record = {
-                "id": new_id,
-                "google_sheets": {k: new_item[k] for k in new_item if k != 'id'},
-                "platform_lecture": {k: new_item[k] for k in new_item if k != 'id'}
-            }
-            existing_data.append(new_record)
-            updated = True
+        fields = {k: new_item[k] for k in new_item if k != 'id'}
+        existing_item = existing_items.get(new_id)
+        if existing_item is None:
+            operations.append(UpdateOne(
+                {"_id": new_id},
+                {"$setOnInsert": {"google_sheets": fields, "platform_lecture": fields}},
+                upsert=True
+            ))
+            continue
+        differences = {k: v for k, v in fields.items() if v != existing_item['google_sheets'].get(k)}
+        if differences:
+            update = {f"google_sheets.{k}": v for k, v in differences.items()}
+            update.update({f"platform_lecture.{k}": v for k, v in differences.items()})
+            operations.append(UpdateOne({"_id": new_id}, {"$set": update}))
 
-    if updated:
-        with open(json_file_path, 'w', encoding='utf-8') as file:
-            json.dump(existing_data, file, ensure_ascii=False, indent=4)
+    if operations:
+        lectures.bulk_write(operations, ordered=False)
         print(f"Обновлены данные: {new_data}")
     else:
         print("Все id уже существуют или нет изменений.")
@@ -99,7 +80,7 @@ def update_json_file(new_data):
 def get_lectures_main(user_id):
     data = filter_today_data(user_id)
     if data:
-        update_json_file(data)
+        update_platform_lectures(data)
         return data
     else:
         return []
@@ -1,8 +1,9 @@
 import config
 import asyncio
-import json
+from pymongo import UpdateOne
 from telethon import TelegramClient
-import os
+
+from mongo_repositories import telegram_channels_repository
 
 async def get_channels():
     async with TelegramClient(config.session_name, config.api_id, config.api_hash) as client:
@@ -13,31 +14,19 @@ async def get_channels():
                 print(f"Channel name: {dialog.name}, Channel ID: {dialog.id}")
         return channels
 
-def update_json_file(channels):
-    json_file_path = 'linking_channels.json'
-
-    # Чтение существующего файла
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        data = {"global_exclude": [], "users_include": {}, "couples": {}}
-    except json.JSONDecodeError:
-        data = {"global_exclude": [], "users_include": {}, "couples": {}}
-
-    # Обновление данных
-    for channel in channels:
-        channel_id = str(channel["id"])
-        if channel_id not in data["couples"]:
-            data["couples"][channel_id] = {"name": channel["name"], "tags": []}
-
-    # Запись обновленных данных в файл
-    with open(json_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
+def update_channels(channels):
+    """Добавляет новые каналы; теги и исключения уже известных каналов не трогаются."""
+    operations = [
+        UpdateOne({"_id": str(channel["id"])}, {"$setOnInsert": {"name": channel["name"], "tags": []}}, upsert=True)
+        for channel in channels
+    ]
+    if operations:
+        telegram_channels_repository.collection.bulk_write(operations, ordered=False)
+    telegram_channels_repository.touch_sync()
 
 async def main():
     channels = await get_channels()
-    update_json_file(channels)
+    update_channels(channels)
 
 if __name__ == '__main__':
     asyncio.run(main())
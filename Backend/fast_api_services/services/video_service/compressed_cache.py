@@ -0,0 +1,251 @@
+import contextlib
+import fcntl
+import os
+import time
+import uuid
+from threading import Lock
+
+BASE_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+COMPRESSED_DIRECTORY = os.path.join(BASE_DIRECTORY, "downloads", "compressed")
+# Квота на сжатые копии; при превышении вытесняются наименее востребованные записи
+CACHE_MAX_BYTES = int(os.getenv("COMPRESSED_CACHE_MAX_BYTES", 50 * 1024 ** 3))
+# lru - вытесняется давно не запрошенная запись, lfu - реже всего запрашиваемая
+CACHE_POLICY = os.getenv("COMPRESSED_CACHE_POLICY", "lru")
+
+FILE_PREFIX = "compressed_"
+FILE_SUFFIX = ".mp4"
+# Блокировка вытеснения между процессами (основной сервис и service_main пишут в один каталог)
+QUOTA_LOCK_NAME = ".quota.lock"
+# Не чаще раза в столько секунд обращение к копии отмечается в atime файла
+ACCESS_MARK_INTERVAL = 60
+
+
+class CompressedVideoCache:
+    """
+    Каталог сжатых копий записей с ограничением по размеру.
+    Файлы публикуются только rename-ом готового временного файла, поэтому читатель
+    никогда не видит недописанное видео.
+    Каталог общий для нескольких процессов, поэтому квота считается по самому каталогу:
+    перед вытеснением он пересканируется под межпроцессной блокировкой. Время последнего
+    обращения хранится в atime файла и видно всем процессам; число обращений (для lfu)
+    и счётчики статистики - свои у каждого процесса.
+    """
+
+    def __init__(self, directory=COMPRESSED_DIRECTORY, max_bytes=CACHE_MAX_BYTES, policy=CACHE_POLICY):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self._entries = None
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.published = 0
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{FILE_PREFIX}{key}{FILE_SUFFIX}")
+
+    def temp_path_for(self, key):
+        """Уникальный временный файл рядом с итоговым (тот же том - rename атомарен)."""
+        os.makedirs(self.directory, exist_ok=True)
+        return f"{self.path_for(key)}.part-{uuid.uuid4().hex}"
+
+    @staticmethod
+    def _disk_size(stat_result):
+        # Жёсткая ссылка на исходник (сжатие пропущено) места не занимает и при вытеснении его не освободит
+        if stat_result.st_nlink > 1:
+            return 0
+        return stat_result.st_size
+
+    @staticmethod
+    def _last_access(stat_result):
+        # rename при публикации atime не меняет, поэтому новая копия "свежа" по mtime
+        return max(stat_result.st_atime, stat_result.st_mtime)
+
+    def _scan(self):
+        """stat всех опубликованных копий каталога: ключ -> os.stat_result."""
+        os.makedirs(self.directory, exist_ok=True)
+        result = {}
+        for name in os.listdir(self.directory):
+            if not (name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX)):
+                continue
+            try:
+                result[name[len(FILE_PREFIX):-len(FILE_SUFFIX)]] = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+        return result
+
+    def _sync(self):
+        """Приводит индекс к содержимому каталога, в том числе к копиям других процессов (под блокировкой)."""
+        on_disk = self._scan()
+        entries = self._entries or {}
+        self._entries = {}
+        for key, stat_result in on_disk.items():
+            entry = entries.get(key) or {"last_access": 0.0, "hits": 0}
+            entry["size"] = self._disk_size(stat_result)
+            entry["last_access"] = max(entry["last_access"], self._last_access(stat_result))
+            self._entries[key] = entry
+
+    def _load(self):
+        """Первичная загрузка индекса из содержимого каталога (под блокировкой)."""
+        if self._entries is None:
+            self._sync()
+
+    def _register(self, key):
+        try:
+            stat_result = os.stat(self.path_for(key))
+        except FileNotFoundError:
+            self._entries.pop(key, None)
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {"last_access": time.time(), "hits": 0}
+            self._entries[key] = entry
+        entry["size"] = self._disk_size(stat_result)
+        return entry
+
+    def _mark_access(self, key, stat_result):
+        """Отмечает обращение в atime файла, чтобы его видели при вытеснении другие процессы (mtime и ETag не меняются)."""
+        now = time.time()
+        if now - stat_result.st_atime < ACCESS_MARK_INTERVAL:
+            return
+        try:
+            os.utime(self.path_for(key), ns=(time.time_ns(), stat_result.st_mtime_ns))
+        except OSError:
+            pass
+
+    @contextlib.contextmanager
+    def _quota_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, QUOTA_LOCK_NAME), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _eviction_order(self, protected_key):
+        candidates = [key for key in self._entries if key != protected_key]
+        if self.policy == "lfu":
+            return sorted(candidates, key=lambda key: (self._entries[key]["hits"], self._entries[key]["last_access"]))
+        return sorted(candidates, key=lambda key: self._entries[key]["last_access"])
+
+    def _enforce_quota(self, protected_key=None):
+        # Размер считается по всему каталогу: копии публикуют и другие процессы
+        with self._quota_lock():
+            self._sync()
+            total = sum(entry["size"] for entry in self._entries.values())
+            if total <= self.max_bytes:
+                return
+            for key in self._eviction_order(protected_key):
+                if total <= self.max_bytes:
+                    break
+                entry = self._entries.pop(key)
+                try:
+                    # Открытые на отдачу дескрипторы продолжают читать файл и после unlink
+                    os.remove(self.path_for(key))
+                except FileNotFoundError:
+                    pass
+                total -= entry["size"]
+                self.evictions += 1
+                self.evicted_bytes += entry["size"]
+                print(f"Сжатая копия {key} вытеснена из кэша ({entry['size']} байт).")
+
+    def lookup(self, key):
+        """Путь к готовой сжатой копии или None. Учитывается в статистике попаданий."""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            try:
+                stat_result = os.stat(self.path_for(key))
+            except FileNotFoundError:
+                stat_result = None
+            if entry is None and stat_result is not None:
+                # Файл опубликован в обход publish (потоковым сжатием или другим процессом) - принимаем в кэш
+                self._enforce_quota(protected_key=key)
+                entry = self._entries.get(key)
+            elif entry is not None and stat_result is None:
+                self._entries.pop(key, None)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["hits"] += 1
+            entry["last_access"] = time.time()
+            self._mark_access(key, stat_result)
+            return self.path_for(key)
+
+    def contains(self, key):
+        """Есть ли готовая копия; в статистике обращений не учитывается."""
+        return os.path.exists(self.path_for(key))
+
+    def publish(self, key, temp_path):
+        """Атомарно подменяет сжатую копию готовым временным файлом и при необходимости освобождает место."""
+        os.replace(temp_path, self.path_for(key))
+        self.register(key)
+
+    def register(self, key):
+        """Учитывает в кэше файл, уже опубликованный по path_for(key)."""
+        with self._lock:
+            self._load()
+            if self._register(key) is not None:
+                self.published += 1
+                self._enforce_quota(protected_key=key)
+
+    def _claim_path(self, key):
+        # Начинается с точки - в квоту и индекс не попадает
+        return os.path.join(self.directory, f".{FILE_PREFIX}{key}.inflight")
+
+    def claim(self, key, wait=False):
+        """
+        Межпроцессная отметка «сжатие key уже идёт»: flock на файле рядом с копиями.
+        Возвращает открытый файл блокировки для release или None, если сжатие уже выполняет
+        другой процесс или поток. С wait=True дожидается окончания чужого сжатия.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        claim_file = open(self._claim_path(key), "a")
+        try:
+            fcntl.flock(claim_file, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            claim_file.close()
+            return None
+        return claim_file
+
+    @staticmethod
+    def release(claim_file):
+        if claim_file is None or claim_file.closed:
+            return
+        fcntl.flock(claim_file, fcntl.LOCK_UN)
+        claim_file.close()
+
+    def remove(self, key):
+        with self._lock:
+            self._load()
+            self._entries.pop(key, None)
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            self._sync()
+            lookups = self.hits + self.misses
+            return {
+                "policy": self.policy,
+                "entries": len(self._entries),
+                "used_bytes": sum(entry["size"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "published": self.published,
+            }
+
+
+compressed_cache = CompressedVideoCache()
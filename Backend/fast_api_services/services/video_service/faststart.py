@@ -0,0 +1,98 @@
+import os
+import struct
+import subprocess
+import uuid
+
+from services.video_service.recording_locations import get_recording_location, set_faststart_status, to_absolute_path
+
+# Результат проверки, который сохраняется в расположении записи
+FASTSTART_OK = "faststart"
+FASTSTART_REMUXED = "remuxed"
+# Не MP4 (например, чат) - переносить нечего
+FASTSTART_UNSUPPORTED = "unsupported"
+FASTSTART_FAILED = "failed"
+
+
+class FaststartError(Exception):
+    pass
+
+
+def moov_position(file_path):
+    """
+    Где лежит moov: 'front' - до mdat (браузер начинает играть сразу), 'end' - после mdat,
+    None - файл не MP4 или moov не найден. Читаются только заголовки боксов верхнего уровня.
+    """
+    with open(file_path, "rb") as file:
+        file_size = os.fstat(file.fileno()).st_size
+        mdat_seen = False
+        offset = 0
+        while offset + 8 <= file_size:
+            file.seek(offset)
+            header = file.read(16)
+            size, box_type = struct.unpack_from(">I4s", header)
+            header_size = 8
+            if size == 1 and len(header) == 16:
+                size = struct.unpack_from(">Q", header, 8)[0]
+                header_size = 16
+            elif size == 0:
+                size = file_size - offset
+            if size < header_size:
+                return None
+            if box_type == b"moov":
+                return "end" if mdat_seen else "front"
+            if box_type == b"mdat":
+                mdat_seen = True
+            offset += size
+    return None
+
+
+def remux_faststart(file_path):
+    """Переносит moov в начало перепаковкой без перекодирования и атомарно подменяет файл."""
+    temp_path = f"{file_path}.faststart-{uuid.uuid4().hex}"
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-i", file_path,
+             "-map", "0", "-c", "copy", "-movflags", "+faststart", "-f", "mp4", temp_path],
+            capture_output=True
+        )
+        if result.returncode != 0:
+            raise FaststartError(f"ffmpeg exited with code {result.returncode}: "
+                                 f"{result.stderr.decode(errors='replace')[-1000:]}")
+        # Уже открытые на отдачу дескрипторы дочитывают старый файл
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def ensure_faststart(file_path):
+    """Проверяет положение moov и при необходимости перепаковывает файл. Возвращает результат проверки."""
+    position = moov_position(file_path)
+    if position is None:
+        return FASTSTART_UNSUPPORTED
+    if position == "front":
+        return FASTSTART_OK
+    remux_faststart(file_path)
+    return FASTSTART_REMUXED
+
+
+def ensure_recording_faststart(recording_id, file_path=None):
+    """
+    Этап приёма записи: faststart для оригинала. Результат сохраняется в recording_locations,
+    поэтому для уже проверенной записи (в том числе с ошибкой) повторно ничего не выполняется.
+    """
+    location = get_recording_location(recording_id) or {}
+    if location.get("faststart"):
+        return location["faststart"]["status"]
+
+    file_path = file_path or location.get("file_path")
+    if not file_path:
+        return None
+    try:
+        status = ensure_faststart(to_absolute_path(file_path))
+    except (FaststartError, OSError) as e:
+        print(f"Не удалось перенести moov в начало записи {recording_id}: {e}")
+        status = FASTSTART_FAILED
+    set_faststart_status(recording_id, status)
+    print(f"Проверка faststart записи {recording_id}: {status}.")
+    return status
@@ -0,0 +1,107 @@
+import os
+import queue
+import threading
+import time
+
+import requests
+
+from services.video_service.transcode_jobs import request_compression
+
+# Сколько записей одновременно отдаём сервису сжатия; остальные ждут в очереди
+PRECOMPRESSION_CONCURRENCY = int(os.getenv("PRECOMPRESSION_CONCURRENCY", 2))
+# Типы записей Zoom, которые имеет смысл сжимать заранее (чат - текстовый файл)
+PRECOMPRESS_RECORDING_TYPES = {"shared_screen_with_speaker_view", "shared_screen", "audio_only"}
+
+
+class PrecompressionPipeline:
+    """
+    Фоновое сжатие только что скачанных записей, чтобы к первому просмотру сжатая копия уже была.
+    Работает на потоках: загрузки из Zoom выполняются синхронно в пуле потоков.
+    Задачи уходят в сервис сжатия с приоритетом batch и не мешают сжатию под воспроизведение.
+    """
+
+    def __init__(self, concurrency=PRECOMPRESSION_CONCURRENCY):
+        self.concurrency = concurrency
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._workers = []
+        self.running = 0
+        self.enqueued = 0
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _start_workers(self):
+        if self._workers:
+            return
+        for index in range(self.concurrency):
+            worker = threading.Thread(target=self._worker, name=f"precompression-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def enqueue(self, recording_id, source_path, recording_type):
+        """Ставит запись в очередь на сжатие. Повторная постановка той же записи игнорируется."""
+        if recording_type not in PRECOMPRESS_RECORDING_TYPES:
+            return False
+        with self._lock:
+            if recording_id in self._pending:
+                return False
+            self._pending.add(recording_id)
+            self.enqueued += 1
+            self._start_workers()
+        self._queue.put((time.monotonic(), recording_id, source_path, recording_type))
+        print(f"Запись {recording_id} поставлена в очередь предварительного сжатия.")
+        return True
+
+    def _worker(self):
+        while True:
+            enqueued_at, recording_id, source_path, recording_type = self._queue.get()
+            wait_seconds = time.monotonic() - enqueued_at
+            with self._lock:
+                self.running += 1
+                self.total_wait_seconds += wait_seconds
+                self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+            started_at = time.monotonic()
+            try:
+                # Не ждём: запись уже сжимается (или сжата) по запросу зрителя, в том числе в другом процессе
+                if not request_compression(recording_id, source_path, recording_type, priority="batch", wait=False):
+                    with self._lock:
+                        self.skipped += 1
+                    continue
+                with self._lock:
+                    self.completed += 1
+                print(f"Запись {recording_id} предварительно сжата.")
+            except (requests.exceptions.RequestException, OSError) as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"Не удалось предварительно сжать запись {recording_id}: {e}")
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.total_run_seconds += time.monotonic() - started_at
+                    self._pending.discard(recording_id)
+                self._queue.task_done()
+
+    def metrics(self):
+        with self._lock:
+            finished = self.completed + self.failed + self.skipped
+            started = finished + self.running
+            return {
+                "concurrency": self.concurrency,
+                "backlog": self._queue.qsize(),
+                "running": self.running,
+                "enqueued": self.enqueued,
+                "completed": self.completed,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "avg_wait_seconds": (self.total_wait_seconds / started) if started else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+                "avg_run_seconds": (self.total_run_seconds / finished) if finished else 0.0,
+            }
+
+
+precompression_pipeline = PrecompressionPipeline()
@@ -0,0 +1,283 @@
+import os
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+
+import anyio
+from fastapi import HTTPException
+from starlette.responses import Response
+
+# Размер буфера для отдачи файла, когда сервер не поддерживает zero-copy
+READ_BUFFER_SIZE = 1024 * 1024
+# Ограничение на количество диапазонов в одном multi-range запросе
+MAX_RANGES = 16
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+def file_validators(file_path):
+    """Возвращает ETag и Last-Modified для файла (путь или дескриптор) на основе stat()."""
+    stat_result = os.stat(file_path)
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    return stat_result.st_size, etag, last_modified
+
+
+def parse_range_header(range_header, file_size):
+    """
+    Разбирает заголовок Range и возвращает список диапазонов (start, end) включительно.
+    Пересекающиеся и соседние диапазоны объединяются.
+    Возвращает None, если заголовок некорректен и должен быть проигнорирован.
+    """
+    if not range_header:
+        return None
+
+    unit, _, ranges_spec = range_header.strip().partition("=")
+    if unit.strip().lower() != "bytes" or not ranges_spec:
+        return None
+
+    ranges = []
+    for part in ranges_spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start_str, sep, end_str = part.partition("-")
+        if not sep:
+            return None
+        try:
+            if start_str == "":
+                # Суффиксный диапазон: последние N байт
+                suffix_length = int(end_str)
+                if suffix_length <= 0:
+                    continue
+                start = max(file_size - suffix_length, 0)
+                end = file_size - 1
+            else:
+                start = int(start_str)
+                end = int(end_str) if end_str else file_size - 1
+        except ValueError:
+            return None
+
+        if start >= file_size:
+            continue
+        if start < 0 or end < start:
+            return None
+        ranges.append((start, min(end, file_size - 1)))
+
+    if not ranges:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > MAX_RANGES:
+        # Слишком фрагментированный запрос отдаём одним диапазоном
+        merged = [(merged[0][0], merged[-1][1])]
+    return merged
+
+
+def if_range_matches(if_range, etag, last_modified):
+    """Проверка If-Range: диапазон применяется только если представление не изменилось."""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Для If-Range допустимо только сильное сравнение ETag
+        return if_range == etag
+    try:
+        return parsedate_to_datetime(if_range) == parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified(request_headers, etag, last_modified):
+    """Проверка If-None-Match / If-Modified-Since для ответа 304."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class RangeFileResponse(Response):
+    """
+    Отдаёт файл целиком (200), одним диапазоном (206) или несколькими (206 multipart/byteranges).
+    Если ASGI-сервер поддерживает расширение zerocopysend, данные уходят через sendfile,
+    иначе файл читается крупными блоками через os.pread вне event loop.
+    Представление может быть составным: байты prefix из памяти, за ними участок файла с data_offset
+    (так отдаются виртуально обрезанные записи).
+    file - уже открытый файл: ответ читает из него и закрывает после отправки.
+    """
+
+    def __init__(self, file_path, file_size, ranges, media_type, headers, status_code, prefix=b"", data_offset=0,
+                 file=None):
+        super().__init__(status_code=status_code, headers=headers, media_type=None)
+        self.file_path = file_path
+        self.file = file
+        self.file_size = file_size
+        self.ranges = ranges
+        self.file_media_type = media_type
+        self.prefix = prefix
+        self.data_offset = data_offset
+        self.boundary = uuid.uuid4().hex if ranges and len(ranges) > 1 else None
+        self._set_body_headers()
+
+    def _part_header(self, start, end):
+        return (
+            f"--{self.boundary}\r\n"
+            f"Content-Type: {self.file_media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{self.file_size}\r\n\r\n"
+        ).encode("latin-1")
+
+    def _closing_boundary(self):
+        return f"\r\n--{self.boundary}--\r\n".encode("latin-1")
+
+    def _set_body_headers(self):
+        if self.status_code == 304:
+            return
+        if not self.ranges:
+            content_length = self.file_size
+            self.headers["Content-Type"] = self.file_media_type
+        elif self.boundary is None:
+            start, end = self.ranges[0]
+            content_length = end - start + 1
+            self.headers["Content-Type"] = self.file_media_type
+            self.headers["Content-Range"] = f"bytes {start}-{end}/{self.file_size}"
+        else:
+            content_length = 0
+            for index, (start, end) in enumerate(self.ranges):
+                if index:
+                    content_length += 2  # \r\n перед следующей границей
+                content_length += len(self._part_header(start, end)) + (end - start + 1)
+            content_length += len(self._closing_boundary())
+            self.headers["Content-Type"] = f"multipart/byteranges; boundary={self.boundary}"
+        self.headers["Content-Length"] = str(content_length)
+
+    async def __call__(self, scope, receive, send):
+        if self.status_code == 304 or scope.get("method") == "HEAD":
+            # Тело не отправляется - файл не нужен (его могли уже удалить)
+            if self.file is not None:
+                self.file.close()
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        file = self.file if self.file is not None else open(self.file_path, "rb")
+        with file:
+            await self._send_response(scope, send, file)
+
+    async def _send_response(self, scope, send, file):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+        spans = self.ranges or [(0, self.file_size - 1)]
+
+        for index, (start, end) in enumerate(spans):
+            if self.boundary is not None:
+                prefix = b"\r\n" if index else b""
+                await send({"type": "http.response.body",
+                            "body": prefix + self._part_header(start, end),
+                            "more_body": True})
+            if start < len(self.prefix):
+                await send({"type": "http.response.body",
+                            "body": self.prefix[start:end + 1],
+                            "more_body": True})
+                start = len(self.prefix)
+            if start > end:
+                continue
+            # Позиция в представлении -> позиция в файле
+            file_start = self.data_offset + start - len(self.prefix)
+            file_end = self.data_offset + end - len(self.prefix)
+            if zerocopy:
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": file,
+                    "offset": file_start,
+                    "count": file_end - file_start + 1,
+                    "more_body": True,
+                })
+            else:
+                await self._send_span(send, file.fileno(), file_start, file_end)
+
+        closing = self._closing_boundary() if self.boundary is not None else b""
+        await send({"type": "http.response.body", "body": closing, "more_body": False})
+
+    @staticmethod
+    async def _send_span(send, fd, start, end):
+        offset = start
+        while offset <= end:
+            length = min(READ_BUFFER_SIZE, end - offset + 1)
+            chunk = await anyio.to_thread.run_sync(os.pread, fd, length, offset)
+            if not chunk:
+                break
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            offset += len(chunk)
+
+
+def build_range_response(request, file_path, media_type="video/mp4", range_header=None, virtual_view=None):
+    """
+    Формирует ответ для отдачи видеофайла с учётом Range, If-Range и условных заголовков.
+    virtual_view (VirtualTrimView) - отдать не сам файл, а его виртуальный срез.
+    """
+    # Файл открывается сразу: если его удалят (например, вытеснят из кэша) до отдачи,
+    # FileNotFoundError возникнет здесь, у вызывающего, а не посреди ответа
+    file = open(file_path, "rb")
+    try:
+        file_size, etag, last_modified = file_validators(file.fileno())
+    except BaseException:
+        file.close()
+        raise
+    prefix, data_offset = b"", 0
+    if virtual_view is not None:
+        file_size = virtual_view.size
+        etag = f'{etag[:-1]}-{virtual_view.tag}"'
+        prefix, data_offset = virtual_view.prefix, virtual_view.data_offset
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+    }
+
+    if not_modified(request.headers, etag, last_modified):
+        file.close()
+        return RangeFileResponse(file_path, file_size, None, media_type, headers, status_code=304)
+
+    range_header = request.headers.get("range") or range_header
+    ranges = None
+    if range_header and file_size > 0 and if_range_matches(request.headers.get("if-range"), etag, last_modified):
+        try:
+            ranges = parse_range_header(range_header, file_size)
+        except HTTPException:
+            file.close()
+            raise
+
+    # Запрос всего файла отдаём как обычный ответ 200
+    if ranges == [(0, file_size - 1)]:
+        ranges = None
+
+    status_code = 206 if ranges else 200
+    return RangeFileResponse(file_path, file_size, ranges, media_type, headers, status_code=status_code,
+                             prefix=prefix, data_offset=data_offset, file=file)
@@ -0,0 +1,154 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from mongo_connection import get_client
+from mongo_repositories import run_blocking
+
+
+# Корневая директория fast_api_services: относительные пути записей считаются от неё
+BASE_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CACHE_MAX_SIZE = 2048
+LEGACY_FILES_COLLECTIONS = ["shared_screen_with_speaker_view.files", "audio_only.files", "chat_file.files"]
+
+mongo_client = get_client()
+zoom_files_db = mongo_client['zoom_files']
+recording_locations = zoom_files_db['recording_locations']
+
+# recording_id -> документ из recording_locations (LRU)
+_locations_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+def _cache_get(recording_id):
+    with _cache_lock:
+        location = _locations_cache.get(recording_id)
+        if location is not None:
+            _locations_cache.move_to_end(recording_id)
+        return location
+
+
+def _cache_put(recording_id, location):
+    with _cache_lock:
+        _locations_cache[recording_id] = location
+        _locations_cache.move_to_end(recording_id)
+        while len(_locations_cache) > CACHE_MAX_SIZE:
+            _locations_cache.popitem(last=False)
+
+
+def invalidate_location(recording_id):
+    with _cache_lock:
+        _locations_cache.pop(recording_id, None)
+
+
+def _find_legacy_record(recording_id):
+    for collection_name in LEGACY_FILES_COLLECTIONS:
+        file_record = zoom_files_db[collection_name].find_one({"recording_id": recording_id})
+        if file_record:
+            return file_record
+    return None
+
+
+def _backfill_from_legacy(recording_id):
+    """Переносит запись, сохранённую до появления recording_locations, в новую коллекцию."""
+    file_record = _find_legacy_record(recording_id)
+    if not file_record or not file_record.get("file_path"):
+        return None
+
+    location = {
+        "recording_id": recording_id,
+        "file_path": file_record["file_path"],
+        "meeting_uuid": file_record.get("meeting_uuid"),
+        "recording_type": file_record.get("recording_type", "unknown"),
+    }
+    trimmed_record = _find_legacy_record(f"{recording_id}_trimmed")
+    if trimmed_record and trimmed_record.get("file_path"):
+        location["trimmed_file_path"] = trimmed_record["file_path"]
+
+    recording_locations.update_one({"recording_id": recording_id}, {"$set": location}, upsert=True)
+    print(f"Расположение записи {recording_id} перенесено в recording_locations.")
+    return location
+
+
+def get_recording_location(recording_id):
+    """Возвращает документ с расположением файлов записи: из кэша, индекса или старых коллекций."""
+    location = _cache_get(recording_id)
+    if location is not None:
+        return location
+
+    location = recording_locations.find_one({"recording_id": recording_id}, {"_id": 0})
+    if location is None:
+        location = _backfill_from_legacy(recording_id)
+    if location is not None:
+        _cache_put(recording_id, location)
+    return location
+
+
+async def get_recording_location_async(recording_id):
+    """get_recording_location для async-кода: при промахе кэша запросы к базе идут в пуле потоков MongoDB."""
+    location = _cache_get(recording_id)
+    if location is not None:
+        return location
+    return await run_blocking(get_recording_location, recording_id)
+
+
+def to_absolute_path(file_path):
+    return file_path if os.path.isabs(file_path) else os.path.join(BASE_DIRECTORY, file_path)
+
+
+def save_recording_location(recording_id, file_path, meeting_uuid, recording_type):
+    recording_locations.update_one(
+        {"recording_id": recording_id},
+        {"$set": {
+            "file_path": file_path,
+            "meeting_uuid": meeting_uuid,
+            "recording_type": recording_type
+        }},
+        upsert=True
+    )
+    invalidate_location(recording_id)
+
+
+def set_trimmed_location(recording_id, trimmed_file_path):
+    recording_locations.update_one(
+        {"recording_id": recording_id},
+        {"$set": {"trimmed_file_path": trimmed_file_path}, "$unset": {"virtual_trim": ""}}
+    )
+    invalidate_location(recording_id)
+
+
+def set_faststart_status(recording_id, status):
+    """Запоминает результат проверки положения moov в оригинале, чтобы не проверять его повторно."""
+    recording_locations.update_one(
+        {"recording_id": recording_id},
+        {"$set": {"faststart": {"status": status, "checked_at": time.time()}}}
+    )
+    invalidate_location(recording_id)
+
+
+def set_virtual_trim(recording_id, start_time, end_time):
+    """
+    Сохраняет виртуальную обрезку - только границы в секундах, файл не копируется.
+    Возвращает путь к прежней физически обрезанной копии (если была), чтобы её удалить.
+    """
+    location = recording_locations.find_one_and_update(
+        {"recording_id": recording_id},
+        {"$set": {"virtual_trim": {"start": start_time, "end": end_time}}, "$unset": {"trimmed_file_path": ""}}
+    )
+    invalidate_location(recording_id)
+    if location:
+        return location.get("trimmed_file_path")
+    return None
+
+
+def clear_trimmed_location(recording_id):
+    """Убирает обрезанную версию (физическую или виртуальную) из индекса и возвращает путь к файлу (если был)."""
+    location = recording_locations.find_one_and_update(
+        {"recording_id": recording_id},
+        {"$unset": {"trimmed_file_path": "", "virtual_trim": ""}}
+    )
+    invalidate_location(recording_id)
+    if location:
+        return location.get("trimmed_file_path")
+    return None
@@ -0,0 +1,360 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+
+# Сколько обрезок выполняется одновременно; остальные ждут в очереди
+TRIM_CONCURRENCY = int(os.getenv("TRIM_CONCURRENCY", 1))
+# Окно вокруг точек реза, в котором ищем ключевые кадры (без чтения всего файла)
+KEYFRAME_SEARCH_WINDOW = 30
+# Параметры перекодирования граничных GOP: качество почти без потерь, чтобы стык был незаметен.
+# repeat-headers: SPS/PPS пишутся перед каждым ключевым кадром прямо в поток (Annex-B)
+BOUNDARY_VIDEO_ARGS = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-x264-params", "repeat-headers=1"]
+# Профили H.264 (как их называет ffprobe), которые libx264 может повторить для граничных кусков
+X264_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high"}
+# Параметры видео, которые должны совпадать у всех кусков, иначе склейка копированием некорректна
+PART_COMPATIBILITY_FIELDS = ("codec_name", "profile", "pix_fmt", "width", "height")
+TRIM_AUDIO_ARGS = ["-c:a", "aac", "-b:a", "128k"]
+# Допуск, в пределах которого точка реза считается совпавшей с ключевым кадром
+FRAME_EPSILON = 0.001
+# Сколько секунд хранится состояние завершённой задачи обрезки (клиент успевает узнать результат)
+FINISHED_TRIM_JOB_TTL_SECONDS = 60 * 60
+
+# job_id -> состояние задачи обрезки
+trim_jobs = {}
+_trim_slots = None
+
+
+class TrimError(Exception):
+    pass
+
+
+def parse_timestamp(value):
+    """Время реза из запроса: число секунд или строка 'ЧЧ:ММ:СС(.мс)'."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        seconds = 0.0
+        for part in str(value).split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        raise TrimError(f"Invalid timestamp: {value}")
+
+
+async def _run_command(cmd):
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise TrimError(f"{cmd[0]} exited with code {process.returncode}: {stderr.decode(errors='replace')[-1000:]}")
+    return stdout.decode()
+
+
+async def _run_ffmpeg(args, duration, on_progress):
+    """Запускает ffmpeg и передаёт долю выполненной работы (0..1) по его выводу -progress."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-y", "-nostats", "-loglevel", "error", "-progress", "pipe:1", *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stderr_task = asyncio.ensure_future(process.stderr.read())
+    try:
+        async for line in process.stdout:
+            key, _, value = line.decode().strip().partition("=")
+            # out_time_ms в ffmpeg исторически в микросекундах
+            if key in ("out_time_us", "out_time_ms") and value.isdigit() and duration > 0:
+                on_progress(min(int(value) / 1_000_000 / duration, 1.0))
+        await process.wait()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    stderr = await stderr_task
+    if process.returncode != 0:
+        raise TrimError(f"ffmpeg exited with code {process.returncode}: {stderr.decode(errors='replace')[-1000:]}")
+    on_progress(1.0)
+
+
+async def _probe_streams(input_path):
+    output = await _run_command([
+        "ffprobe", "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,profile,level,pix_fmt,width,height",
+        "-of", "json", input_path,
+    ])
+    streams = json.loads(output).get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+    return video, audio
+
+
+async def _probe_frames(input_path, start, end):
+    """
+    Времена кадров видео рядом с точками реза и отдельно ключевых кадров
+    (по пакетам, без декодирования и без чтения всего файла).
+    """
+    intervals = [
+        f"{max(start - 1, 0):.3f}%+{KEYFRAME_SEARCH_WINDOW}",
+        f"{max(end - KEYFRAME_SEARCH_WINDOW, 0):.3f}%{end + 1:.3f}",
+    ]
+    output = await _run_command([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-read_intervals", ",".join(intervals),
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0", input_path,
+    ])
+    frames = set()
+    keyframes = set()
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(",")
+        try:
+            pts_time = float(pts_time)
+        except ValueError:
+            continue
+        frames.add(pts_time)
+        if "K" in flags:
+            keyframes.add(pts_time)
+    return sorted(frames), sorted(keyframes)
+
+
+def boundary_encoder_args(video):
+    """
+    Параметры libx264 под исходный поток (профиль, уровень, pix_fmt), чтобы перекодированные
+    куски совпадали с копируемой серединой. None - повторить поток нельзя (например, High 10).
+    """
+    profile = X264_PROFILES.get(video.get("profile"))
+    pix_fmt = video.get("pix_fmt")
+    if profile is None or pix_fmt not in ("yuv420p", "yuvj420p"):
+        return None
+    args = [*BOUNDARY_VIDEO_ARGS, "-profile:v", profile, "-pix_fmt", pix_fmt]
+    level = video.get("level")
+    # ffprobe отдаёт уровень H.264 числом 10 x уровень (41 -> 4.1)
+    if isinstance(level, int) and level > 0:
+        args += ["-level:v", f"{level / 10:.1f}"]
+    return args
+
+
+def parts_compatible(streams):
+    """Совпадают ли параметры видео у всех кусков (данные ffprobe по каждому куску)."""
+    if any(stream is None for stream in streams):
+        return False
+    return all(
+        [stream.get(field) for field in PART_COMPATIBILITY_FIELDS] ==
+        [streams[0].get(field) for field in PART_COMPATIBILITY_FIELDS]
+        for stream in streams
+    )
+
+
+def snap_to_frame(frames, timestamp):
+    """Первый кадр не раньше timestamp: рез между кадрами заставил бы кодер дублировать кадр."""
+    for frame_time in frames:
+        if frame_time >= timestamp - FRAME_EPSILON:
+            return frame_time
+    return timestamp
+
+
+def plan_cut(keyframes, start, end):
+    """
+    Делит интервал [start, end] на части:
+    голова до первого ключевого кадра и хвост после последнего перекодируются,
+    середина между ключевыми кадрами копируется как есть.
+    Возвращает список (вид, начало, конец), вид - 'encode' или 'copy'.
+    """
+    inner = [keyframe for keyframe in keyframes if start - FRAME_EPSILON <= keyframe <= end + FRAME_EPSILON]
+    # Середину можно копировать только между двумя ключевыми кадрами
+    if len(inner) < 2:
+        return [("encode", start, end)]
+
+    copy_start, copy_end = inner[0], inner[-1]
+    parts = []
+    if copy_start - start > FRAME_EPSILON:
+        parts.append(("encode", start, copy_start))
+    parts.append(("copy", copy_start, copy_end))
+    if end - copy_end > FRAME_EPSILON:
+        parts.append(("encode", copy_end, end))
+    return parts
+
+
+async def smart_trim(input_path, output_path, start, end, on_progress=lambda fraction: None):
+    """
+    Вырезает [start, end] с точностью до кадра: основная часть копируется без перекодирования,
+    перекодируются только GOP на границах. Аудио перекодируется целиком за интервал -
+    это дёшево и избавляет от щелчков AAC на стыках.
+    Результат публикуется в output_path rename-ом готового файла.
+    """
+    if end <= start:
+        raise TrimError("End time must be greater than start time")
+
+    video, audio = await _probe_streams(input_path)
+    if video is None:
+        raise TrimError("Input has no video stream")
+
+    encoder_args = boundary_encoder_args(video) if video.get("codec_name") == "h264" else None
+    if encoder_args is not None:
+        frames, keyframes = await _probe_frames(input_path, start, end)
+        start, end = snap_to_frame(frames, start), snap_to_frame(frames, end)
+        parts = plan_cut(keyframes, start, end)
+    else:
+        # Копировать середину можно только если граничные куски кодируются с теми же параметрами потока
+        parts = [("encode", start, end)]
+        encoder_args = [*BOUNDARY_VIDEO_ARGS, "-pix_fmt", video.get("pix_fmt") or "yuv420p"]
+
+    # Вес этапа в общем прогрессе: копирование почти ничего не стоит по сравнению с кодированием
+    def part_weights(parts):
+        return [(end_time - start_time) * (1.0 if kind == "encode" else 0.05) for kind, start_time, end_time in parts]
+
+    weights = part_weights(parts)
+    audio_weight = (end - start) * 0.1 if audio else 0.0
+    total_weight = sum(weights) + audio_weight or 1.0
+    completed_weight = 0.0
+
+    def stage_progress(weight):
+        return lambda fraction: on_progress((completed_weight + weight * fraction) / total_weight)
+
+    work_dir = f"{output_path}.trim-{uuid.uuid4().hex}"
+    os.makedirs(work_dir)
+    try:
+        async def write_parts(parts, weights):
+            """
+            Куски пишутся в MPEG-TS (Annex-B, SPS/PPS внутри потока перед каждым ключевым кадром):
+            в MP4 они лежали бы в avcC, а при склейке остаётся avcC только первого куска.
+            """
+            nonlocal completed_weight
+            part_paths = []
+            for index, ((kind, start_time, end_time), weight) in enumerate(zip(parts, weights)):
+                part_path = os.path.join(work_dir, f"part_{len(parts)}_{index}.ts")
+                duration = end_time - start_time
+                args = ["-ss", f"{start_time:.6f}", "-i", input_path, "-t", f"{duration:.6f}", "-map", "0:v:0", "-an"]
+                if kind == "encode":
+                    args += encoder_args
+                else:
+                    args += ["-c:v", "copy", "-bsf:v", "h264_mp4toannexb"]
+                args += ["-muxdelay", "0", "-muxpreload", "0", "-f", "mpegts", part_path]
+                await _run_ffmpeg(args, duration, stage_progress(weight))
+                completed_weight += weight
+                part_paths.append(part_path)
+            return part_paths
+
+        part_paths = await write_parts(parts, weights)
+
+        if len(part_paths) > 1:
+            part_streams = [(await _probe_streams(part_path))[0] for part_path in part_paths]
+            if not parts_compatible(part_streams):
+                # Параметры перекодированных кусков разошлись с исходным потоком - перекодируем интервал целиком
+                print(f"Параметры кусков обрезки не совпадают ({part_streams}), перекодируем интервал целиком.")
+                parts = [("encode", start, end)]
+                encoder_args = [*BOUNDARY_VIDEO_ARGS, "-pix_fmt", video.get("pix_fmt") or "yuv420p"]
+                weights = part_weights(parts)
+                total_weight = completed_weight + sum(weights) + audio_weight or 1.0
+                part_paths = await write_parts(parts, weights)
+
+        audio_path = os.path.join(work_dir, "audio.m4a")
+        if audio:
+            await _run_ffmpeg(
+                ["-ss", f"{start:.6f}", "-i", input_path, "-t", f"{end - start:.6f}",
+                 "-map", "0:a:0", "-vn", *TRIM_AUDIO_ARGS, "-f", "mp4", audio_path],
+                end - start, stage_progress(audio_weight)
+            )
+            completed_weight += audio_weight
+
+        concat_list_path = os.path.join(work_dir, "concat.txt")
+        with open(concat_list_path, "w", encoding="utf-8") as concat_list:
+            for part_path in part_paths:
+                concat_list.write(f"file '{part_path}'\n")
+
+        temp_output_path = os.path.join(work_dir, "trimmed.mp4")
+        # Куски склеиваются копированием и перепаковываются в MP4; SPS/PPS каждого куска остаются
+        # внутри потока перед его ключевыми кадрами, поэтому стыки декодируются с правильными параметрами
+        args = ["-f", "concat", "-safe", "0", "-i", concat_list_path]
+        if audio:
+            args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+        args += ["-c", "copy", "-movflags", "+faststart", "-f", "mp4", temp_output_path]
+        await _run_ffmpeg(args, 0, lambda fraction: None)
+
+        os.replace(temp_output_path, output_path)
+        on_progress(1.0)
+        return parts
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def _run_trim_job(job, on_done):
+    global _trim_slots
+    if _trim_slots is None:
+        _trim_slots = asyncio.Semaphore(TRIM_CONCURRENCY)
+
+    def on_progress(fraction):
+        job["progress"] = round(fraction, 4)
+
+    succeeded = False
+    try:
+        async with _trim_slots:
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            parts = await smart_trim(job["source_path"], job["output_path"], job["start_time"], job["end_time"],
+                                     on_progress)
+            job["reencoded_seconds"] = round(sum(end - start for kind, start, end in parts if kind == "encode"), 3)
+            job["copied_seconds"] = round(sum(end - start for kind, start, end in parts if kind == "copy"), 3)
+            succeeded = True
+    except (TrimError, OSError, ValueError) as e:
+        job["error"] = str(e)
+        print(f"Ошибка обрезки записи {job['recording_id']}: {e}")
+    finally:
+        try:
+            # Обновление базы - синхронный pymongo, выполняем вне event loop
+            await asyncio.to_thread(on_done, succeeded)
+        except Exception as e:
+            succeeded = False
+            job["error"] = job["error"] or str(e)
+            print(f"Ошибка сохранения результата обрезки {job['recording_id']}: {e}")
+        job["status"] = "done" if succeeded else "failed"
+        job["finished_at"] = time.time()
+
+
+def _prune_trim_jobs():
+    """Удаляет давно завершённые задачи, чтобы trim_jobs не рос бесконечно."""
+    now = time.time()
+    for job_id, job in list(trim_jobs.items()):
+        if job["status"] in ("done", "failed") and now - job["finished_at"] > FINISHED_TRIM_JOB_TTL_SECONDS:
+            del trim_jobs[job_id]
+
+
+def submit_trim_job(recording_id, source_path, output_path, start_time, end_time, on_done):
+    """
+    Ставит обрезку в очередь и сразу возвращает задачу.
+    on_done(succeeded) вызывается в отдельном потоке после завершения - для обновления метаданных.
+    """
+    _prune_trim_jobs()
+    job_id = uuid.uuid4().hex
+    job = {
+        "job_id": job_id,
+        "recording_id": recording_id,
+        "source_path": source_path,
+        "output_path": output_path,
+        "start_time": start_time,
+        "end_time": end_time,
+        "status": "queued",
+        "progress": 0.0,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+    }
+    trim_jobs[job_id] = job
+    job["task"] = asyncio.create_task(_run_trim_job(job, on_done))
+    return job
+
+
+def get_trim_job(job_id):
+    """Состояние задачи обрезки без служебных полей (None, если задачи нет)."""
+    job = trim_jobs.get(job_id)
+    if job is None:
+        return None
+    return {key: value for key, value in job.items() if key not in ("task", "source_path", "output_path")}
@@ -0,0 +1,305 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+
+import requests
+
+from services.video_service.compressed_cache import compressed_cache
+from services.video_service.faststart import ensure_faststart, FaststartError
+
+COMPRESSOR_URL = "http://localhost:8005/compress-video-job/"
+COMPRESSOR_STREAM_URL = "http://localhost:8005/compress-video-stream/"
+HLS_PACKAGER_URL = "http://localhost:8005/package-hls/"
+THUMBNAILS_URL = "http://localhost:8005/generate-thumbnails/"
+# Через сколько секунд после ошибки можно снова запускать обработку той же записи
+FAILED_RETRY_SECONDS = 60
+# Сколько считаем потоковое сжатие живым после ухода зрителя: сервис сжатия докодирует файл сам
+DETACHED_GRACE_SECONDS = 2 * 60 * 60
+# Если за это время промежуточные файлы сжатия не появились и не менялись - сервис сжатия упал или перезапустился
+# (с запасом на ожидание свободного ffmpeg в очереди сервиса)
+DETACHED_STALL_SECONDS = 5 * 60
+# Как часто проверяется сжатие, от которого ушёл зритель
+DETACHED_POLL_SECONDS = 30
+# Через сколько секунд после завершения задача удаляется из transcode_jobs
+FINISHED_JOB_TTL_SECONDS = 60 * 60
+RELAY_CHUNK_SIZE = 64 * 1024
+
+# ключ задачи -> состояние задачи (сжатие: recording_id, HLS: hls:<recording_id>, превью: thumbnails:<recording_id>)
+transcode_jobs = {}
+
+
+def _trim_fields(trim):
+    """Интервал виртуальной обрезки для запроса к сервису сжатия."""
+    if not trim:
+        return {}
+    return {"start_time": trim["start"], "end_time": trim["end"]}
+
+
+def request_compression(recording_id, source_path, recording_type=None, priority="interactive", trim=None,
+                        wait=True):
+    """
+    Ставит сжатие в сервис по пути к файлу на общем томе (блокирующий вызов, выполняется в отдельном потоке).
+    Сервис пишет результат во временный файл, затем кэш сжатых копий публикует его rename-ом.
+    Профиль сжатия сервис выбирает по типу записи.
+    Одну запись не сжимают дважды даже разные процессы: пока идёт чужое сжатие, вызов ждёт его
+    (wait=True) или сразу возвращает False. True - копия сжата этим вызовом.
+    """
+    claim = compressed_cache.claim(recording_id, wait=wait)
+    if claim is None:
+        return False
+    temp_path = None
+    try:
+        if compressed_cache.contains(recording_id):
+            # Копию уже сжал другой процесс, пока мы ждали
+            return False
+        temp_path = compressed_cache.temp_path_for(recording_id)
+        response = requests.post(COMPRESSOR_URL, json={
+            "input_path": os.path.abspath(source_path),
+            "output_path": temp_path,
+            "recording_type": recording_type,
+            "priority": priority,
+            **_trim_fields(trim)
+        })
+        response.raise_for_status()
+        try:
+            # Сжатая копия тоже должна начинать играть без запроса хвоста файла
+            ensure_faststart(temp_path)
+        except FaststartError as e:
+            print(f"Не удалось перенести moov в начало сжатой копии {recording_id}: {e}")
+        # Подменяем файл атомарно, чтобы читатели не увидели недописанное видео
+        compressed_cache.publish(recording_id, temp_path)
+        return True
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        compressed_cache.release(claim)
+
+
+def _request_directory(url, source_path, output_dir, trim=None):
+    """
+    Просит сервис сжатия записать результат (HLS-лесенку, листы превью) в каталог
+    и публикует каталог целиком (выполняется в отдельном потоке).
+    """
+    temp_dir = f"{output_dir}.part"
+    os.makedirs(os.path.dirname(output_dir), exist_ok=True)
+    try:
+        response = requests.post(url, json={
+            "input_path": os.path.abspath(source_path),
+            "output_dir": os.path.abspath(temp_dir),
+            **_trim_fields(trim)
+        })
+        response.raise_for_status()
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        # Публикуем каталог целиком, когда в нём есть все файлы
+        os.replace(temp_dir, output_dir)
+    finally:
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _request_hls_packaging(source_path, output_dir, trim=None):
+    _request_directory(HLS_PACKAGER_URL, source_path, output_dir, trim)
+
+
+def _request_thumbnails(source_path, output_dir, trim=None):
+    _request_directory(THUMBNAILS_URL, source_path, output_dir, trim)
+
+
+async def _run_job(job, worker, *args):
+    job["status"] = "running"
+    job["started_at"] = time.time()
+    try:
+        await asyncio.to_thread(worker, *args)
+        job["status"] = "done"
+        print(f"Обработка {job['job_key']} завершена.")
+    except (requests.exceptions.RequestException, OSError) as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        print(f"Сервис сжатия недоступен или вернул ошибку для {job['job_key']}: {e}")
+    finally:
+        job["finished_at"] = time.time()
+
+
+def _detached_alive(job):
+    """
+    Сжатие, от которого ушёл зритель, ещё идёт: промежуточные файлы сервиса сжатия недавно менялись.
+    Готовый файл переводит задачу в done, отсутствие прогресса - в failed (можно запускать заново).
+    """
+    now = time.time()
+    if compressed_cache.contains(job["recording_id"]):
+        compressed_cache.register(job["recording_id"])
+        job["status"] = "done"
+        return False
+    last_progress = job["finished_at"]
+    for progress_path in job["progress_paths"]:
+        try:
+            last_progress = max(last_progress, os.path.getmtime(progress_path))
+        except OSError:
+            # Файла ещё нет (сервис только начал) или уже нет (этап закончен или сервис упал)
+            pass
+    if now - last_progress < DETACHED_STALL_SECONDS and now - job["finished_at"] < DETACHED_GRACE_SECONDS:
+        return True
+    job["status"] = "failed"
+    job["error"] = "Compressor made no progress after the viewer left"
+    return False
+
+
+def _watch_detached(job):
+    """Держит отметку «сжатие идёт», пока сервис сжатия докодирует файл после ухода зрителя."""
+    while job["status"] == "detached" and _detached_alive(job):
+        time.sleep(DETACHED_POLL_SECONDS)
+    compressed_cache.release(job.pop("claim", None))
+
+
+def _job_in_flight(job):
+    """Задача ещё идёт (или недавно упала) - новую с тем же ключом запускать не нужно."""
+    if job is None:
+        return False
+    if job["status"] == "detached" and _detached_alive(job):
+        return True
+    if job["status"] in ("queued", "running"):
+        return True
+    if job["status"] == "failed":
+        return time.time() - job["finished_at"] < FAILED_RETRY_SECONDS
+    return False
+
+
+def _prune_jobs():
+    """Удаляет давно завершённые задачи, чтобы transcode_jobs не рос бесконечно."""
+    now = time.time()
+    for job_key, job in list(transcode_jobs.items()):
+        if job["status"] == "detached":
+            _detached_alive(job)
+        if job["status"] in ("done", "failed") and now - job["finished_at"] > FINISHED_JOB_TTL_SECONDS:
+            del transcode_jobs[job_key]
+
+
+def _new_job(job_key, recording_id, status="queued"):
+    _prune_jobs()
+    job = {
+        "job_key": job_key,
+        "recording_id": recording_id,
+        "status": status,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+    }
+    transcode_jobs[job_key] = job
+    return job
+
+
+def _ensure_job(job_key, recording_id, worker, *args):
+    """
+    Запускает фоновую задачу, если она ещё не запущена.
+    Параллельные запросы с тем же ключом присоединяются к уже идущей задаче.
+    """
+    job = transcode_jobs.get(job_key)
+    if _job_in_flight(job):
+        return job
+
+    job = _new_job(job_key, recording_id)
+    job["task"] = asyncio.create_task(_run_job(job, worker, *args))
+    return job
+
+
+def ensure_transcode_job(recording_id, source_path, recording_type=None, trim=None):
+    return _ensure_job(recording_id, recording_id, request_compression, source_path, recording_type,
+                       "interactive", trim)
+
+
+def start_progressive_relay(recording_id, source_path, recording_type=None, trim=None):
+    """
+    Запускает потоковое сжатие и возвращает итератор фрагментов fMP4 для ответа зрителю.
+    Если сжатие этой записи уже идёт, возвращает None - тогда отдаётся оригинал.
+    """
+    if _job_in_flight(transcode_jobs.get(recording_id)):
+        return None
+    # Запись может сжимать другой процесс (например, предварительное сжатие после скачивания)
+    claim = compressed_cache.claim(recording_id)
+    if claim is None:
+        return None
+
+    job = _new_job(recording_id, recording_id, status="running")
+    job["claim"] = claim
+    job["started_at"] = time.time()
+    compressed_path = compressed_cache.path_for(recording_id)
+    # Сервис сжатия пишет поток, а затем перепакованную копию во временные файлы рядом с итоговым;
+    # по их mtime видно, что он жив
+    job["progress_paths"] = [f"{compressed_path}.fragmented", f"{compressed_path}.faststart"]
+    os.makedirs(os.path.dirname(compressed_path), exist_ok=True)
+
+    def relay():
+        try:
+            # Сервис сжатия сам атомарно публикует готовый файл в compressed_path
+            with requests.post(COMPRESSOR_STREAM_URL, json={
+                "input_path": os.path.abspath(source_path),
+                "output_path": compressed_path,
+                "recording_type": recording_type,
+                **_trim_fields(trim)
+            }, stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=RELAY_CHUNK_SIZE):
+                    yield chunk
+            # К концу потока сервис уже опубликовал файл; учитываем его в квоте
+            compressed_cache.register(recording_id)
+            job["status"] = "done"
+        except requests.exceptions.RequestException as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"Потоковое сжатие {recording_id} недоступно: {e}")
+        except GeneratorExit:
+            # Зритель ушёл, но сервис сжатия продолжает кодировать файл
+            job["status"] = "detached"
+            raise
+        finally:
+            job["finished_at"] = time.time()
+            if job["status"] == "detached":
+                # Отметка снимается, когда сервис сжатия закончит или перестанет подавать признаки жизни
+                threading.Thread(target=_watch_detached, args=(job,), name=f"detached-{recording_id}",
+                                 daemon=True).start()
+            else:
+                compressed_cache.release(job.pop("claim", None))
+
+    return relay()
+
+
+def ensure_hls_job(recording_id, source_path, output_dir, trim=None):
+    return _ensure_job(f"hls:{recording_id}", recording_id, _request_hls_packaging, source_path, output_dir, trim)
+
+
+def ensure_thumbnail_job(recording_id, source_path, output_dir, trim=None):
+    return _ensure_job(f"thumbnails:{recording_id}", recording_id, _request_thumbnails, source_path, output_dir, trim)
+
+
+def _public_job_state(job):
+    if job["status"] == "detached":
+        _detached_alive(job)
+    return {key: value for key, value in job.items() if key not in ("task", "progress_paths", "claim")}
+
+
+def get_transcode_status(recording_id):
+    """Возвращает состояние задачи сжатия без служебных полей."""
+    job = transcode_jobs.get(recording_id)
+    if job is None:
+        if compressed_cache.contains(recording_id):
+            return {"recording_id": recording_id, "status": "done"}
+        return {"recording_id": recording_id, "status": "not_started"}
+    return _public_job_state(job)
+
+
+def get_hls_status(recording_id):
+    job = transcode_jobs.get(f"hls:{recording_id}")
+    if job is None:
+        return {"recording_id": recording_id, "status": "not_started"}
+    return _public_job_state(job)
+
+
+def get_thumbnail_status(recording_id):
+    job = transcode_jobs.get(f"thumbnails:{recording_id}")
+    if job is None:
+        return {"recording_id": recording_id, "status": "not_started"}
+    return _public_job_state(job)
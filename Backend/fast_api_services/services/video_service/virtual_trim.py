@@ -0,0 +1,432 @@
+import os
+import struct
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from threading import Lock
+
+# Контейнерные боксы, внутри которых есть что переписывать
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts"}
+# Потабличные данные о сэмплах, которые не пересчитываются и поэтому отбрасываются
+DROPPED_SAMPLE_BOXES = {b"sdtp", b"sbgp", b"subs", b"stps", b"cslg"}
+HEADER_CACHE_MAX_SIZE = 64
+
+
+class VirtualTrimError(Exception):
+    """Файл нельзя обрезать виртуально (фрагментированный MP4, сложный список правок и т.п.)."""
+    pass
+
+
+class VirtualTrimView:
+    """
+    Виртуальный обрезанный файл: заголовок (ftyp + новый moov + заголовок mdat)
+    и один непрерывный диапазон байт оригинала сразу за ним.
+    """
+
+    def __init__(self, prefix, data_offset, data_length):
+        self.prefix = prefix
+        self.data_offset = data_offset
+        self.data_length = data_length
+        # Отличает разные срезы одного файла в ETag
+        self.tag = f"{zlib.crc32(prefix):08x}"
+
+    @property
+    def size(self):
+        return len(self.prefix) + self.data_length
+
+
+class Box:
+    def __init__(self, box_type, payload=b"", children=None):
+        self.type = box_type
+        self.payload = payload
+        self.children = children
+
+    def find(self, box_type):
+        for child in self.children or []:
+            if child.type == box_type:
+                return child
+        return None
+
+    def find_all(self, box_type):
+        return [child for child in self.children or [] if child.type == box_type]
+
+    def serialize(self):
+        body = b"".join(child.serialize() for child in self.children) if self.children is not None else self.payload
+        size = len(body) + 8
+        if size > 0xFFFFFFFF:
+            return struct.pack(">I4sQ", 1, self.type, size + 8) + body
+        return struct.pack(">I4s", size, self.type) + body
+
+
+def _parse_boxes(data):
+    """Дерево боксов; любая ошибка разбора повреждённых данных - VirtualTrimError (обрезка уйдёт в ffmpeg)."""
+    try:
+        return _parse_box_list(data)
+    except (struct.error, IndexError, KeyError) as e:
+        raise VirtualTrimError(f"Corrupt MP4 boxes: {e}")
+
+
+def _parse_box_list(data):
+    boxes = []
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_size or offset + size > len(data):
+            raise VirtualTrimError(f"Corrupt box {box_type!r}")
+        payload = data[offset + header_size:offset + size]
+        if box_type in CONTAINER_BOXES:
+            boxes.append(Box(box_type, children=_parse_box_list(payload)))
+        else:
+            boxes.append(Box(box_type, payload=payload))
+        offset += size
+    return boxes
+
+
+def _read_top_level_boxes(file):
+    """Список (тип, смещение, размер, размер заголовка) боксов верхнего уровня без чтения mdat."""
+    file.seek(0, os.SEEK_END)
+    file_size = file.tell()
+    boxes = []
+    offset = 0
+    while offset + 8 <= file_size:
+        file.seek(offset)
+        header = file.read(16)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                raise VirtualTrimError("Truncated top-level box header")
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            raise VirtualTrimError("Corrupt top-level box")
+        boxes.append((box_type, offset, size, header_size))
+        offset += size
+    return boxes
+
+
+def _parse_table(payload, entry_format):
+    """Записи таблицы полного бокса: version/flags(4), число записей(4), записи."""
+    count = struct.unpack_from(">I", payload, 4)[0]
+    entry_size = struct.calcsize(entry_format)
+    return list(struct.iter_unpack(entry_format, payload[8:8 + count * entry_size]))
+
+
+def _build_table(version_flags, entry_format, entries):
+    packed = b"".join(struct.pack(entry_format, *entry) for entry in entries)
+    return version_flags + struct.pack(">I", len(entries)) + packed
+
+
+def _run_length(values):
+    """[a, a, b] -> [(2, a), (1, b)] для stts/ctts."""
+    entries = []
+    for value in values:
+        if entries and entries[-1][1] == value:
+            entries[-1][0] += 1
+        else:
+            entries.append([1, value])
+    return [tuple(entry) for entry in entries]
+
+
+def _expand(entries):
+    values = []
+    for count, value in entries:
+        values.extend([value] * count)
+    return values
+
+
+def _read_header_field(payload):
+    """(timescale, duration) из mvhd/mdhd с учётом версии."""
+    version = payload[0]
+    if version == 1:
+        return struct.unpack_from(">IQ", payload, 20)
+    return struct.unpack_from(">II", payload, 12)
+
+
+def _write_duration(payload, duration, duration_offset_v0, duration_offset_v1):
+    version = payload[0]
+    payload = bytearray(payload)
+    if version == 1:
+        struct.pack_into(">Q", payload, duration_offset_v1, duration)
+    else:
+        struct.pack_into(">I", payload, duration_offset_v0, min(duration, 0xFFFFFFFF))
+    return bytes(payload)
+
+
+def _set_mvhd_duration(payload, duration):
+    # v0: version/flags(4) creation(4) modification(4) timescale(4) duration(4)
+    return _write_duration(payload, duration, 16, 24)
+
+
+def _set_tkhd_duration(payload, duration):
+    # v0: version/flags(4) creation(4) modification(4) track_id(4) reserved(4) duration(4)
+    return _write_duration(payload, duration, 20, 28)
+
+
+class _Track:
+    """Таблицы сэмплов одной дорожки и её срез по времени."""
+
+    def __init__(self, trak, movie_timescale):
+        self.trak = trak
+        self.movie_timescale = movie_timescale
+        mdia = trak.find(b"mdia")
+        self.stbl = mdia.find(b"minf").find(b"stbl")
+        self.timescale, _ = _read_header_field(mdia.find(b"mdhd").payload)
+
+        stbl = self.stbl
+        if stbl.find(b"stz2") is not None:
+            raise VirtualTrimError("Compact sample sizes are not supported")
+
+        self.deltas = _expand(_parse_table(stbl.find(b"stts").payload, ">II"))
+        self.decode_times = [0, *accumulate(self.deltas)][:-1]
+        ctts = stbl.find(b"ctts")
+        if ctts is not None:
+            ctts_format = ">Ii" if ctts.payload[0] == 1 else ">II"
+            self.ctts_version_flags = ctts.payload[:4]
+            self.composition_offsets = _expand(_parse_table(ctts.payload, ctts_format))
+        else:
+            self.ctts_version_flags = None
+            self.composition_offsets = None
+
+        stss = stbl.find(b"stss")
+        self.sync_samples = [number - 1 for (number,) in _parse_table(stss.payload, ">I")] if stss else None
+
+        stsz_body = stbl.find(b"stsz").payload[4:]
+        uniform_size, sample_count = struct.unpack_from(">II", stsz_body)
+        if uniform_size:
+            self.sizes = [uniform_size] * sample_count
+        else:
+            self.sizes = list(struct.unpack_from(f">{sample_count}I", stsz_body, 8))
+        if len(self.sizes) != len(self.deltas):
+            raise VirtualTrimError("Sample tables are inconsistent")
+
+        stco = stbl.find(b"stco")
+        co64 = stbl.find(b"co64")
+        if co64 is not None:
+            self.chunk_offsets = [offset for (offset,) in _parse_table(co64.payload, ">Q")]
+        elif stco is not None:
+            self.chunk_offsets = [offset for (offset,) in _parse_table(stco.payload, ">I")]
+        else:
+            raise VirtualTrimError("Track has no chunk offsets")
+
+        # Количество сэмплов и индекс описания для каждого чанка
+        stsc = _parse_table(stbl.find(b"stsc").payload, ">III")
+        self.chunk_sample_counts = []
+        self.chunk_description_indexes = []
+        for index, (first_chunk, samples_per_chunk, description_index) in enumerate(stsc):
+            next_first_chunk = stsc[index + 1][0] if index + 1 < len(stsc) else len(self.chunk_offsets) + 1
+            for _ in range(first_chunk, next_first_chunk):
+                self.chunk_sample_counts.append(samples_per_chunk)
+                self.chunk_description_indexes.append(description_index)
+        self.chunk_first_samples = [0, *accumulate(self.chunk_sample_counts)][:-1]
+
+        self.media_time = self._edit_media_time()
+
+    def _edit_media_time(self):
+        """Сдвиг начала дорожки из списка правок (поддерживается одна непустая правка)."""
+        edts = self.trak.find(b"edts")
+        elst = edts.find(b"elst") if edts else None
+        if elst is None:
+            return 0
+        entry_format = ">QqHH" if elst.payload[0] == 1 else ">IiHH"
+        entries = _parse_table(elst.payload, entry_format)
+        if len(entries) != 1 or entries[0][1] < 0:
+            raise VirtualTrimError("Complex edit lists are not supported")
+        return entries[0][1]
+
+    def presentation_time(self, index):
+        composition = self.decode_times[index]
+        if self.composition_offsets is not None:
+            composition += self.composition_offsets[index]
+        return composition - self.media_time
+
+    def select(self, start, end):
+        """Диапазон сэмплов [first, last) в порядке декодирования для интервала [start, end) секунд."""
+        start_ts = round(start * self.timescale)
+        end_ts = round(end * self.timescale)
+        candidates = self.sync_samples if self.sync_samples is not None else range(len(self.sizes))
+        first = 0
+        for index in candidates:
+            if self.presentation_time(index) <= start_ts:
+                first = index
+            elif self.decode_times[index] - self.media_time > start_ts:
+                # Время показа не меньше времени декодирования минус сдвиг правки - дальше кандидатов нет
+                break
+        last = first
+        for index in range(first, len(self.sizes)):
+            if self.presentation_time(index) < end_ts:
+                last = index + 1
+            elif self.decode_times[index] - self.media_time >= end_ts:
+                break
+        if last <= first:
+            raise VirtualTrimError("Trim range contains no samples")
+        self.first, self.last = first, last
+        self.start_ts = start_ts
+        self.duration_ts = end_ts - start_ts
+
+    def data_span(self):
+        """Байтовый диапазон оригинала, который занимают выбранные сэмплы."""
+        self.first_chunk = bisect_right(self.chunk_first_samples, self.first) - 1
+        self.last_chunk = bisect_right(self.chunk_first_samples, self.last - 1) - 1
+        first_chunk_start = self.chunk_first_samples[self.first_chunk]
+        self.first_offset = self.chunk_offsets[self.first_chunk] + sum(self.sizes[first_chunk_start:self.first])
+        last_chunk_start = max(self.chunk_first_samples[self.last_chunk], self.first)
+        last_chunk_offset = self.chunk_offsets[self.last_chunk] if self.last_chunk != self.first_chunk \
+            else self.first_offset
+        data_end = last_chunk_offset + sum(self.sizes[last_chunk_start:self.last])
+        return self.first_offset, data_end
+
+    def rebuild(self, shift):
+        """Переписывает таблицы сэмплов дорожки под срез; shift - сдвиг смещений данных."""
+        first, last = self.first, self.last
+        stbl = self.stbl
+
+        # Чанки среза: первый начинается с первого выбранного сэмпла, последний обрезается
+        offsets = []
+        counts = []
+        descriptions = []
+        for chunk in range(self.first_chunk, self.last_chunk + 1):
+            chunk_start = self.chunk_first_samples[chunk]
+            chunk_end = chunk_start + self.chunk_sample_counts[chunk]
+            offset = self.first_offset if chunk == self.first_chunk else self.chunk_offsets[chunk]
+            offsets.append(offset + shift)
+            counts.append(min(chunk_end, last) - max(chunk_start, first))
+            descriptions.append(self.chunk_description_indexes[chunk])
+
+        stsc_entries = []
+        for chunk_number, (count, description) in enumerate(zip(counts, descriptions), start=1):
+            if not stsc_entries or stsc_entries[-1][1:] != (count, description):
+                stsc_entries.append((chunk_number, count, description))
+
+        stts_entries = _run_length(self.deltas[first:last])
+        children = []
+        for child in stbl.children:
+            if child.type in DROPPED_SAMPLE_BOXES:
+                continue
+            if child.type == b"stts":
+                child = Box(b"stts", _build_table(child.payload[:4], ">II", stts_entries))
+            elif child.type == b"ctts":
+                ctts_format = ">Ii" if self.ctts_version_flags[0] == 1 else ">II"
+                entries = _run_length(self.composition_offsets[first:last])
+                child = Box(b"ctts", _build_table(self.ctts_version_flags, ctts_format, entries))
+            elif child.type == b"stss":
+                numbers = [(index - first + 1,) for index in self.sync_samples if first <= index < last]
+                child = Box(b"stss", _build_table(child.payload[:4], ">I", numbers))
+            elif child.type == b"stsz":
+                sizes = self.sizes[first:last]
+                child = Box(b"stsz", child.payload[:4] + struct.pack(">II", 0, len(sizes))
+                            + struct.pack(f">{len(sizes)}I", *sizes))
+            elif child.type == b"stsc":
+                child = Box(b"stsc", _build_table(child.payload[:4], ">III", stsc_entries))
+            elif child.type in (b"stco", b"co64"):
+                if max(offsets) > 0xFFFFFFFF:
+                    child = Box(b"co64", _build_table(b"\0\0\0\0", ">Q", [(offset,) for offset in offsets]))
+                else:
+                    child = Box(b"stco", _build_table(b"\0\0\0\0", ">I", [(offset,) for offset in offsets]))
+            children.append(child)
+        stbl.children = children
+
+        # Длительности и список правок: показ начинается ровно с start, а не с ключевого кадра
+        mdia = self.trak.find(b"mdia")
+        mdhd = mdia.find(b"mdhd")
+        mdhd.payload = _set_mvhd_duration(mdhd.payload, sum(self.deltas[first:last]))
+        movie_duration = round(self.duration_ts * self.movie_timescale / self.timescale)
+        tkhd = self.trak.find(b"tkhd")
+        tkhd.payload = _set_tkhd_duration(tkhd.payload, movie_duration)
+        media_time = self.start_ts + self.media_time - self.decode_times[first]
+        elst = Box(b"elst", _build_table(b"\1\0\0\0", ">QqHH", [(movie_duration, media_time, 1, 0)]))
+        self.trak.children = [child for child in self.trak.children if child.type != b"edts"]
+        self.trak.children.insert(1, Box(b"edts", children=[elst]))
+        return movie_duration
+
+
+def build_virtual_trim(file_path, start, end):
+    """
+    Строит виртуальный обрезанный MP4 для интервала [start, end] секунд.
+    Таблицы сэмплов moov режутся по интервалу, смещения указывают в исходный mdat,
+    а точное начало задаётся списком правок, поэтому перекодирование не нужно.
+    """
+    if end <= start:
+        raise VirtualTrimError("End time must be greater than start time")
+
+    with open(file_path, "rb") as file:
+        top_level = _read_top_level_boxes(file)
+        types = [box_type for box_type, _, _, _ in top_level]
+        if b"moov" not in types or b"moof" in types:
+            raise VirtualTrimError("Only non-fragmented MP4 files can be trimmed virtually")
+        boxes = {}
+        for box_type, offset, size, header_size in top_level:
+            if box_type in (b"ftyp", b"moov"):
+                file.seek(offset)
+                boxes[box_type] = file.read(size)
+
+    if b"ftyp" not in boxes:
+        raise VirtualTrimError("File has no ftyp box")
+    try:
+        moov = _parse_boxes(boxes[b"moov"])[0]
+        if moov.find(b"mvex") is not None:
+            raise VirtualTrimError("Only non-fragmented MP4 files can be trimmed virtually")
+        mvhd = moov.find(b"mvhd")
+        movie_timescale, _ = _read_header_field(mvhd.payload)
+        tracks = [_Track(trak, movie_timescale) for trak in moov.find_all(b"trak")]
+        if not tracks:
+            raise VirtualTrimError("File has no tracks")
+        for track in tracks:
+            track.select(start, end)
+        spans = [track.data_span() for track in tracks]
+    except (struct.error, AttributeError, IndexError, KeyError) as e:
+        raise VirtualTrimError(f"Unsupported MP4 layout: {e}")
+    data_start = min(span[0] for span in spans)
+    data_end = max(span[1] for span in spans)
+    data_length = data_end - data_start
+
+    mdat_header = struct.pack(">I4s", data_length + 8, b"mdat") if data_length + 8 <= 0xFFFFFFFF \
+        else struct.pack(">I4sQ", 1, b"mdat", data_length + 16)
+    ftyp = boxes[b"ftyp"]
+
+    # Сдвиг смещений зависит от размера moov, а размер - от выбора stco/co64: пересобираем до сходимости.
+    # Таблицы строятся из исходных данных дорожек, поэтому повторная сборка безопасна
+    shift = 0
+    for _ in range(3):
+        durations = [track.rebuild(shift) for track in tracks]
+        mvhd.payload = _set_mvhd_duration(mvhd.payload, max(durations))
+        prefix = ftyp + moov.serialize() + mdat_header
+        if len(prefix) - data_start == shift:
+            break
+        shift = len(prefix) - data_start
+    else:
+        raise VirtualTrimError("Header layout did not converge")
+    return VirtualTrimView(prefix, data_start, data_length)
+
+
+# (путь, mtime, размер, start, end) -> VirtualTrimView (LRU)
+_header_cache = OrderedDict()
+_header_cache_lock = Lock()
+
+
+def get_virtual_trim(file_path, start, end):
+    """Виртуальный срез с кэшированием заголовка: разбор moov длинной лекции занимает заметное время."""
+    stat_result = os.stat(file_path)
+    key = (file_path, stat_result.st_mtime_ns, stat_result.st_size, start, end)
+    with _header_cache_lock:
+        view = _header_cache.get(key)
+        if view is not None:
+            _header_cache.move_to_end(key)
+            return view
+    view = build_virtual_trim(file_path, start, end)
+    with _header_cache_lock:
+        _header_cache[key] = view
+        while len(_header_cache) > HEADER_CACHE_MAX_SIZE:
+            _header_cache.popitem(last=False)
+    return view
@@ -1,13 +1,11 @@
 from datetime import datetime
 import pytz
-from pymongo import MongoClient
-from config import mongodb_adress
+from mongo_connection import get_client
 
 moscow_tz = pytz.timezone('Europe/Moscow')
 
 
-address = f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}"
-mongo_client = MongoClient(address)
+mongo_client = get_client()
 db = mongo_client.queue_workers
 scheduled_tasks = db.download_tasks
 
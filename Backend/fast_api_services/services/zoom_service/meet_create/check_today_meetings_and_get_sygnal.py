@@ -7,10 +7,6 @@ import os
 from services.zoom_service.meet_check_status.zoom_meeting_check_status_api import get_meeting_info
 
 
-current_directory = os.path.dirname(os.path.abspath(__file__))
-zoom_meetings_file_path = os.path.join(current_directory, "zoom_meetings.json")
-
-
 async def check_status_and_download(email, meeting_id):
     """Функция, которая периодически проверяет статус встречи и запускает загрузку записей, когда статус изменится"""
     while True:
@@ -1,9 +1,5 @@
 from services.zoom_service.meet_create.util import format_time, format_zoom, remove_quotes, start_meeting_creation
-
-import json
-
-with open('services/zoom_service/meet_create/accounts.json', 'r') as f:
-    accounts = json.load(f)
+from json_store import zoom_accounts_store
 
 def process_conference_data(data: dict):
     conference_id = data.get('id')
@@ -16,7 +12,7 @@ def process_conference_data(data: dict):
     conference_data['zoom'] = format_zoom(conference_data.get('zoom', ''))
 
     zoom_email = conference_data['zoom']
-    account_data = accounts.get(zoom_email, {})
+    account_data = zoom_accounts_store.read().get(zoom_email, {})
     conference_data.update(account_data)
 
     print(f"Conference Data: {conference_data}")
@@ -1,25 +1,12 @@
 import concurrent
-import os
 import time
-import json
 
+from json_store import zoom_accounts_store
+from mongo_repositories import zoom_meetings_repository
 from services.zoom_service.create_task_for_download import schedule_meeting_task
 
 from services.zoom_service.meet_create.zoom_meeting_creator_api import zoom_meeting_creator_api
 
-import json
-
-with open('services/zoom_service/meet_create/accounts.json', 'r') as f:
-    accounts = json.load(f)
-
-def save_json(file_path, data):
-    with open(file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
-def load_json(file_path):
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    return {}
 def remove_quotes(value):
     if value.startswith('"') and value.endswith('"'):
         return value[1:-1]
@@ -108,7 +95,7 @@ def process_conference_data(data: dict):
     conference_data['лектор'] = conference_data.get('лектор', '')
     conference_data['zoom'] = format_zoom(conference_data.get('zoom', ''))
     zoom_email = conference_data['zoom']
-    account_data = accounts.get(zoom_email, {})
+    account_data = zoom_accounts_store.read().get(zoom_email, {})
     conference_data.update(account_data)
     result = start_meeting_creation(conference_data)
     print(f"Meeting Creation Result: {result}")
@@ -129,10 +116,9 @@ def process_conference_data(data: dict):
 
 
 def converted_conference_from_file(conference_id):
-    zoom_meeting_file = 'services/zoom_service/meet_create/zoom_meetings.json'
-    zoom_meetings_data = load_json(zoom_meeting_file)
+    """Создаёт встречи Zoom по сохранённой конференции (mds_workspace.zoom_meetings) и записывает результат в неё."""
     conference_id = str(conference_id)
-    meeting_info = zoom_meetings_data[conference_id]['meeting_info']
+    meeting_info = zoom_meetings_repository.collection.find_one({"_id": conference_id})['meeting_info']
     data_for_processing = {
         "id": conference_id,
         "data": {
@@ -147,9 +133,8 @@ def converted_conference_from_file(conference_id):
     }
 
     result = process_conference_data(data_for_processing)
-    zoom_meetings_data[conference_id]['formed_conference'] = result
-
-    save_json(zoom_meeting_file, zoom_meetings_data)
+    zoom_meetings_repository.collection.update_one({"_id": conference_id}, {"$set": {"formed_conference": result}})
+    zoom_meetings_repository.touch_sync()
 
     return {'status': result['status']}
 
@@ -1,25 +1,22 @@
 import base64
+import copy
 import datetime
 import json
 import pytz
 import requests
 import time
+from json_store import zoom_accounts_store
 from services.zoom_service.meet_create.date_reconstruct import process_time
 
-accounts_path = "services/zoom_service/meet_create/accounts.json"
-
 def load_account_info(email):
-    with open(accounts_path, 'r') as file:
-        accounts = json.load(file)
-    return accounts.get(email)
+    # Копия: вызывающий код меняет account_info (токен) перед сохранением
+    return copy.deepcopy(zoom_accounts_store.read().get(email))
 
 
 def save_account_info(email, account_info):
-    with open(accounts_path, 'r') as file:
-        accounts = json.load(file)
-    accounts[email] = account_info
-    with open(accounts_path, 'w') as file:
-        json.dump(accounts, file, indent=4)
+    def set_account(accounts):
+        accounts[email] = account_info
+    zoom_accounts_store.update(set_account)
 
 
 def is_token_expired(token_expiry_time):
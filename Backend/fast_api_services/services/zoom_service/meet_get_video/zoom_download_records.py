@@ -1,13 +1,16 @@
 import os
 import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from pymongo import MongoClient
+from mongo_connection import get_client
 from gridfs import GridFS
+from services.video_service.faststart import ensure_recording_faststart
+from services.video_service.precompression import precompression_pipeline
+from services.video_service.recording_locations import save_recording_location
 from services.zoom_service.zoom_api_util import load_account_info, is_token_expired, refresh_access_token
 
 def get_mongo_collections():
     """Инициализация подключения к MongoDB и GridFS коллекциям."""
-    client = MongoClient('mongodb://localhost:27017/')
+    client = get_client()
     db = client['zoom_files']
     screen_fs = GridFS(db, collection='shared_screen_with_speaker_view')
     audio_fs = GridFS(db, collection='audio_only')
@@ -25,7 +28,7 @@ def check_recording_exists(recording_id):
 
 def update_task_status(meeting_id, status):
     """Обновляет статус задачи загрузки для указанного meeting_id."""
-    client = MongoClient('mongodb://localhost:27017/')
+    client = get_client()
     db = client.queue_workers
     download_tasks = db.download_tasks
 
@@ -41,7 +44,7 @@ def update_task_status(meeting_id, status):
 
 def update_download_status(meeting_uuid, recording_id, status):
     """Обновляет статус загрузки записи в MongoDB."""
-    client = MongoClient('mongodb://localhost:27017/')
+    client = get_client()
     db = client.mds_workspace
     conference_videos = db.conference_videos
     result = conference_videos.update_one(
@@ -93,8 +96,12 @@ def download_recording_by_id(email, meeting_uuid, recording_id, meeting_id):
 
                 if file_path:
                     save_metadata_to_mongodb(file_name, file_path, meeting_uuid, recording_id, recording_type)
+                    # До отметки "скачано": пока запись никто не смотрит, файл можно подменить
+                    ensure_recording_faststart(recording_id, file_path)
                     update_download_status(meeting_uuid, recording_id, 'downloaded')
                     update_task_status(meeting_id, 'done')
+                    # Сжимаем заранее, чтобы первый зритель не ждал перекодирования
+                    precompression_pipeline.enqueue(recording_id, file_path, recording_type)
                     return file_name
 
         print(f"No recording found with ID: {recording_id}")
@@ -123,6 +130,7 @@ def save_metadata_to_mongodb(file_name, file_path, meeting_uuid, recording_id, r
     }
 
     fs._GridFS__files.insert_one(file_metadata)
+    save_recording_location(recording_id, file_path, meeting_uuid, recording_type)
     print(f"Metadata for file {file_name} saved to MongoDB with file path: {file_path}")
 
 def download_and_save_file(download_url, file_name, headers):
@@ -1,18 +1,17 @@
 import asyncio
 import requests
-from pymongo import MongoClient
+from mongo_connection import get_client
+from mongo_repositories import conference_videos_repository
 
 from services.zoom_service.meet_check_status.zoom_meeting_check_status_api import get_meeting_info
 from services.zoom_service.zoom_api_util import load_account_info, is_token_expired, refresh_access_token
 from services.zoom_service.meet_get_video.zoom_download_records import download_recordings
-from config import mongodb_adress
 
 check_interval = 120
 
 def update_task_status(meeting_id, status):
     """Обновляет статус задачи в коллекции download_tasks в MongoDB."""
-    address = f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}"
-    client = MongoClient(address)
+    client = get_client()
     db = client.queue_workers
     download_tasks = db.download_tasks
 
@@ -29,11 +28,6 @@ def update_task_status(meeting_id, status):
 
 async def check_status_and_download(email, meeting_id):
     """Функция периодически проверяет статус встречи и запускает загрузку записей, когда статус изменится"""
-    address = f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}"
-    client = MongoClient(address)
-    db = client.mds_workspace
-    conference_videos = db.conference_videos
-
     not_found_attempts = 0
     ongoing_attempts = 0
     check_interval = 120
@@ -87,8 +81,7 @@ def check_url_availability(url):
 
 def save_new_recordings_to_db(meeting_id, meeting_uuid, recordings, status, topic):
     """Сохраняет записи в MongoDB под ключом meeting_id, затем meeting_uuid."""
-    address = f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}"
-    client = MongoClient(address)
+    client = get_client()
     db = client.mds_workspace
     conference_videos = db.conference_videos
 
@@ -262,12 +255,7 @@ async def start_getting_recordings(email, meeting_id):
                     if recording_status == "success":
                         print(f"Recordings for meeting UUID {meeting['uuid']} successfully processed.")
 
-                        address = f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}"
-                        client = MongoClient(address)
-                        db = client.mds_workspace
-                        conference_videos = db.conference_videos
-
-                        meeting_data = conference_videos.find_one({"meeting_id": meeting_id})
+                        meeting_data = await conference_videos_repository.find_by_meeting_id(meeting_id)
                         if meeting_data and "meetings" in meeting_data:
                             for uuid, details in meeting_data["meetings"].items():
                                 print(f"Meeting UUID: {uuid}")
@@ -277,7 +265,7 @@ async def start_getting_recordings(email, meeting_id):
                                     for recording_id in recording_ids:
                                         print(f"- {recording_id}")
 
-                                    download_recordings(email, uuid, recording_ids, meeting_id)
+                                    await asyncio.to_thread(download_recordings, email, uuid, recording_ids, meeting_id)
 
                     elif recording_status in ["processing", None]:
                         print(f"Recording for meeting UUID {meeting['uuid']} not ready, will retry.")
@@ -311,10 +299,6 @@ async def async_task(email, meeting_id):
 
 def run_task(email, meeting_id):
     try:
-        address = f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}"
-        mongo_client = MongoClient(address)
-        db = mongo_client.mds_workspace
-        conference_videos = db.conference_videos
         asyncio.run(async_task(email, meeting_id))
     finally:
         print(f"Lock released for meeting ID: {meeting_id}")
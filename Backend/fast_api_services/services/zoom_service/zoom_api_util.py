@@ -1,24 +1,19 @@
-import os
 import base64
-import json
+import copy
 import time
 import requests
 
-# Определение абсолютного пути к accounts.json
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-ACCOUNTS_FILE_PATH = os.path.join(BASE_DIR, 'meet_create', 'accounts.json')
+from json_store import zoom_accounts_store
+
 
 def load_account_info(email):
-    with open(ACCOUNTS_FILE_PATH, 'r') as file:
-        accounts = json.load(file)
-    return accounts.get(email)
+    # Копия: вызывающий код меняет account_info (токен) перед сохранением
+    return copy.deepcopy(zoom_accounts_store.read().get(email))
 
 def save_account_info(email, account_info):
-    with open(ACCOUNTS_FILE_PATH, 'r') as file:
-        accounts = json.load(file)
-    accounts[email] = account_info
-    with open(ACCOUNTS_FILE_PATH, 'w') as file:
-        json.dump(accounts, file, indent=4)
+    def set_account(accounts):
+        accounts[email] = account_info
+    zoom_accounts_store.update(set_account)
 
 def is_token_expired(token_expiry_time):
     current_time = int(time.time())
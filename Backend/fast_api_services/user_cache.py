@@ -0,0 +1,107 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from fastapi import HTTPException, Request
+
+from database import get_user_by_email, run_db
+
+# Сколько секунд пользователь берётся из памяти без запроса к базе
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 1024))
+
+
+class CurrentUser:
+    """Снимок пользователя из auth_users: не привязан к сессии SQLAlchemy и безопасен для кэша."""
+
+    __slots__ = ("id", "email", "first_name", "last_name")
+
+    def __init__(self, id, email, first_name, last_name):
+        self.id = id
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(user.id, user.email, user.first_name, user.last_name)
+
+
+class UserCache:
+    """
+    Пользователи по email с ограничением по времени жизни и числу записей (вытесняется давно не запрошенный).
+    Отсутствующие пользователи не кэшируются, поэтому только что зарегистрированный виден сразу.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, email):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self._entries.move_to_end(email)
+            return entry[1]
+
+    def _put(self, email, user):
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _load(db, email):
+        user = get_user_by_email(db, email)
+        return CurrentUser.from_model(user) if user else None
+
+    async def get(self, email):
+        user = self._get(email)
+        if user is not None:
+            self.hits += 1
+            return user
+        self.misses += 1
+        user = await run_db(self._load, email)
+        if user is not None:
+            self._put(email, user)
+        return user
+
+    def invalidate(self, email):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {"entries": entries, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache()
+
+
+async def resolve_current_user(request: Request):
+    """
+    Пользователь запроса по email, который middleware check_authentication достал из токена.
+    Результат запоминается в request.state, поэтому за запрос пользователь ищется один раз.
+    """
+    if not hasattr(request.state, "current_user"):
+        email = getattr(request.state, "user", None)
+        request.state.current_user = await user_cache.get(email) if email else None
+    return request.state.current_user
+
+
+async def get_current_user(request: Request) -> CurrentUser:
+    """Зависимость FastAPI: текущий пользователь или 401/404."""
+    if not getattr(request.state, "user", None):
+        raise HTTPException(status_code=401, detail="Token is invalid")
+    user = await resolve_current_user(request)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
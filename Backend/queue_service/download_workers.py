@@ -6,23 +6,15 @@ from config import main_backend_adress
 
 
 # Функция для проверки задач и выполнения их по расписанию
-async def process_tasks(scheduled_tasks):  # Принимаем коллекцию как параметр
+async def process_tasks(scheduled_tasks):  # Принимаем репозиторий download_tasks как параметр
     while True:
         now = datetime.datetime.now()
 
         # Обрабатываем задачи в статусе "pending", время которых уже наступило
-        tasks = scheduled_tasks.find({"status": "pending", "execute_time": {"$lte": now}})
+        tasks = await scheduled_tasks.find_due(now)
         for task in tasks:
             # Если задача в статусе "pending", обновляем статус и устанавливаем время последнего изменения
-            scheduled_tasks.update_one(
-                {"_id": task["_id"]},
-                {
-                    "$set": {
-                        "status": "in_progress",
-                        "last_updated": now  # Устанавливаем время изменения статуса
-                    }
-                }
-            )
+            await scheduled_tasks.mark_in_progress(task["_id"], now)
             print(f"Начало выполнения задачи: email={task['email']}, meeting_id={task['meeting_id']}, "
                   f"время выполнения: {task['execute_time']}")
 
@@ -32,21 +24,11 @@ async def process_tasks(scheduled_tasks):  # Принимаем коллекци
         # Проверяем задачи, которые в статусе "in_progress" и которые уже более 20 минут в этом статусе
         ten_minutes_ago = now - datetime.timedelta(minutes=20)
         #TODO исправить время на 20 минут!
-        in_progress_tasks = scheduled_tasks.find({"status": "in_progress", "last_updated": {"$lte": ten_minutes_ago}})
+        in_progress_tasks = await scheduled_tasks.find_stale_in_progress(ten_minutes_ago)
 
         for task in in_progress_tasks:
             # Сбрасываем статус на "pending", если прошло более 10 минут с момента изменения статуса
-            scheduled_tasks.update_one(
-                {"_id": task["_id"]},
-                {
-                    "$set": {
-                        "status": "pending"
-                    },
-                    "$unset": {
-                        "last_updated": 1  # Удаляем поле "last_updated", чтобы его не было при сбросе
-                    }
-                }
-            )
+            await scheduled_tasks.reset_to_pending(task["_id"])
             print(f"Статус задачи сброшен на pending: email={task['email']}, meeting_id={task['meeting_id']}, "
                   f"время выполнения: {task['execute_time']}")
 
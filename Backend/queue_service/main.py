@@ -3,19 +3,18 @@ import aiohttp
 from fastapi import FastAPI
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from pymongo import MongoClient
 
-from config import main_backend_adress, mongodb_adress
+from config import main_backend_adress
+from mongo_connection import pool_metrics
+from mongo_repositories import download_tasks_repository, game_notifications_repository
 from download_workers import process_tasks
 from update_scheduler_and_game_notifications_worker import process_notifications, process_error_notifications
 
 app = FastAPI()
 
-# Подключение к базе данных MongoDB
-mongo_client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}/")
-db = mongo_client.queue_workers
-scheduled_tasks = db.download_tasks
-game_notifications = db.game_notification
+# Асинхронный доступ к коллекциям очередей (запросы не блокируют event loop)
+scheduled_tasks = download_tasks_repository
+game_notifications = game_notifications_repository
 
 scheduler = AsyncIOScheduler()
 
@@ -36,7 +35,7 @@ async def call_schedule_update():
 # Запуск процесса обработки задач
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(process_tasks(scheduled_tasks))  # Передаем коллекцию в процесс
+    asyncio.create_task(process_tasks(scheduled_tasks))  # Передаем репозиторий в процесс
     asyncio.create_task(process_notifications(game_notifications))
     asyncio.create_task(process_error_notifications(game_notifications))
 
@@ -45,6 +44,12 @@ async def startup_event():
 
     scheduler.start()
 
+
+@app.get("/mongo-pool-metrics")
+async def get_mongo_pool_metrics():
+    """Настройки и загрузка пула соединений MongoDB сервиса очередей."""
+    return pool_metrics()
+
 # Запуск приложения
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,109 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from mongo_connection import MONGO_MAX_POOL_SIZE, get_database
+
+# Запросы к MongoDB идут в своём пуле потоков размером с пул соединений драйвера:
+# они не занимают пул потоков по умолчанию и не ждут соединение сверх лимита пула
+_mongo_executor = ThreadPoolExecutor(max_workers=MONGO_MAX_POOL_SIZE, thread_name_prefix="mongo")
+
+
+async def run_blocking(function, *args, **kwargs):
+    """Выполняет синхронный код с запросами к MongoDB вне event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_mongo_executor, functools.partial(function, *args, **kwargs))
+
+
+class AsyncCollection:
+    """
+    Асинхронный доступ к коллекции pymongo через общий пул соединений процесса.
+    Курсор вычитывается целиком в потоке пула, поэтому find возвращает список.
+    Сама коллекция доступна как .collection - для кода, который уже выполняется в отдельном потоке.
+    Не привязан к event loop, поэтому работает и в задачах, запущенных через asyncio.run в потоках.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return await run_blocking(self.collection.find_one, *args, **kwargs)
+
+    async def find(self, filter=None, projection=None, sort=None, limit=0):
+        def read():
+            cursor = self.collection.find(filter or {}, projection, limit=limit)
+            if sort:
+                cursor = cursor.sort(sort)
+            return list(cursor)
+        return await run_blocking(read)
+
+    async def count_documents(self, filter, **kwargs):
+        return await run_blocking(self.collection.count_documents, filter, **kwargs)
+
+    async def insert_one(self, document, **kwargs):
+        return await run_blocking(self.collection.insert_one, document, **kwargs)
+
+    async def update_one(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.update_one, filter, update, **kwargs)
+
+    async def update_many(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.update_many, filter, update, **kwargs)
+
+    async def find_one_and_update(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.find_one_and_update, filter, update, **kwargs)
+
+    async def delete_one(self, filter, **kwargs):
+        return await run_blocking(self.collection.delete_one, filter, **kwargs)
+
+    async def delete_many(self, filter, **kwargs):
+        return await run_blocking(self.collection.delete_many, filter, **kwargs)
+
+
+class DownloadTasksRepository(AsyncCollection):
+    """Задачи скачивания записей Zoom по расписанию: queue_workers.download_tasks."""
+
+    async def find_due(self, now):
+        return await self.find({"status": "pending", "execute_time": {"$lte": now}})
+
+    async def find_stale_in_progress(self, updated_before):
+        return await self.find({"status": "in_progress", "last_updated": {"$lte": updated_before}})
+
+    async def mark_in_progress(self, task_id, now):
+        return await self.update_one({"_id": task_id}, {"$set": {"status": "in_progress", "last_updated": now}})
+
+    async def reset_to_pending(self, task_id):
+        # Поле last_updated удаляется, чтобы его не было при сбросе
+        return await self.update_one({"_id": task_id}, {"$set": {"status": "pending"}, "$unset": {"last_updated": 1}})
+
+
+class GameNotificationsRepository(AsyncCollection):
+    """Очередь уведомлений об играх: queue_workers.game_notification."""
+
+    async def find_pending(self):
+        return await self.find({"status": {"$nin": ["in_progress", "error"]}})
+
+    async def find_failed(self):
+        return await self.find({"status": "error"})
+
+    async def mark_in_progress(self, notification_ids, now):
+        return await self.update_many({"_id": {"$in": notification_ids}},
+                                      {"$set": {"status": "in_progress", "last_updated": now}})
+
+    async def mark_failed(self, game_ids, now):
+        return await self.update_many({"game_id": {"$in": game_ids}},
+                                      {"$set": {"status": "error", "last_updated": now}})
+
+    async def delete_by_game_ids(self, game_ids):
+        return await self.delete_many({"game_id": {"$in": game_ids}})
+
+
+class SheetsDataRepository(AsyncCollection):
+    """Расписание из Google Sheets: schedule.sheets_data."""
+
+    async def mark_notified(self, game_id):
+        return await self.update_one({"data.id": int(game_id)}, {"$set": {"data.$.notificate": True}})
+
+
+download_tasks_repository = DownloadTasksRepository(get_database("queue_workers")["download_tasks"])
+game_notifications_repository = GameNotificationsRepository(get_database("queue_workers")["game_notification"])
+sheets_data_repository = SheetsDataRepository(get_database("schedule")["sheets_data"])
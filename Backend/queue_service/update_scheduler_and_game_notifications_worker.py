@@ -1,16 +1,15 @@
 import aiohttp
 import asyncio
 import datetime
-from pymongo import MongoClient
-from config import mongodb_adress
+from mongo_repositories import sheets_data_repository
 
 
 async def process_notifications(game_notifications):
     while True:
         now = datetime.datetime.now()
 
-        notifications = game_notifications.find({"status": {"$nin": ["in_progress", "error"]}})
-        notification_count = game_notifications.count_documents({"status": {"$nin": ["in_progress", "error"]}})
+        notifications = await game_notifications.find_pending()
+        notification_count = len(notifications)
         print(f"Найдено {notification_count} уведомлений для обработки.")
 
         if notification_count == 0:
@@ -29,16 +28,8 @@ async def process_notifications(game_notifications):
                 print(f"Подготовка уведомления для game_id={game_id}")
                 game_ids.append(game_id)
 
-                # Обновляем статус на "in_progress" для текущего уведомления
-                game_notifications.update_one(
-                    {"_id": notification["_id"]},
-                    {
-                        "$set": {
-                            "status": "in_progress",
-                            "last_updated": now
-                        }
-                    }
-                )
+            # Переводим все выбранные уведомления в "in_progress" одним запросом
+            await game_notifications.mark_in_progress([notification["_id"] for notification in notifications], now)
 
             # Отправляем все уведомления одним запросом
             success_ids, failed_ids = await send_notification_request(game_ids)
@@ -47,21 +38,12 @@ async def process_notifications(game_notifications):
             if success_ids:
                 print(f"Успешные уведомления для game_ids: {success_ids}")
                 # Здесь можно раскомментировать удаление успешных записей
-                game_notifications.delete_many({"game_id": {"$in": success_ids}})
+                await game_notifications.delete_by_game_ids(success_ids)
                 print(f"Эти уведомления будут удалены: {success_ids}")
 
             if failed_ids:
                 # Обновляем статус на "error" для неудачных задач
-                for failed_id in failed_ids:
-                    game_notifications.update_one(
-                        {"game_id": failed_id},
-                        {
-                            "$set": {
-                                "status": "error",
-                                "last_updated": now
-                            }
-                        }
-                    )
+                await game_notifications.mark_failed(failed_ids, now)
                 print(f"Неудачные уведомления для game_ids: {failed_ids}")
         await asyncio.sleep(120)
 
@@ -72,8 +54,8 @@ async def process_error_notifications(game_notifications):
         now = datetime.datetime.now()
 
         # Находим все записи в статусе "error"
-        error_notifications = game_notifications.find({"status": "error"})
-        error_count = game_notifications.count_documents({"status": "error"})
+        error_notifications = await game_notifications.find_failed()
+        error_count = len(error_notifications)
         print(f"Найдено {error_count} уведомлений со статусом 'error' для повторной обработки.")
 
         if error_count == 0:
@@ -99,7 +81,7 @@ async def process_error_notifications(game_notifications):
             if success_ids:
                 print(f"Успешные уведомления для game_ids: {success_ids}")
                 # Здесь можно раскомментировать удаление успешных записей
-                game_notifications.delete_many({"game_id": {"$in": success_ids}})
+                await game_notifications.delete_by_game_ids(success_ids)
                 print(f"Эти уведомления будут удалены: {success_ids}")
 
             if failed_ids:
@@ -113,11 +95,6 @@ async def send_notification_request(game_ids):
     success_ids = []
     failed_ids = []
 
-    # Подключаемся к MongoDB
-    mongo_client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}/")
-    db = mongo_client["schedule"]
-    sheets_collection = db["sheets_data"]
-
     async with aiohttp.ClientSession() as session:
         url = "http://localhost:8004/api/telegram/send_notification"  # Микросервис для отправки уведомлений
 
@@ -132,10 +109,7 @@ async def send_notification_request(game_ids):
                     success_ids.extend(game_ids)
 
                     for game_id in game_ids:
-                        sheets_collection.update_one(
-                            {"data.id": int(game_id)},
-                            {"$set": {"data.$.notificate": True}}
-                        )
+                        await sheets_data_repository.mark_notified(game_id)
                         print(f"Поле 'notificate' для game_id={game_id} установлено в true")
                 else:
                     print(f"Ошибка при отправке уведомлений: {response.status} - {await response.text()}")
@@ -1,18 +1,16 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from pymongo import MongoClient
 import asyncio
 from telegram_bot import notify_users_with_game_data, start_bot, delete_expired_ids
-from config import mongodb_adress
+from mongo_connection import pool_metrics
+from mongo_repositories import sheets_data_repository
 from utils.get_game_data import get_game_data  # Импортируем функцию для получения данных
 import aiosqlite
 
 app = FastAPI()
 
-# Подключение к MongoDB
-mongo_client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}/")
-db = mongo_client["schedule"]
-sheets_collection = db["sheets_data"]
+# Асинхронный доступ к расписанию (запросы не блокируют event loop)
+sheets_collection = sheets_data_repository
 
 class NotificationRequest(BaseModel):
     game_ids: list[int]  # Принимаем список game_ids
@@ -24,7 +22,7 @@ async def send_notification(notification: NotificationRequest):
 
     # Получаем данные по каждому game_id
     for game_id in game_ids:
-        game_data = get_game_data(game_id, sheets_collection)
+        game_data = await get_game_data(game_id, sheets_collection)
         if not game_data:
             raise HTTPException(status_code=404, detail=f"Данные для game_id={game_id} не найдены")
 
@@ -60,4 +58,9 @@ async def startup_event():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/mongo-pool-metrics")
+async def get_mongo_pool_metrics():
+    """Настройки и загрузка пула соединений MongoDB сервиса уведомлений."""
+    return pool_metrics()
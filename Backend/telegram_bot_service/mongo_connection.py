@@ -0,0 +1,142 @@
+import os
+from threading import Lock
+
+from pymongo import MongoClient, monitoring
+
+from config import mongodb_adress
+
+# Один пул соединений на процесс; размеры настраиваются окружением под нагрузку сервиса
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+# Простаивающие соединения закрываются, чтобы пул не держал их после пика нагрузки
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 5 * 60 * 1000))
+# Сколько запрос ждёт свободное соединение, прежде чем упасть с ошибкой (0 - без ограничения)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10 * 1000))
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Счётчики использования пула по событиям драйвера (вызываются из потоков pymongo)."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.connections_open = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_checkout_wait_seconds = 0.0
+        self.max_checkout_wait_seconds = 0.0
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        # duration (время ожидания соединения) есть в событии начиная с pymongo 4.7
+        wait_seconds = getattr(event, "duration", 0.0) or 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            self.total_checkout_wait_seconds += wait_seconds
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, wait_seconds)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "connections_open": self.connections_open,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_checkout_wait_ms": (self.total_checkout_wait_seconds / self.checkouts * 1000)
+                if self.checkouts else 0.0,
+                "max_checkout_wait_ms": self.max_checkout_wait_seconds * 1000,
+                "pool_clears": self.pool_clears,
+            }
+
+
+_client = None
+_client_lock = Lock()
+pool_metrics_listener = PoolMetricsListener()
+
+
+def get_client():
+    """
+    Общий на процесс MongoClient. Создаётся при первом обращении: клиент нельзя
+    переносить через fork, а воркеры запускаются отдельными процессами.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}/",
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+                    event_listeners=[pool_metrics_listener],
+                )
+    return _client
+
+
+def get_database(name):
+    return get_client()[name]
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def pool_metrics():
+    """Настройки пула и счётчики его использования в этом процессе."""
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "max_idle_time_ms": MONGO_MAX_IDLE_TIME_MS,
+        "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        **pool_metrics_listener.snapshot(),
+    }
@@ -0,0 +1,81 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from mongo_connection import MONGO_MAX_POOL_SIZE, get_database
+
+# Запросы к MongoDB идут в своём пуле потоков размером с пул соединений драйвера:
+# они не занимают пул потоков по умолчанию и не ждут соединение сверх лимита пула
+_mongo_executor = ThreadPoolExecutor(max_workers=MONGO_MAX_POOL_SIZE, thread_name_prefix="mongo")
+
+
+async def run_blocking(function, *args, **kwargs):
+    """Выполняет синхронный код с запросами к MongoDB вне event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_mongo_executor, functools.partial(function, *args, **kwargs))
+
+
+class AsyncCollection:
+    """
+    Асинхронный доступ к коллекции pymongo через общий пул соединений процесса.
+    Курсор вычитывается целиком в потоке пула, поэтому find возвращает список.
+    Сама коллекция доступна как .collection - для кода, который уже выполняется в отдельном потоке.
+    Не привязан к event loop, поэтому работает и в задачах, запущенных через asyncio.run в потоках.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return await run_blocking(self.collection.find_one, *args, **kwargs)
+
+    async def find(self, filter=None, projection=None, sort=None, limit=0):
+        def read():
+            cursor = self.collection.find(filter or {}, projection, limit=limit)
+            if sort:
+                cursor = cursor.sort(sort)
+            return list(cursor)
+        return await run_blocking(read)
+
+    async def count_documents(self, filter, **kwargs):
+        return await run_blocking(self.collection.count_documents, filter, **kwargs)
+
+    async def insert_one(self, document, **kwargs):
+        return await run_blocking(self.collection.insert_one, document, **kwargs)
+
+    async def update_one(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.update_one, filter, update, **kwargs)
+
+    async def update_many(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.update_many, filter, update, **kwargs)
+
+    async def find_one_and_update(self, filter, update, **kwargs):
+        return await run_blocking(self.collection.find_one_and_update, filter, update, **kwargs)
+
+    async def delete_one(self, filter, **kwargs):
+        return await run_blocking(self.collection.delete_one, filter, **kwargs)
+
+    async def delete_many(self, filter, **kwargs):
+        return await run_blocking(self.collection.delete_many, filter, **kwargs)
+
+
+class SheetsDataRepository(AsyncCollection):
+    """Расписание из Google Sheets: schedule.sheets_data."""
+
+    async def find_game_entry(self, game_id):
+        """Строка расписания игры: один запрос с позиционной проекцией вместо перебора всех листов."""
+        sheet = await self.find_one({"data.id": game_id}, {"data.$": 1})
+        if not sheet:
+            return None
+        return sheet["data"][0]
+
+
+class ScheduleGamesRepository(AsyncCollection):
+    """Служебные отметки обновления расписания: info.schedule_games."""
+
+    async def find_last_update(self):
+        return await self.find_one({"name": "last_update"})
+
+
+sheets_data_repository = SheetsDataRepository(get_database("schedule")["sheets_data"])
+schedule_games_repository = ScheduleGamesRepository(get_database("info")["schedule_games"])
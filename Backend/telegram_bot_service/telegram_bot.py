@@ -5,8 +5,8 @@ import re
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram import Router, F
-from pymongo import MongoClient
-from config import TELEGRAM_API_TOKEN, mongodb_adress
+from config import TELEGRAM_API_TOKEN
+from mongo_repositories import sheets_data_repository, schedule_games_repository
 from utils.get_game_data import get_game_data
 import aiosqlite
 from datetime import datetime
@@ -16,17 +16,14 @@ bot = Bot(token=TELEGRAM_API_TOKEN)
 dp = Dispatcher()
 router = Router()
 
-mongo_client = MongoClient(f"mongodb://{mongodb_adress[0]}:{mongodb_adress[1]}/")
-db = mongo_client["schedule"]
-dbinfo = mongo_client["info"]
-sheets_collection = db["sheets_data"]
+sheets_collection = sheets_data_repository
 
 logging.basicConfig(level=logging.INFO)
 
 USERS = [99999999999]
 
 async def get_last_update_time():
-    last_update_record = dbinfo["schedule_games"].find_one({"name": "last_update"})
+    last_update_record = await schedule_games_repository.find_last_update()
     if last_update_record:
         return last_update_record['time']
     return None
@@ -69,7 +66,7 @@ async def delete_expired_ids():
             game_ids = [row[0] for row in rows]
 
     for game_id in game_ids:
-        game_data = get_game_data(game_id, sheets_collection)
+        game_data = await get_game_data(game_id, sheets_collection)
 
         if game_data:
             game_date_str = game_data['date']
@@ -127,7 +124,7 @@ async def process_callback(callback_query: types.CallbackQuery):
     user_id = callback_query.from_user.id
     game_id = int(callback_query.data)
 
-    game_data = get_game_data(game_id, sheets_collection)
+    game_data = await get_game_data(game_id, sheets_collection)
 
     if game_data:
         game_data['description'] = replace_links_with_word(game_data['description'])
@@ -181,7 +178,7 @@ async def handle_back(callback_query: types.CallbackQuery):
     buttons_markup = InlineKeyboardMarkup(inline_keyboard=[])
 
     for game_id in game_ids:
-        game_data = get_game_data(game_id, sheets_collection)
+        game_data = await get_game_data(game_id, sheets_collection)
         if game_data:
             date = game_data['date']
             stream = game_data['stream']
@@ -0,0 +1,109 @@
+"""
+Сравнение времени сжатия длинной лекции одним процессом ffmpeg и кусками параллельно.
+
+Запуск из каталога video_compressor_service:
+    python -m benchmarks.bench_parallel_encode --duration 1800 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from ffmpeg_pool import ffmpeg_pool
+from parallel_encode import encode_single, encode_segmented
+from probe import probe_duration
+from profiles import TRANSCODE_PROFILES, DEFAULT_PROFILE, video_args, audio_args
+
+VIDEO_ARGS = video_args(TRANSCODE_PROFILES[DEFAULT_PROFILE])
+AUDIO_ARGS = audio_args(TRANSCODE_PROFILES[DEFAULT_PROFILE])
+# Допустимое расхождение концов видео и звука (около кадра при 15 fps)
+MAX_AV_DRIFT_SECONDS = 0.1
+
+
+def generate_source(path, duration):
+    """Синтетическая «лекция»: 1280x720, 25 fps, движущаяся картинка и тон."""
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "250", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest",
+        path,
+    ], check=True)
+
+
+def stream_end_times(path):
+    """Время окончания первой видео- и аудиодорожки файла (None, если дорожки нет)."""
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-show_entries", "stream=codec_type,start_time,duration",
+        "-of", "json", path,
+    ], check=True, capture_output=True)
+    ends = {}
+    for stream in json.loads(result.stdout).get("streams", []):
+        codec_type = stream.get("codec_type")
+        if codec_type in ("video", "audio") and codec_type not in ends:
+            ends[codec_type] = float(stream.get("start_time") or 0) + float(stream.get("duration") or 0)
+    return ends.get("video"), ends.get("audio")
+
+
+async def run_benchmark(source_path, work_dir, workers):
+    ffmpeg_pool.concurrency = workers
+    ffmpeg_pool.start()
+    duration = await probe_duration(source_path)
+
+    single_output = os.path.join(work_dir, "single.mp4")
+    started = time.perf_counter()
+    await encode_single(source_path, single_output, VIDEO_ARGS, AUDIO_ARGS)
+    single_seconds = time.perf_counter() - started
+
+    segmented_output = os.path.join(work_dir, "segmented.mp4")
+    started = time.perf_counter()
+    await encode_segmented(source_path, segmented_output, VIDEO_ARGS, AUDIO_ARGS, duration)
+    segmented_seconds = time.perf_counter() - started
+
+    await ffmpeg_pool.stop()
+
+    print(f"Длительность исходника:  {duration:.1f} с")
+    print(f"Воркеров ffmpeg:         {workers} (ядер: {os.cpu_count()})")
+    print(f"Один процесс:            {single_seconds:.1f} с")
+    print(f"Кусками параллельно:     {segmented_seconds:.1f} с")
+    print(f"Ускорение:               x{single_seconds / segmented_seconds:.2f}")
+    print(f"Длительность результата: {await probe_duration(single_output):.1f} с / "
+          f"{await probe_duration(segmented_output):.1f} с")
+
+    # Склейка кусков не должна уводить видео от звука
+    video_end, audio_end = stream_end_times(segmented_output)
+    if video_end is not None and audio_end is not None:
+        drift = video_end - audio_end
+        print(f"Конец видео / звука:     {video_end:.3f} с / {audio_end:.3f} с (расхождение {drift:+.3f} с)")
+        if abs(drift) > MAX_AV_DRIFT_SECONDS:
+            raise SystemExit(f"Рассинхрон видео и звука {drift:+.3f} с превышает {MAX_AV_DRIFT_SECONDS} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=1800, help="длительность синтетического видео, с")
+    parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 1) // 2, 2))
+    parser.add_argument("--source", help="готовый файл вместо синтетического")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_parallel_encode_")
+    try:
+        source_path = args.source
+        if not source_path:
+            source_path = os.path.join(work_dir, "source.mp4")
+            print(f"Генерация синтетического видео на {args.duration} с...")
+            generate_source(source_path, args.duration)
+        asyncio.run(run_benchmark(source_path, work_dir, args.workers))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
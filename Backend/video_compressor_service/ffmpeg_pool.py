@@ -0,0 +1,163 @@
+import asyncio
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+
+# Классы приоритета: меньшее значение обслуживается раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+# libx264 сам распараллеливает кодирование, поэтому одновременно держим процессов вдвое меньше, чем ядер
+DEFAULT_CONCURRENCY = max((os.cpu_count() or 1) // 2, 1)
+
+
+class FfmpegJobError(Exception):
+    def __init__(self, returncode, stderr_tail):
+        super().__init__(f"ffmpeg exited with code {returncode}")
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+
+
+class FfmpegPool:
+    """
+    Очередь задач ffmpeg с ограничением параллельности и приоритетами.
+    Процессы запускаются как asyncio subprocess, event loop не блокируется.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY):
+        self.concurrency = concurrency
+        self._queue = None
+        self._workers = []
+        self._sequence = itertools.count()
+        self.running = 0
+        self.completed = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.failed = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.started = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.total_wait_seconds = {name: 0.0 for name in PRIORITY_NAMES.values()}
+        self.max_wait_seconds = {name: 0.0 for name in PRIORITY_NAMES.values()}
+
+    def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _submit(self, job, priority):
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.queued[PRIORITY_NAMES[priority]] += 1
+        # Порядковый номер сохраняет FIFO внутри одного класса приоритета
+        await self._queue.put((priority, next(self._sequence), time.monotonic(), job, future))
+        return await future
+
+    async def run(self, cmd, priority=PRIORITY_BATCH):
+        """Ставит команду в очередь и ждёт её завершения. Бросает FfmpegJobError при ошибке."""
+        return await self._submit(lambda: self._execute(cmd), priority)
+
+    @asynccontextmanager
+    async def reserve(self, priority=PRIORITY_BATCH):
+        """
+        Занимает слот пула на время блока with. Нужен для процессов, которыми управляет
+        вызывающий код (например, потоковое кодирование с чтением stdout).
+        """
+        loop = asyncio.get_running_loop()
+        acquired = loop.create_future()
+        released = loop.create_future()
+
+        async def hold():
+            acquired.set_result(None)
+            await released
+
+        holder = asyncio.ensure_future(self._submit(hold, priority))
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            released.set_result(None)
+            holder.cancel()
+            raise
+        try:
+            yield
+        finally:
+            released.set_result(None)
+            await holder
+
+    async def _worker(self):
+        while True:
+            priority, _, enqueued_at, job, future = await self._queue.get()
+            priority_name = PRIORITY_NAMES[priority]
+            self.queued[priority_name] -= 1
+            self.started[priority_name] += 1
+            wait_seconds = time.monotonic() - enqueued_at
+            self.total_wait_seconds[priority_name] += wait_seconds
+            self.max_wait_seconds[priority_name] = max(self.max_wait_seconds[priority_name], wait_seconds)
+
+            if future.cancelled():
+                self._queue.task_done()
+                continue
+
+            self.running += 1
+            try:
+                result = await job()
+                self.completed[priority_name] += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self.failed[priority_name] += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    @staticmethod
+    async def _execute(cmd):
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            stderr_tail = stderr.decode(errors="replace")[-2000:]
+            print(f"ffmpeg завершился с ошибкой {process.returncode}: {stderr_tail}")
+            raise FfmpegJobError(process.returncode, stderr_tail)
+        return process.returncode
+
+    def metrics(self):
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queued": dict(self.queued),
+            "completed": dict(self.completed),
+            "failed": dict(self.failed),
+            "avg_wait_seconds": {
+                name: (self.total_wait_seconds[name] / self.started[name]) if self.started[name] else 0.0
+                for name in PRIORITY_NAMES.values()
+            },
+            "max_wait_seconds": dict(self.max_wait_seconds),
+        }
+
+
+ffmpeg_pool = FfmpegPool()
+
+
+def parse_priority(value):
+    """Преобразует 'interactive' / 'batch' из запроса в класс приоритета."""
+    if value == "interactive":
+        return PRIORITY_INTERACTIVE
+    return PRIORITY_BATCH
@@ -0,0 +1,74 @@
+import os
+
+# Длительность HLS-сегмента в секундах
+SEGMENT_SECONDS = 4
+FRAME_RATE = 25
+
+# Лесенка качеств: от самого лёгкого варианта к самому тяжёлому
+HLS_LADDER = [
+    {"name": "360p", "width": 640, "height": 360, "video_bitrate": "500k", "maxrate": "550k", "bufsize": "1000k", "audio_bitrate": "48k"},
+    {"name": "540p", "width": 960, "height": 540, "video_bitrate": "1000k", "maxrate": "1100k", "bufsize": "2000k", "audio_bitrate": "64k"},
+    {"name": "720p", "width": 1280, "height": 720, "video_bitrate": "1800k", "maxrate": "2000k", "bufsize": "3600k", "audio_bitrate": "96k"},
+]
+
+
+def build_hls_command(input_path, output_dir, ladder=HLS_LADDER, segment_seconds=SEGMENT_SECONDS, input_args=(),
+                      has_audio=True):
+    """
+    Собирает команду ffmpeg, которая за один проход кодирует все варианты лесенки
+    и пишет master.m3u8, а также <вариант>/index.m3u8 с короткими сегментами.
+    input_args - параметры входа перед -i (например, интервал виртуально обрезанной записи).
+    has_audio=False - во входе нет звука: варианты только с видео (иначе var_stream_map ссылается
+    на несуществующие аудиопотоки и ffmpeg отказывается работать).
+    """
+    split_outputs = "".join(f"[v{index}]" for index in range(len(ladder)))
+    filters = [f"[0:v]split={len(ladder)}{split_outputs}"]
+    for index, rendition in enumerate(ladder):
+        filters.append(
+            f"[v{index}]scale=w={rendition['width']}:h={rendition['height']}:"
+            f"force_original_aspect_ratio=decrease,pad={rendition['width']}:{rendition['height']}:(ow-iw)/2:(oh-ih)/2"
+            f"[v{index}out]"
+        )
+
+    gop_size = FRAME_RATE * segment_seconds
+    cmd = ["ffmpeg", "-y", *input_args, "-i", input_path, "-filter_complex", ";".join(filters)]
+
+    for index, rendition in enumerate(ladder):
+        cmd += [
+            "-map", f"[v{index}out]",
+            f"-c:v:{index}", "libx264",
+            f"-b:v:{index}", rendition["video_bitrate"],
+            f"-maxrate:v:{index}", rendition["maxrate"],
+            f"-bufsize:v:{index}", rendition["bufsize"],
+        ]
+    if has_audio:
+        for index, rendition in enumerate(ladder):
+            cmd += [
+                "-map", "0:a:0",
+                f"-c:a:{index}", "aac",
+                f"-b:a:{index}", rendition["audio_bitrate"],
+            ]
+        cmd += ["-ac", "2"]
+
+    audio_entry = "a:{index}," if has_audio else ""
+    var_stream_map = " ".join(
+        f"v:{index},{audio_entry.format(index=index)}name:{rendition['name']}" for index, rendition in enumerate(ladder)
+    )
+    cmd += [
+        "-r", str(FRAME_RATE),
+        "-preset", "veryfast",
+        "-pix_fmt", "yuv420p",
+        # Ключевые кадры строго на границах сегментов, чтобы варианты переключались бесшовно
+        "-g", str(gop_size),
+        "-keyint_min", str(gop_size),
+        "-sc_threshold", "0",
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", os.path.join(output_dir, "%v", "segment_%05d.ts"),
+        "-master_pl_name", "master.m3u8",
+        "-var_stream_map", var_stream_map,
+        os.path.join(output_dir, "%v", "index.m3u8"),
+    ]
+    return cmd
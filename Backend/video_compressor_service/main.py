@@ -1,11 +1,38 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+import asyncio
 import os
-import subprocess
+import shutil
 import uuid
 
+from ffmpeg_pool import ffmpeg_pool, parse_priority, FfmpegJobError, PRIORITY_INTERACTIVE
+from hls_packaging import build_hls_command
+from probe import probe_media, ProbeError
+from progressive_encode import ProgressiveEncode
+from profiles import TRANSCODE_PROFILES, ACTION_ENCODE, UnknownProfileError, select_profile, video_args, audio_args
+from thumbnails import THUMBNAIL_INTERVAL, WEBVTT_NAME, thumbnail_size, build_sprite_command, build_webvtt
+from transcode import compress_file, plan_for_file, publish_without_encoding, trim_input_args
+
 app = FastAPI()
 
+
+@app.on_event("startup")
+async def start_ffmpeg_pool():
+    ffmpeg_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_ffmpeg_pool():
+    await ffmpeg_pool.stop()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Загрузка пула ffmpeg: глубина очереди, время ожидания, число выполненных задач."""
+    return ffmpeg_pool.metrics()
+
+
 # Директория для хранения временных сжатых файлов
 COMPRESSED_DIR = "compressed_videos"
 os.makedirs(COMPRESSED_DIR, exist_ok=True)
@@ -16,34 +43,190 @@ def cleanup_files(*file_paths):
         if os.path.exists(file_path):
             os.remove(file_path)
 
+# Размер блока при потоковой записи загружаемого файла на диск
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def resolve_profile(profile_name=None, recording_type=None):
+    try:
+        return select_profile(profile_name, recording_type)
+    except UnknownProfileError:
+        raise HTTPException(status_code=400, detail=f"Unknown profile: {profile_name}")
+
+
+@app.get("/profiles")
+async def get_profiles():
+    """Доступные профили сжатия."""
+    return TRANSCODE_PROFILES
+
+
 @app.post("/compress-video/")
-async def compress_video(file: UploadFile = File(...), background_tasks: BackgroundTasks = None):
+async def compress_video(file: UploadFile = File(...), background_tasks: BackgroundTasks = None,
+                         profile: str = None):
+    _, transcode_profile = resolve_profile(profile)
     video_id = str(uuid.uuid4())
     input_path = f"{COMPRESSED_DIR}/{video_id}_input.mp4"
     output_path = f"{COMPRESSED_DIR}/{video_id}_compressed.mp4"
 
-    # Сохраняем загруженный файл
+    # Сохраняем загруженный файл блоками, не поднимая его целиком в память
     with open(input_path, "wb") as buffer:
-        buffer.write(await file.read())
-
-    ffmpeg_cmd = [
-        "ffmpeg", "-i", input_path,
-        "-vf", "scale=640:360",  # Устанавливаем разрешение (можно изменить)
-        "-r", "15",  # Частота кадров, например 15
-        "-b:a", "32k",  # Битрейт для аудио
-        "-vcodec", "libx264",  # Использование кодека H.264 на процессоре
-        "-preset", "fast",  # Быстрый пресет для ускорения сжатия
-        "-crf", "30",  # Уровень сжатия по качеству
-        output_path
-    ]
+        await asyncio.to_thread(shutil.copyfileobj, file.file, buffer, UPLOAD_CHUNK_SIZE)
 
     try:
-        subprocess.run(ffmpeg_cmd, check=True)
-    except subprocess.CalledProcessError:
-        os.remove(input_path)  # Удаление исходного файла в случае ошибки
+        await compress_file(input_path, output_path, transcode_profile, priority=PRIORITY_INTERACTIVE)
+    except FfmpegJobError:
+        cleanup_files(input_path, output_path)
         raise HTTPException(status_code=500, detail="Video compression failed")
 
     # Добавляем задачу для очистки файлов после завершения запроса
     background_tasks.add_task(cleanup_files, input_path, output_path)
 
-    return FileResponse(output_path, media_type="video/mp4", filename="compressed_video.mp4")
\ No newline at end of file
+    return FileResponse(output_path, media_type="video/mp4", filename="compressed_video.mp4")
+
+
+class CompressJobRequest(BaseModel):
+    input_path: str
+    output_path: str
+    # interactive - сжатие под воспроизведение, batch - фоновое предварительное сжатие
+    priority: str = "interactive"
+    # Явный профиль сжатия; если не задан, выбирается по типу записи Zoom
+    profile: str = None
+    recording_type: str = None
+    # Интервал виртуально обрезанной записи, секунды
+    start_time: float = None
+    end_time: float = None
+
+
+@app.post("/compress-video-job/")
+async def compress_video_job(request: CompressJobRequest):
+    """
+    Сжимает файл, лежащий на общем томе, и пишет результат прямо в output_path.
+    Видео не передаётся через HTTP и не копируется во временные файлы сервиса.
+    """
+    if not os.path.exists(request.input_path):
+        raise HTTPException(status_code=404, detail="Input file not found")
+    os.makedirs(os.path.dirname(request.output_path) or ".", exist_ok=True)
+    profile_name, transcode_profile = resolve_profile(request.profile, request.recording_type)
+
+    try:
+        action = await compress_file(request.input_path, request.output_path, transcode_profile,
+                                     priority=parse_priority(request.priority),
+                                     input_args=trim_input_args(request.start_time, request.end_time))
+    except FfmpegJobError:
+        cleanup_files(request.output_path)
+        raise HTTPException(status_code=500, detail="Video compression failed")
+
+    return {"status": "done", "output_path": request.output_path, "profile": profile_name, "action": action}
+
+
+@app.post("/compress-video-stream/")
+async def compress_video_stream(request: CompressJobRequest):
+    """
+    Сжимает файл во фрагментированный MP4 и отдаёт фрагменты по мере кодирования.
+    По завершении обычный MP4 с moov в начале публикуется в output_path.
+    """
+    if not os.path.exists(request.input_path):
+        raise HTTPException(status_code=404, detail="Input file not found")
+    os.makedirs(os.path.dirname(request.output_path) or ".", exist_ok=True)
+    _, transcode_profile = resolve_profile(request.profile, request.recording_type)
+    priority = parse_priority(request.priority)
+    input_args = trim_input_args(request.start_time, request.end_time)
+
+    action = await plan_for_file(request.input_path, transcode_profile) if not input_args else ACTION_ENCODE
+    if action != ACTION_ENCODE:
+        # Кодировать нечего: публикуем файл без перекодирования и отдаём его целиком
+        try:
+            await publish_without_encoding(request.input_path, request.output_path, action, priority)
+        except FfmpegJobError:
+            cleanup_files(request.output_path)
+            raise HTTPException(status_code=500, detail="Video remux failed")
+        return FileResponse(request.output_path, media_type="video/mp4")
+
+    encode = ProgressiveEncode(request.input_path, request.output_path,
+                               video_args(transcode_profile), audio_args(transcode_profile),
+                               priority=priority, input_args=input_args).start()
+    return StreamingResponse(encode.stream(), media_type="video/mp4")
+
+
+class HlsPackageRequest(BaseModel):
+    input_path: str
+    output_dir: str
+    priority: str = "interactive"
+    start_time: float = None
+    end_time: float = None
+
+
+@app.post("/package-hls/")
+async def package_hls(request: HlsPackageRequest):
+    """Нарезает исходное видео в HLS-лесенку с master-плейлистом в каталоге output_dir."""
+    if not os.path.exists(request.input_path):
+        raise HTTPException(status_code=404, detail="Input file not found")
+
+    try:
+        media = await probe_media(request.input_path)
+    except ProbeError:
+        raise HTTPException(status_code=500, detail="Failed to probe input")
+    if media["video"] is None:
+        raise HTTPException(status_code=400, detail="Input has no video stream")
+
+    if os.path.exists(request.output_dir):
+        shutil.rmtree(request.output_dir)
+    os.makedirs(request.output_dir, exist_ok=True)
+
+    ffmpeg_cmd = build_hls_command(request.input_path, request.output_dir,
+                                   input_args=trim_input_args(request.start_time, request.end_time),
+                                   has_audio=media["audio"] is not None)
+    try:
+        await ffmpeg_pool.run(ffmpeg_cmd, priority=parse_priority(request.priority))
+    except FfmpegJobError:
+        shutil.rmtree(request.output_dir, ignore_errors=True)
+        raise HTTPException(status_code=500, detail="HLS packaging failed")
+
+    return {"status": "done", "master_playlist": os.path.join(request.output_dir, "master.m3u8")}
+
+
+class ThumbnailsRequest(BaseModel):
+    input_path: str
+    output_dir: str
+    priority: str = "batch"
+    interval: int = THUMBNAIL_INTERVAL
+    start_time: float = None
+    end_time: float = None
+
+
+@app.post("/generate-thumbnails/")
+async def generate_thumbnails(request: ThumbnailsRequest):
+    """Собирает листы превью для перемотки и WebVTT-индекс к ним в каталоге output_dir."""
+    if not os.path.exists(request.input_path):
+        raise HTTPException(status_code=404, detail="Input file not found")
+    if request.interval <= 0:
+        raise HTTPException(status_code=400, detail="Interval must be positive")
+
+    try:
+        media = await probe_media(request.input_path)
+    except ProbeError:
+        raise HTTPException(status_code=500, detail="Failed to probe input")
+    if media["video"] is None or not media["video"]["width"] or not media["video"]["height"]:
+        raise HTTPException(status_code=400, detail="Input has no video stream")
+
+    duration = media["duration"]
+    if request.start_time is not None and request.end_time is not None:
+        duration = request.end_time - request.start_time
+    size = thumbnail_size(media["video"]["width"], media["video"]["height"])
+
+    if os.path.exists(request.output_dir):
+        shutil.rmtree(request.output_dir)
+    os.makedirs(request.output_dir, exist_ok=True)
+
+    ffmpeg_cmd = build_sprite_command(request.input_path, request.output_dir, size, request.interval,
+                                      input_args=trim_input_args(request.start_time, request.end_time))
+    try:
+        await ffmpeg_pool.run(ffmpeg_cmd, priority=parse_priority(request.priority))
+    except FfmpegJobError:
+        shutil.rmtree(request.output_dir, ignore_errors=True)
+        raise HTTPException(status_code=500, detail="Thumbnail generation failed")
+
+    with open(os.path.join(request.output_dir, WEBVTT_NAME), "w", encoding="utf-8") as webvtt:
+        webvtt.write(build_webvtt(duration, size, request.interval))
+
+    return {"status": "done", "webvtt": os.path.join(request.output_dir, WEBVTT_NAME)}
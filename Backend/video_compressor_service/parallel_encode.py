@@ -0,0 +1,121 @@
+import asyncio
+import csv
+import os
+import shutil
+
+from ffmpeg_pool import ffmpeg_pool, FfmpegJobError, PRIORITY_BATCH
+from probe import probe_duration, ProbeError
+
+# Видео короче этого порога кодируется одним процессом: накладные расходы на нарезку не окупаются
+PARALLEL_MIN_DURATION = 10 * 60
+# Минимальная длина куска, на которые режется длинная лекция
+MIN_SEGMENT_SECONDS = 60
+
+
+def _segment_length(duration, concurrency):
+    # По два куска на воркер, чтобы неравномерные по сложности куски не простаивали в хвосте
+    return max(duration / (concurrency * 2), MIN_SEGMENT_SECONDS)
+
+
+async def encode_single(input_path, output_path, video_args, audio_args, priority=PRIORITY_BATCH, input_args=()):
+    cmd = ["ffmpeg", "-y", *input_args, "-i", input_path, *video_args, *audio_args,
+           "-movflags", "+faststart", "-f", "mp4", output_path]
+    await ffmpeg_pool.run(cmd, priority=priority)
+
+
+async def _encode_audio_track(input_path, audio_path, audio_args, priority):
+    try:
+        await ffmpeg_pool.run(
+            ["ffmpeg", "-y", "-i", input_path, "-vn", "-map", "0:a:0", *audio_args, "-f", "mp4", audio_path],
+            priority=priority
+        )
+    except FfmpegJobError:
+        # Например, у записи нет аудиодорожки - склеиваем только видео
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+
+
+def _read_segment_list(segment_list_path):
+    """Куски из csv-списка сегментного муксера: [(имя файла, длительность в исходнике)]."""
+    segments = []
+    with open(segment_list_path, newline="", encoding="utf-8") as segment_list:
+        for row in csv.reader(segment_list):
+            if len(row) < 3:
+                continue
+            filename, start_time, end_time = row[0], float(row[1]), float(row[2])
+            segments.append((os.path.basename(filename), end_time - start_time))
+    return segments
+
+
+async def encode_segmented(input_path, output_path, video_args, audio_args, duration, priority=PRIORITY_BATCH):
+    """
+    Режет вход по ключевым кадрам без перекодирования, параллельно кодирует куски видео,
+    отдельно кодирует всю аудиодорожку и склеивает результат через concat без перекодирования.
+    Каждый кусок ограничивается точной длительностью своего участка исходника: иначе смена
+    частоты кадров удлиняет каждый кусок на долю секунды, и при склейке видео уходит от звука.
+    """
+    work_dir = f"{output_path}.segments"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    try:
+        segment_seconds = _segment_length(duration, ffmpeg_pool.concurrency)
+        segment_list_path = os.path.join(work_dir, "segments.csv")
+        await ffmpeg_pool.run([
+            "ffmpeg", "-y", "-i", input_path,
+            "-map", "0:v:0", "-an", "-c", "copy",
+            "-f", "segment",
+            "-segment_time", f"{segment_seconds:.3f}",
+            "-segment_list", segment_list_path,
+            "-segment_list_type", "csv",
+            "-reset_timestamps", "1",
+            os.path.join(work_dir, "source_%04d.mp4"),
+        ], priority=priority)
+
+        # Границы кусков в исходнике: по ключевым кадрам, а не ровно по segment_time
+        segments = _read_segment_list(segment_list_path)
+        encoded_parts = [os.path.join(work_dir, name.replace("source_", "encoded_")) for name, _ in segments]
+        audio_path = os.path.join(work_dir, "audio.m4a")
+
+        jobs = [
+            ffmpeg_pool.run(
+                ["ffmpeg", "-y", "-i", os.path.join(work_dir, source), "-an", *video_args,
+                 "-t", f"{segment_duration:.6f}", "-f", "mp4", encoded],
+                priority=priority
+            )
+            for (source, segment_duration), encoded in zip(segments, encoded_parts)
+        ]
+        # Аудио кодируется одним куском: AAC на стыках сегментов даёт щелчки и сдвиг синхронизации
+        jobs.append(_encode_audio_track(input_path, audio_path, audio_args, priority))
+        await asyncio.gather(*jobs)
+
+        concat_list_path = os.path.join(work_dir, "concat.txt")
+        with open(concat_list_path, "w", encoding="utf-8") as concat_list:
+            for (_, segment_duration), encoded in zip(segments, encoded_parts):
+                # duration задаёт смещение следующего куска: погрешность длины куска не накапливается
+                concat_list.write(f"file '{encoded}'\nduration {segment_duration:.6f}\n")
+
+        cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", concat_list_path]
+        if os.path.exists(audio_path):
+            cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+        cmd += ["-c", "copy", "-movflags", "+faststart", "-f", "mp4", output_path]
+        await ffmpeg_pool.run(cmd, priority=priority)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def encode_video(input_path, output_path, video_args, audio_args, priority=PRIORITY_BATCH, input_args=()):
+    """
+    Кодирует файл, для длинных лекций - кусками параллельно на всех ядрах.
+    input_args (интервал обрезки) поддерживаются только при кодировании одним процессом.
+    """
+    try:
+        duration = await probe_duration(input_path)
+    except ProbeError:
+        duration = 0
+
+    # Для профиля без видео резать нечего
+    audio_only = "-vn" in video_args
+    if input_args or audio_only or duration < PARALLEL_MIN_DURATION or ffmpeg_pool.concurrency < 2:
+        await encode_single(input_path, output_path, video_args, audio_args, priority, input_args)
+    else:
+        await encode_segmented(input_path, output_path, video_args, audio_args, duration, priority)
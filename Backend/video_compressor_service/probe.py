@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+
+class ProbeError(Exception):
+    pass
+
+
+def _parse_rate(rate):
+    """Преобразует '30000/1001' из ffprobe в число кадров в секунду."""
+    try:
+        numerator, _, denominator = rate.partition("/")
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError, AttributeError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def probe_media(input_path):
+    """
+    Сводка по файлу из ffprobe: контейнер, длительность, общий битрейт,
+    параметры первой видео- и аудиодорожки (None, если дорожки нет).
+    """
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error",
+        "-show_format", "-show_streams",
+        "-of", "json",
+        input_path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await process.communicate()
+    if process.returncode != 0:
+        raise ProbeError(f"ffprobe failed for {input_path}")
+    try:
+        data = json.loads(stdout)
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        raise ProbeError(f"Unexpected ffprobe output for {input_path}")
+
+    media_format = data.get("format", {})
+    streams = data.get("streams", [])
+    video_stream = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    audio_stream = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+
+    media = {
+        "format_name": media_format.get("format_name", ""),
+        "duration": float(media_format.get("duration") or 0),
+        "bit_rate": _to_int(media_format.get("bit_rate")),
+        "video": None,
+        "audio": None,
+    }
+    if video_stream:
+        media["video"] = {
+            "codec": video_stream.get("codec_name"),
+            "width": _to_int(video_stream.get("width")),
+            "height": _to_int(video_stream.get("height")),
+            "fps": _parse_rate(video_stream.get("avg_frame_rate")),
+            "pix_fmt": video_stream.get("pix_fmt"),
+        }
+    if audio_stream:
+        media["audio"] = {
+            "codec": audio_stream.get("codec_name"),
+            "bit_rate": _to_int(audio_stream.get("bit_rate")),
+        }
+    return media
+
+
+async def probe_duration(input_path):
+    """Длительность файла в секундах по данным ffprobe."""
+    return (await probe_media(input_path))["duration"]
@@ -0,0 +1,117 @@
+# Именованные профили сжатия. max_bitrate - общий битрейт (бит/с), до которого исходник
+# считается уже достаточно лёгким и повторно не кодируется.
+TRANSCODE_PROFILES = {
+    # Лекция с демонстрацией экрана и докладчиком - прежние настройки по умолчанию
+    "lecture_360p": {
+        "width": 640,
+        "height": 360,
+        "fps": 15,
+        "crf": 30,
+        "preset": "fast",
+        "audio_bitrate": "32k",
+        "max_bitrate": 500_000,
+    },
+    # Демонстрация экрана с мелким текстом: выше разрешение, ниже частота кадров
+    "screen_720p": {
+        "width": 1280,
+        "height": 720,
+        "fps": 10,
+        "crf": 28,
+        "preset": "fast",
+        "audio_bitrate": "48k",
+        "max_bitrate": 900_000,
+    },
+    # Только звук
+    "audio_only": {
+        "width": None,
+        "height": None,
+        "fps": None,
+        "crf": None,
+        "preset": None,
+        "audio_bitrate": "48k",
+        "max_bitrate": 64_000,
+    },
+}
+
+DEFAULT_PROFILE = "lecture_360p"
+
+# Профиль по типу записи Zoom, если в запросе профиль не указан явно
+RECORDING_TYPE_PROFILES = {
+    "shared_screen_with_speaker_view": "lecture_360p",
+    "shared_screen": "screen_720p",
+    "audio_only": "audio_only",
+}
+
+# Кодеки, которые браузер проигрывает из MP4 без перекодирования
+PLAYABLE_VIDEO_CODECS = {"h264"}
+PLAYABLE_AUDIO_CODECS = {"aac", "mp3"}
+PLAYABLE_PIX_FMTS = {"yuv420p", "yuvj420p"}
+
+ACTION_SKIP = "skip"
+ACTION_REMUX = "remux"
+ACTION_ENCODE = "encode"
+
+
+class UnknownProfileError(Exception):
+    pass
+
+
+def select_profile(profile_name=None, recording_type=None):
+    """Выбирает профиль: явно указанный в запросе, затем по типу записи, затем профиль по умолчанию."""
+    if profile_name:
+        if profile_name not in TRANSCODE_PROFILES:
+            raise UnknownProfileError(profile_name)
+        return profile_name, TRANSCODE_PROFILES[profile_name]
+    profile_name = RECORDING_TYPE_PROFILES.get(recording_type, DEFAULT_PROFILE)
+    return profile_name, TRANSCODE_PROFILES[profile_name]
+
+
+def video_args(profile):
+    if profile["width"] is None:
+        return ["-vn"]
+    return [
+        "-vf", f"scale={profile['width']}:{profile['height']}",
+        "-r", str(profile["fps"]),
+        "-vcodec", "libx264",
+        "-preset", profile["preset"],
+        "-crf", str(profile["crf"]),
+        "-pix_fmt", "yuv420p",
+    ]
+
+
+def audio_args(profile):
+    return ["-c:a", "aac", "-b:a", profile["audio_bitrate"]]
+
+
+def plan_transcode(media, profile):
+    """
+    По результату ffprobe решает, что делать с файлом:
+      skip   - исходник уже укладывается в профиль и лежит в MP4, используем как есть;
+      remux  - укладывается, но контейнер другой - перепаковываем без перекодирования;
+      encode - нужно полноценное сжатие.
+    """
+    if media["bit_rate"] is None or media["bit_rate"] > profile["max_bitrate"]:
+        return ACTION_ENCODE
+
+    audio = media["audio"]
+    if audio and audio["codec"] not in PLAYABLE_AUDIO_CODECS:
+        return ACTION_ENCODE
+
+    video = media["video"]
+    if profile["width"] is None:
+        if video:
+            return ACTION_ENCODE
+    elif video:
+        if video["codec"] not in PLAYABLE_VIDEO_CODECS or video["pix_fmt"] not in PLAYABLE_PIX_FMTS:
+            return ACTION_ENCODE
+        if not video["width"] or not video["height"]:
+            return ACTION_ENCODE
+        if video["width"] > profile["width"] or video["height"] > profile["height"]:
+            return ACTION_ENCODE
+        # Небольшой допуск: 15.02 fps из ffprobe - это те же 15 кадров
+        if video["fps"] and video["fps"] > profile["fps"] * 1.05:
+            return ACTION_ENCODE
+
+    if "mp4" in media["format_name"].split(","):
+        return ACTION_SKIP
+    return ACTION_REMUX
@@ -0,0 +1,110 @@
+import asyncio
+import os
+
+from ffmpeg_pool import ffmpeg_pool, PRIORITY_INTERACTIVE
+
+STREAM_CHUNK_SIZE = 64 * 1024
+# Сколько фрагментов держим для медленного клиента, прежде чем притормозить ffmpeg
+RELAY_QUEUE_SIZE = 64
+# Фрагментированный MP4: moov в начале, фрагмент на каждый ключевой кадр
+FRAGMENTED_MP4_ARGS = ["-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4"]
+
+
+class ProgressiveEncode:
+    """
+    Кодирует видео во фрагментированный MP4 и одновременно:
+      - отдаёт фрагменты подключённому клиенту по мере появления;
+      - пишет их в файл, который после завершения перепаковывается в обычный MP4 с moov в начале
+        и публикуется в output_path.
+    Если клиент отключился, кодирование продолжается ради файла.
+    """
+
+    def __init__(self, input_path, output_path, video_args, audio_args, priority=PRIORITY_INTERACTIVE, input_args=()):
+        self.input_path = input_path
+        self.input_args = list(input_args)
+        self.output_path = output_path
+        self.video_args = video_args
+        self.audio_args = audio_args
+        self.priority = priority
+        self.queue = asyncio.Queue(maxsize=RELAY_QUEUE_SIZE)
+        self.client_attached = True
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._encode())
+        return self
+
+    async def _relay(self, chunk):
+        if self.client_attached:
+            await self.queue.put(chunk)
+
+    async def _encode(self):
+        fragmented_path = f"{self.output_path}.fragmented"
+        succeeded = False
+        try:
+            async with ffmpeg_pool.reserve(self.priority):
+                process = await asyncio.create_subprocess_exec(
+                    "ffmpeg", "-y", *self.input_args, "-i", self.input_path,
+                    *self.video_args,
+                    # Короткий GOP, чтобы первый фрагмент появился через пару секунд
+                    "-g", "30",
+                    *self.audio_args,
+                    *FRAGMENTED_MP4_ARGS, "pipe:1",
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+                try:
+                    with open(fragmented_path, "wb") as fragmented_file:
+                        while True:
+                            chunk = await process.stdout.read(STREAM_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            fragmented_file.write(chunk)
+                            await self._relay(chunk)
+                    await process.wait()
+                except BaseException:
+                    if process.returncode is None:
+                        process.kill()
+                        await process.wait()
+                    raise
+
+                if process.returncode == 0:
+                    succeeded = await self._publish(fragmented_path)
+                else:
+                    print(f"ffmpeg завершился с ошибкой {process.returncode} при потоковом сжатии {self.input_path}")
+        finally:
+            if os.path.exists(fragmented_path):
+                os.remove(fragmented_path)
+            # None - признак конца потока для клиента
+            await self._relay(None)
+        return succeeded
+
+    async def _publish(self, fragmented_path):
+        """Перепаковывает фрагментированный файл в обычный MP4 (без перекодирования) и публикует его."""
+        temp_path = f"{self.output_path}.faststart"
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-y", "-i", fragmented_path, "-c", "copy", "-movflags", "+faststart", "-f", "mp4", temp_path,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        await process.wait()
+        if process.returncode != 0:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        os.replace(temp_path, self.output_path)
+        return True
+
+    async def stream(self):
+        """Асинхронный генератор фрагментов для StreamingResponse."""
+        try:
+            while True:
+                chunk = await self.queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Клиент ушёл: перестаём копить фрагменты и освобождаем ffmpeg, если он ждёт места в очереди
+            self.client_attached = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
@@ -0,0 +1,57 @@
+import math
+import os
+
+# Превью берётся раз в THUMBNAIL_INTERVAL секунд
+THUMBNAIL_INTERVAL = 10
+THUMBNAIL_WIDTH = 160
+# Превью собираются в листы SPRITE_COLUMNS x SPRITE_ROWS, чтобы браузер скачивал несколько картинок, а не сотни
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+SPRITE_PATTERN = "sprite_%03d.jpg"
+WEBVTT_NAME = "thumbnails.vtt"
+
+
+def thumbnail_size(width, height, thumbnail_width=THUMBNAIL_WIDTH):
+    """Размер превью с сохранением пропорций (высота чётная - так требует кодер)."""
+    thumbnail_height = max(2, round(thumbnail_width * height / width / 2) * 2)
+    return thumbnail_width, thumbnail_height
+
+
+def build_sprite_command(input_path, output_dir, size, interval=THUMBNAIL_INTERVAL, input_args=()):
+    """
+    Команда ffmpeg, которая пишет листы превью в output_dir.
+    Декодируются только ключевые кадры: для лекции этого хватает, а работы на порядок меньше.
+    """
+    width, height = size
+    return [
+        "ffmpeg", "-y", "-skip_frame", "nokey", *input_args, "-i", input_path,
+        "-map", "0:v:0", "-an",
+        "-vf", f"fps=1/{interval},scale={width}:{height},tile={SPRITE_COLUMNS}x{SPRITE_ROWS}",
+        "-q:v", "5",
+        "-start_number", "0",
+        os.path.join(output_dir, SPRITE_PATTERN),
+    ]
+
+
+def _format_timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def build_webvtt(duration, size, interval=THUMBNAIL_INTERVAL):
+    """WebVTT-индекс: для каждого интервала - лист и координаты превью (#xywh)."""
+    width, height = size
+    per_sprite = SPRITE_COLUMNS * SPRITE_ROWS
+    lines = ["WEBVTT", ""]
+    for index in range(math.ceil(duration / interval)):
+        start = index * interval
+        end = min(start + interval, duration)
+        sprite_name = SPRITE_PATTERN % (index // per_sprite)
+        position = index % per_sprite
+        x = (position % SPRITE_COLUMNS) * width
+        y = (position // SPRITE_COLUMNS) * height
+        lines.append(f"{_format_timestamp(start)} --> {_format_timestamp(end)}")
+        lines.append(f"{sprite_name}#xywh={x},{y},{width},{height}")
+        lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import shutil
+
+from ffmpeg_pool import ffmpeg_pool, PRIORITY_BATCH
+from parallel_encode import encode_video
+from probe import probe_media, ProbeError
+from profiles import ACTION_SKIP, ACTION_REMUX, ACTION_ENCODE, plan_transcode, video_args, audio_args
+
+
+async def plan_for_file(input_path, profile):
+    """План обработки файла; если ffprobe не справился, файл просто кодируется."""
+    try:
+        media = await probe_media(input_path)
+    except ProbeError:
+        return ACTION_ENCODE
+    return plan_transcode(media, profile)
+
+
+def _link_or_copy(input_path, output_path):
+    # Жёсткая ссылка не занимает места; между разными томами - обычная копия
+    temp_path = f"{output_path}.link"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(input_path, temp_path)
+    except OSError:
+        shutil.copyfile(input_path, temp_path)
+    os.replace(temp_path, output_path)
+
+
+async def publish_without_encoding(input_path, output_path, action, priority=PRIORITY_BATCH):
+    """Выполняет skip (исходник как есть) или remux (перепаковка в MP4 без перекодирования)."""
+    if action == ACTION_SKIP:
+        await asyncio.to_thread(_link_or_copy, input_path, output_path)
+    elif action == ACTION_REMUX:
+        await ffmpeg_pool.run([
+            "ffmpeg", "-y", "-i", input_path,
+            "-map", "0:v:0?", "-map", "0:a:0?",
+            "-c", "copy", "-movflags", "+faststart",
+            "-f", "mp4", output_path,
+        ], priority=priority)
+    else:
+        raise ValueError(f"Unexpected transcode action: {action}")
+
+
+def trim_input_args(start_time=None, end_time=None):
+    """Параметры входа ffmpeg для интервала виртуально обрезанной записи (точный поиск при перекодировании)."""
+    if start_time is None or end_time is None:
+        return []
+    return ["-ss", f"{start_time:.3f}", "-t", f"{end_time - start_time:.3f}"]
+
+
+async def compress_file(input_path, output_path, profile, priority=PRIORITY_BATCH, input_args=()):
+    """
+    Сжимает файл по профилю. Если исходник уже укладывается в профиль,
+    перекодирование пропускается. Возвращает выполненное действие.
+    """
+    # Интервал обрезки вырезается только при перекодировании
+    action = await plan_for_file(input_path, profile) if not input_args else ACTION_ENCODE
+    if action == ACTION_ENCODE:
+        await encode_video(input_path, output_path, video_args(profile), audio_args(profile), priority=priority,
+                           input_args=input_args)
+    else:
+        await publish_without_encoding(input_path, output_path, action, priority)
+    return action
@@ -311,6 +311,17 @@ const handleVideoClick = (recording) => {
 
 
 
+const waitForTrimJob = async (jobId) => {
+  while (true) {
+    const { data: job } = await axiosInstance.get('/get-trim-status', { params: { job_id: jobId } });
+    if (job.status === 'done' || job.status === 'failed') {
+      return job;
+    }
+    setSnackbarMessage(`Видео обрабатывается... ${Math.round(job.progress * 100)}%`);
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+  }
+};
+
 const handleTrimVideo = () => {
   if (!playerRef.current || !currentRecording) return;
 
@@ -337,10 +348,16 @@ const handleTrimVideo = () => {
       start_time: startTime,
       end_time: endTime,
     })
-    .then((response) => {
-      setSnackbarMessage('Видео успешно обрезано.');
+    // Виртуальная обрезка готова сразу, физическая выполняется в фоне: опрашиваем статус задачи
+    .then((response) => (response.data.job_id ? waitForTrimJob(response.data.job_id) : response.data))
+    .then((job) => {
+      if (job.status === 'done') {
+        setSnackbarMessage('Видео успешно обрезано.');
+        setCurrentRecording((prev) => ({ ...prev, trim: true }));
+      } else {
+        setSnackbarMessage('Ошибка при обрезке видео.');
+      }
       setSnackbarOpen(true);
-      setCurrentRecording((prev) => ({ ...prev, trim: true }));
     })
     .catch((error) => {
       setSnackbarMessage('Ошибка при логировании информации об обрезке.');